@@ -10,6 +10,8 @@ from dataclasses import dataclass
 class Configuration:
     """The configurable fields for the chatbot."""
     user_id: str = "default-user"
+    # Memories retrieved for each turn, the most similar to the latest message when the store has a vector index
+    memory_top_k: int = 10
 
     @classmethod
     def from_runnable_config(
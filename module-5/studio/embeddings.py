@@ -0,0 +1,37 @@
+"""Local, deterministic embeddings for semantic search over long-term memories.
+
+Used by the store index configured in langgraph.json. Feature hashing of words and
+character trigrams: no network or credentials needed, the same text always gets the
+same vector, and lexical overlap (not synonyms) drives similarity.
+"""
+import hashlib
+import math
+import re
+import unicodedata
+
+DIMS = 256
+
+
+def _features(text):
+    # Lowercase and strip accents so "Reunión" and "reunion" share features
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    words = re.findall(r"\w+", text)
+    trigrams = [f"#{word[i:i + 3]}" for word in words for i in range(max(len(word) - 2, 1))]
+    return words + trigrams
+
+
+def embed_text(text, dims=DIMS):
+    """Return the L2-normalized hashed feature vector of `text`."""
+    vector = [0.0] * dims
+    for feature in _features(text):
+        # blake2b instead of hash(): stable across processes
+        value = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+        vector[value % dims] += 1.0 if value >> 63 else -1.0
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+def embed_texts(texts):
+    """Embedding function for the store index in langgraph.json."""
+    return [embed_text(text) for text in texts]
@@ -1,4 +1,3 @@
-import uuid
 from datetime import datetime
 
 from pydantic import BaseModel, Field
@@ -8,6 +7,9 @@ from trustcall import create_extractor
 from typing import Literal, Optional, TypedDict
 
 from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import merge_configs
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
 from langchain_core.messages import merge_message_runs
 from langchain_core.messages import SystemMessage, HumanMessage
 
@@ -23,28 +25,38 @@ from langgraph.store.base import BaseStore
 from langgraph.store.memory import InMemoryStore
 
 import configuration
+from memory_batch import put_responses
 
 ## Utilities 
 
-# Inspect the tool calls for Trustcall
-class Spy:
+# Collect the tool calls of each model response inside Trustcall as it finishes.
+# Unlike an on_end listener, this does not need the full run tree to be kept around
+class ToolCallRecorder(BaseCallbackHandler):
     def __init__(self):
         self.called_tools = []
 
-    def __call__(self, run):
-        q = [run]
-        while q:
-            r = q.pop()
-            if r.child_runs:
-                q.extend(r.child_runs)
-            if r.run_type == "chat_model":
-                self.called_tools.append(
-                    r.outputs["generations"][0][0]["message"]["kwargs"]["tool_calls"]
-                )
+    def on_llm_end(self, response: LLMResult, **kwargs):
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                if message is not None:
+                    self.called_tools.append(getattr(message, "tool_calls", []))
 
-# Extract information from tool calls for both patches and new memories in Trustcall
-def extract_tool_info(tool_calls, schema_name="Memory"):
-    """Extract information from tool calls for both patches and new memories.
+    def attach(self, config=None):
+        """Return `config` with this recorder added, keeping the graph's own callbacks."""
+        return merge_configs(config, {"callbacks": [self]})
+
+    def changes(self, schema_name="Memory"):
+        """Structured change records (see tool_changes)."""
+        return tool_changes(self.called_tools, schema_name)
+
+    def summary(self, schema_name="Memory"):
+        """Readable summary of the changes, only formatted when asked for."""
+        return format_changes(self.changes(schema_name), schema_name)
+
+# Extract the changes from tool calls for both patches and new memories in Trustcall
+def tool_changes(tool_calls, schema_name="Memory"):
+    """Extract change records ({'type': 'update' | 'new', ...}) from the tool calls.
     
     Args:
         tool_calls: List of tool calls from the model
@@ -68,8 +80,10 @@ def extract_tool_info(tool_calls, schema_name="Memory"):
                     'type': 'new',
                     'value': call['args']
                 })
+    return changes
 
-    # Format results as a single string
+# Format change records as a single string
+def format_changes(changes, schema_name="Memory"):
     result_parts = []
     for change in changes:
         if change['type'] == 'update':
@@ -86,6 +100,11 @@ def extract_tool_info(tool_calls, schema_name="Memory"):
     
     return "\n\n".join(result_parts)
 
+# Extract information from tool calls for both patches and new memories in Trustcall
+def extract_tool_info(tool_calls, schema_name="Memory"):
+    """Extract information from tool calls for both patches and new memories."""
+    return format_changes(tool_changes(tool_calls, schema_name), schema_name)
+
 ## Schema definitions
 
 # User profile schema
@@ -197,11 +216,24 @@ llm_nova_pro = ChatBedrockConverse(
 model = llm_nova_lite
 
 ## Create the Trustcall extractors for updating the user profile and ToDo list
-profile_extractor = create_extractor(
-    model,
-    tools=[Profile],
-    tool_choice="Profile",
-)
+
+# Extractors are built once per (schemas, options) and shared across calls;
+# each node only attaches its own ToolCallRecorder
+_extractors = {}
+
+def get_extractor(*tools, tool_choice=None, enable_inserts=False):
+    """Return the memoized Trustcall extractor for these schemas and options."""
+    key = (tools, tool_choice, enable_inserts)
+    if key not in _extractors:
+        _extractors[key] = create_extractor(
+            model,
+            tools=list(tools),
+            tool_choice=tool_choice,
+            enable_inserts=enable_inserts,
+        )
+    return _extractors[key]
+
+profile_extractor = get_extractor(Profile, tool_choice="Profile")
 
 ## Prompts 
 
@@ -332,25 +364,19 @@ def update_profile(state: MessagesState, config: RunnableConfig, store: BaseStor
     TRUSTCALL_INSTRUCTION_FORMATTED=TRUSTCALL_INSTRUCTION.format(time=datetime.now().isoformat())
     updated_messages=list(merge_message_runs(messages=[SystemMessage(content=TRUSTCALL_INSTRUCTION_FORMATTED)] + state["messages"][:-1]))
 
-    # Initialize Spy for monitoring (Added for Verbose Reporting)
-    spy = Spy()
-    # Attach Spy listener to extractor
-    profile_extractor_with_spy = profile_extractor.with_listeners(on_end=spy)
+    # Initialize the recorder for monitoring (Added for Verbose Reporting)
+    recorder = ToolCallRecorder()
 
-    # Invoke the extractor
-    result = profile_extractor_with_spy.invoke({"messages": updated_messages, 
-                                         "existing": existing_memories})
-
-    # Save save the memories from Trustcall to the store
-    for r, rmeta in zip(result["responses"], result["response_metadata"]):
-        store.put(namespace,
-                  rmeta.get("json_doc_id", str(uuid.uuid4())),
-                  r.model_dump(mode="json"),
-            )
+    # Invoke the extractor with the recorder attached
+    result = profile_extractor.invoke({"messages": updated_messages, 
+                                         "existing": existing_memories}, recorder.attach(config))
+
+    # Save the memories from Trustcall to the store in a single batch (one round trip)
+    put_responses(store, namespace, result)
     tool_calls = state['messages'][-1].tool_calls
     # Return tool message with update verification
-    # Extract detailed changes using the spy
-    profile_update_msg = extract_tool_info(spy.called_tools, tool_name)
+    # Extract detailed changes using the recorder
+    profile_update_msg = recorder.summary(tool_name)
     return {"messages": [{"role": "tool", "content": profile_update_msg, "tool_call_id":tool_calls[0]['id']}]}
 
 def update_todos(state: MessagesState, config: RunnableConfig, store: BaseStore):
@@ -379,33 +405,24 @@ def update_todos(state: MessagesState, config: RunnableConfig, store: BaseStore)
     TRUSTCALL_INSTRUCTION_FORMATTED=TRUSTCALL_INSTRUCTION.format(time=datetime.now().isoformat())
     updated_messages=list(merge_message_runs(messages=[SystemMessage(content=TRUSTCALL_INSTRUCTION_FORMATTED)] + state["messages"][:-1]))
 
-    # Initialize the spy for visibility into the tool calls made by Trustcall
-    spy = Spy()
+    # Initialize the recorder for visibility into the tool calls made by Trustcall
+    recorder = ToolCallRecorder()
     
-    # Create the Trustcall extractor for updating the ToDo list 
-    todo_extractor = create_extractor(
-    model,
-    tools=[ToDo],
-    tool_choice=tool_name,
-    enable_inserts=True
-    ).with_listeners(on_end=spy)
+    # Reuse the Trustcall extractor for updating the ToDo list
+    todo_extractor = get_extractor(ToDo, tool_choice=tool_name, enable_inserts=True)
 
     # Invoke the extractor
     result = todo_extractor.invoke({"messages": updated_messages, 
-                                         "existing": existing_memories})
+                                         "existing": existing_memories}, recorder.attach(config))
 
-    # Save save the memories from Trustcall to the store
-    for r, rmeta in zip(result["responses"], result["response_metadata"]):
-        store.put(namespace,
-                  rmeta.get("json_doc_id", str(uuid.uuid4())),
-                  r.model_dump(mode="json"),
-            )
+    # Save the memories from Trustcall to the store in a single batch (one round trip)
+    put_responses(store, namespace, result)
         
     # Respond to the tool call made in task_mAIstro, confirming the update    
     tool_calls = state['messages'][-1].tool_calls
 
     # Extract the changes made by Trustcall and add the the ToolMessage returned to task_mAIstro
-    todo_update_msg = extract_tool_info(spy.called_tools, tool_name)
+    todo_update_msg = recorder.summary(tool_name)
     return {"messages": [{"role": "tool", "content": todo_update_msg, "tool_call_id":tool_calls[0]['id']}]}
 
 def update_instructions(state: MessagesState, config: RunnableConfig, store: BaseStore):
@@ -0,0 +1,18 @@
+"""Batched writes of Trustcall results to the long-term memory store.
+
+Every memory node saves the documents Trustcall returned in the same way: each response is
+stored under the json_doc_id of the document it updated (a new UUID for inserts), serialized
+with model_dump(mode="json"). put_responses does it with a single store.batch, one round trip
+to the store no matter how many documents changed.
+"""
+import uuid
+
+from langgraph.store.base import BaseStore, PutOp
+
+
+def put_responses(store: BaseStore, namespace: tuple, result: dict):
+    """Save the responses of a Trustcall extractor `result` to `namespace` in one store.batch."""
+    store.batch([
+        PutOp(namespace, rmeta.get("json_doc_id", str(uuid.uuid4())), r.model_dump(mode="json"))
+        for r, rmeta in zip(result["responses"], result["response_metadata"])
+    ])
@@ -1,5 +1,3 @@
-import uuid 
-
 from pydantic import BaseModel, Field
 
 from trustcall import create_extractor
@@ -15,6 +13,7 @@ load_dotenv('/home/juansebas7ian/langchain-academy/.env')
 from langgraph.graph import StateGraph, MessagesState, START, END
 from langgraph.store.base import BaseStore
 import configuration
+from memory_batch import put_responses
 
 # Initialize the LLM
 # model = ChatOpenAI(model="gpt-4o", temperature=0)
@@ -112,6 +111,25 @@ TRUSTCALL_INSTRUCTION = """Reflect on following interaction.
 Use the provided tools to retain any necessary memories about the user. 
 
 Use parallel tool calling to handle updates and insertions simultaneously:"""
+
+def latest_user_text(messages):
+    """Text of the latest human message, used as the query for memory retrieval."""
+    for message in reversed(messages):
+        if message.type == "human":
+            content = message.content
+            if isinstance(content, str):
+                return content
+            return " ".join(block.get("text", "") for block in content if isinstance(block, dict))
+    return None
+
+def search_memories(store, namespace, messages, top_k):
+    """Top-k memories for the conversation.
+
+    With a vector index on the store (see langgraph.json) these are the memories most similar
+    to the latest message; without one, the query is ignored and the store returns the first k.
+    """
+    return store.search(namespace, query=latest_user_text(messages), limit=int(top_k))
+
 def call_model(state: MessagesState, config: RunnableConfig, store: BaseStore):
 
     """Load memory from the store and use it to personalize the chatbot's response."""
@@ -122,9 +140,9 @@ def call_model(state: MessagesState, config: RunnableConfig, store: BaseStore):
     # Get the user ID from the config
     user_id = configurable.user_id
 
-    # Retrieve memory from the store
+    # Retrieve the memories relevant to the latest message from the store
     namespace = ("memories", user_id)
-    memories = store.search(namespace)
+    memories = search_memories(store, namespace, state["messages"], configurable.memory_top_k)
 
     # Format the memories for the system prompt
     info = "\n".join(f"- {mem.value['content']}" for mem in memories)
@@ -148,8 +166,8 @@ def write_memory(state: MessagesState, config: RunnableConfig, store: BaseStore)
     # Define the namespace for the memories
     namespace = ("memories", user_id)
 
-    # Retrieve the most recent memories for context
-    existing_items = store.search(namespace)
+    # Retrieve the memories most related to the conversation for context
+    existing_items = search_memories(store, namespace, state["messages"], configurable.memory_top_k)
 
     # Format the existing memories for the Trustcall extractor
     tool_name = "Memory"
@@ -166,12 +184,8 @@ def write_memory(state: MessagesState, config: RunnableConfig, store: BaseStore)
     result = trustcall_extractor.invoke({"messages": updated_messages, 
                                         "existing": existing_memories})
 
-    # Save the memories from Trustcall to the store
-    for r, rmeta in zip(result["responses"], result["response_metadata"]):
-        store.put(namespace,
-                  rmeta.get("json_doc_id", str(uuid.uuid4())),
-                  r.model_dump(mode="json"),
-            )
+    # Save the memories from Trustcall to the store in a single batch (one round trip)
+    put_responses(store, namespace, result)
 
 # Define the graph
 builder = StateGraph(MessagesState,config_schema=configuration.Configuration)
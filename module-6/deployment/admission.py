@@ -0,0 +1,133 @@
+"""
+Control de admisión (backpressure) para el servidor FastAPI.
+
+Antes de ejecutar el grafo, cada petición pasa por dos filtros:
+- límite por usuario: token bucket por user_id (USER_RATE_LIMIT peticiones/s, ráfagas de USER_RATE_BURST)
+  → si no quedan tokens, HTTP 429 con Retry-After
+- capacidad del servidor: como mucho ADMISSION_MAX_INFLIGHT ejecuciones a la vez y una cola acotada de
+  ADMISSION_QUEUE_SIZE peticiones en espera (máximo ADMISSION_QUEUE_TIMEOUT segundos)
+  → si la cola está llena o la espera se agota, HTTP 503 con Retry-After
+
+Rechazar pronto mantiene el servidor trabajando a su capacidad con latencias acotadas, en lugar de
+acumular peticiones que terminarían tarde (o con errores de throttling de Bedrock).
+Cada límite se desactiva con 0 (valor por defecto).
+"""
+import asyncio # Semáforo y esperas con tiempo límite
+import math # Redondeo de Retry-After
+import os # Lectura de variables de entorno
+import time # Reloj del token bucket y tiempos de servicio
+from typing import Dict, Optional, Tuple # Tipos para anotaciones
+
+# Ejecuciones simultáneas permitidas (0 = sin límite)
+ADMISSION_MAX_INFLIGHT = int(os.environ.get("ADMISSION_MAX_INFLIGHT", "0"))
+# Peticiones que pueden esperar un hueco cuando se alcanza el límite
+ADMISSION_QUEUE_SIZE = int(os.environ.get("ADMISSION_QUEUE_SIZE", "0"))
+# Segundos máximos de espera en la cola antes de responder 503
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", "5"))
+# Peticiones por segundo permitidas a cada user_id (0 = sin límite) y tamaño de ráfaga
+USER_RATE_LIMIT = float(os.environ.get("USER_RATE_LIMIT", "0"))
+USER_RATE_BURST = float(os.environ.get("USER_RATE_BURST", "10"))
+
+# Códigos de error de AWS que indican que Bedrock está limitando las llamadas
+THROTTLING_CODES = ("ThrottlingException", "TooManyRequestsException", "ServiceUnavailableException")
+
+# Máximo de buckets guardados antes de descartar los de usuarios inactivos
+_MAX_BUCKETS = 10_000
+
+
+class AdmissionRejected(Exception):
+    """La petición no se admite; el servidor la convierte en 429/503 con Retry-After."""
+
+    def __init__(self, status_code: int, retry_after: float, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.retry_after = max(1, math.ceil(retry_after)) # Retry-After se expresa en segundos enteros
+        self.detail = detail
+
+
+class AdmissionController:
+    """Limita la concurrencia global y la tasa de peticiones por usuario."""
+
+    def __init__(self, max_inflight: int = ADMISSION_MAX_INFLIGHT, queue_size: int = ADMISSION_QUEUE_SIZE,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT, rate: float = USER_RATE_LIMIT,
+                 burst: float = USER_RATE_BURST):
+        self.max_inflight = max_inflight
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self._slots = asyncio.Semaphore(max_inflight) if max_inflight > 0 else None
+        self._waiting = 0 # Peticiones en la cola
+        self._service_time = 1.0 # Media móvil del tiempo de servicio (para estimar Retry-After)
+        self._buckets: Dict[str, Tuple[float, float]] = {} # user_id → (tokens, última recarga)
+
+    async def admit(self, user_id: Optional[str]) -> Optional[float]:
+        """Espera un hueco para la petición; retorna el instante de admisión para release().
+
+        Con user_id=None solo se aplica el límite de concurrencia (el llamador ya cobró con charge()).
+        """
+        if user_id is not None:
+            self.charge(user_id)
+        if self._slots is None:
+            return None
+
+        if self._slots.locked():
+            if self._waiting >= self.queue_size:
+                raise AdmissionRejected(503, self._estimated_wait(), "Servidor saturado, inténtalo más tarde")
+            self._waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise AdmissionRejected(503, self._estimated_wait(), "Tiempo de espera en cola agotado") from None
+            finally:
+                self._waiting -= 1
+        else:
+            await self._slots.acquire()
+        return time.monotonic()
+
+    def release(self, admitted_at: Optional[float]):
+        """Libera el hueco de una petición admitida con admit()."""
+        if admitted_at is None:
+            return
+        # Media móvil exponencial del tiempo que se ocupa cada hueco
+        self._service_time = 0.8 * self._service_time + 0.2 * (time.monotonic() - admitted_at)
+        self._slots.release()
+
+    def _estimated_wait(self) -> float:
+        """Tiempo aproximado hasta que se vacíe la cola actual."""
+        return self._service_time * (self._waiting + 1) / self.max_inflight
+
+    def throttled(self) -> AdmissionRejected:
+        """Rechazo 503 para cuando Bedrock limita las llamadas de una petición ya admitida."""
+        return AdmissionRejected(503, self._service_time, "El modelo está limitando las llamadas, inténtalo más tarde")
+
+    def charge(self, user_id: str):
+        """Consume un token del bucket del usuario o rechaza con 429."""
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        tokens, last = self._buckets.get(user_id, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        if tokens < 1:
+            self._buckets[user_id] = (tokens, now)
+            raise AdmissionRejected(429, (1 - tokens) / self.rate, f"Límite de peticiones superado para {user_id}")
+        self._buckets[user_id] = (tokens - 1, now)
+        if len(self._buckets) > _MAX_BUCKETS:
+            self._prune(now)
+
+    def _prune(self, now: float):
+        # Un bucket que ya se habría rellenado por completo equivale a no tener bucket
+        refill = self.burst / self.rate
+        self._buckets = {user: entry for user, entry in self._buckets.items() if now - entry[1] < refill}
+
+
+def is_throttling_error(exc: BaseException) -> bool:
+    """True si la excepción (o su causa) es un error de throttling de Bedrock/botocore."""
+    while exc is not None:
+        response = getattr(exc, "response", None)
+        if isinstance(response, dict) and response.get("Error", {}).get("Code") in THROTTLING_CODES:
+            return True
+        if type(exc).__name__ in THROTTLING_CODES:
+            return True
+        exc = exc.__cause__ or exc.__context__
+    return False
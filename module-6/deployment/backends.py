@@ -0,0 +1,154 @@
+"""
+Fábrica de backends de persistencia (checkpointer + store) para el servidor FastAPI.
+
+El backend se elige con la variable de entorno MEMORY_BACKEND:
+- memory   : MemorySaver + InMemoryStore (por defecto, se pierde al reiniciar)
+- sqlite   : AsyncSqliteSaver + AsyncSqliteStore sobre un archivo en modo WAL (un solo nodo)
+- dynamodb : DynamoDBSaver (memoria corta) + MongoDBStore si hay MONGODB_URI, o DynamoDBStore (varios nodos)
+- mongodb  : MongoDBSaver + MongoDBStore sobre un único MongoClient con pool de conexiones (varios nodos)
+"""
+import os # Lectura de variables de entorno
+from contextlib import asynccontextmanager # Para abrir/cerrar conexiones junto con la aplicación
+from typing import AsyncIterator, Tuple # Tipos para anotaciones
+
+from langgraph.checkpoint.base import BaseCheckpointSaver # Interfaz común de los checkpointers
+from langgraph.store.base import BaseStore # Interfaz común de los stores
+
+# Backend seleccionado (los valores coinciden con docker-compose-dynamo.yml)
+MEMORY_BACKEND = os.environ.get("MEMORY_BACKEND", "memory").lower()
+# Tamaño máximo del pool de conexiones hacia DynamoDB/MongoDB
+BACKEND_POOL_SIZE = int(os.environ.get("BACKEND_POOL_SIZE", "32"))
+# Cuándo se escriben los checkpoints: "async" (cada paso, en segundo plano), "sync" o "exit"
+# ("exit" agrupa todas las escrituras de una ejecución en una sola al terminar)
+CHECKPOINT_DURABILITY = os.environ.get("CHECKPOINT_DURABILITY", "async")
+# Durabilidad de /invoke y /batch con history_mode="delta": con "exit" el historial del hilo (que crece
+# con cada turno) se serializa una vez por ejecución y no una vez por paso. Un fallo a mitad del turno
+# lo pierde entero (el cliente lo reintenta); /stream y /ws siguen con CHECKPOINT_DURABILITY porque
+# resume=true necesita los pasos ya completados
+DELTA_CHECKPOINT_DURABILITY = os.environ.get("DELTA_CHECKPOINT_DURABILITY", "exit")
+
+# Ruta del archivo SQLite (backend "sqlite")
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "task_maistro.db")
+# Configuración de DynamoDB (backend "dynamodb")
+DYNAMODB_ENDPOINT_URL = os.environ.get("DYNAMODB_ENDPOINT_URL") # p.ej. http://langgraph-dynamodb:8000
+DYNAMODB_CHECKPOINT_TABLE = os.environ.get("DYNAMODB_CHECKPOINT_TABLE", "langgraph-checkpoints")
+DYNAMODB_STORE_TABLE = os.environ.get("DYNAMODB_STORE_TABLE", "langgraph-store")
+AWS_REGION = os.environ.get("AWS_DEFAULT_REGION", "us-east-1")
+# Configuración de MongoDB (store del backend "dynamodb" y backend "mongodb")
+MONGODB_URI = os.environ.get("MONGODB_URI")
+MONGODB_DB = os.environ.get("MONGODB_DB", "task_maistro")
+
+BACKENDS = ("memory", "sqlite", "dynamodb", "mongodb")
+
+
+def ensure_dynamodb_checkpoint_table(client, table_name: str) -> None:
+    """Crea la tabla de checkpoints (PK/SK) si no existe, útil con DynamoDB Local."""
+    existing = client.list_tables()["TableNames"]
+    if table_name in existing:
+        return
+    client.create_table(
+        TableName=table_name,
+        KeySchema=[
+            {"AttributeName": "PK", "KeyType": "HASH"},
+            {"AttributeName": "SK", "KeyType": "RANGE"},
+        ],
+        AttributeDefinitions=[
+            {"AttributeName": "PK", "AttributeType": "S"},
+            {"AttributeName": "SK", "AttributeType": "S"},
+        ],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    client.get_waiter("table_exists").wait(TableName=table_name)
+
+
+def mongo_store(client) -> BaseStore:
+    """Crea un MongoDBStore sobre un cliente existente (batch() agrupa los puts en un bulk_write)."""
+    from langgraph.store.mongodb import MongoDBStore
+    return MongoDBStore(client[MONGODB_DB]["store"])
+
+
+@asynccontextmanager
+async def open_backends(backend: str = MEMORY_BACKEND) -> AsyncIterator[Tuple[BaseCheckpointSaver, BaseStore]]:
+    """Abre el checkpointer y el store del backend indicado y los cierra al salir."""
+    if backend not in BACKENDS:
+        raise ValueError(f"MEMORY_BACKEND desconocido: {backend} (opciones: {', '.join(BACKENDS)})")
+
+    if backend == "memory":
+        from langgraph.checkpoint.memory import MemorySaver
+        from langgraph.store.memory import InMemoryStore
+        yield MemorySaver(), InMemoryStore()
+
+    elif backend == "sqlite":
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+        from langgraph.store.sqlite import AsyncSqliteStore
+
+        async def connect(**kwargs):
+            # WAL permite lectores concurrentes mientras se escribe; NORMAL evita un fsync por commit
+            conn = await aiosqlite.connect(SQLITE_PATH, **kwargs)
+            await conn.execute("PRAGMA journal_mode=WAL")
+            await conn.execute("PRAGMA synchronous=NORMAL")
+            return conn
+
+        # Una conexión para checkpoints y otra para el store, sobre el mismo archivo
+        # (el store gestiona sus propias transacciones, por eso usa autocommit)
+        saver_conn, store_conn = await connect(), await connect(isolation_level=None)
+        try:
+            checkpointer = AsyncSqliteSaver(saver_conn)
+            await checkpointer.setup()
+            store = AsyncSqliteStore(store_conn)
+            await store.setup()
+            yield checkpointer, store
+        finally:
+            await saver_conn.close()
+            await store_conn.close()
+
+    elif backend == "dynamodb":
+        import boto3
+        from botocore.config import Config
+        from langgraph_checkpoint_aws import DynamoDBSaver, DynamoDBStore
+
+        # Un solo pool de conexiones HTTP compartido por todos los hilos del servidor
+        boto_config = Config(max_pool_connections=BACKEND_POOL_SIZE, retries={"mode": "adaptive"})
+        session = boto3.session.Session(region_name=AWS_REGION)
+        ensure_dynamodb_checkpoint_table(
+            session.client("dynamodb", endpoint_url=DYNAMODB_ENDPOINT_URL, config=boto_config),
+            DYNAMODB_CHECKPOINT_TABLE,
+        )
+        checkpointer = DynamoDBSaver(
+            DYNAMODB_CHECKPOINT_TABLE,
+            session=session,
+            endpoint_url=DYNAMODB_ENDPOINT_URL,
+            boto_config=boto_config,
+        )
+
+        if MONGODB_URI:
+            # Memoria larga en MongoDB, como se describe en docker-compose-dynamo.yml
+            from pymongo import MongoClient
+            client = MongoClient(MONGODB_URI, maxPoolSize=BACKEND_POOL_SIZE)
+            try:
+                yield checkpointer, mongo_store(client)
+            finally:
+                client.close()
+        else:
+            store = DynamoDBStore(
+                DYNAMODB_STORE_TABLE,
+                boto3_session=session,
+                endpoint_url=DYNAMODB_ENDPOINT_URL,
+                boto_config=boto_config,
+            )
+            store.setup() # Crea la tabla del store si no existe
+            yield checkpointer, store
+
+    else: # mongodb
+        from pymongo import MongoClient
+        from langgraph.checkpoint.mongodb import MongoDBSaver
+
+        if not MONGODB_URI:
+            raise ValueError("MEMORY_BACKEND=mongodb requiere la variable MONGODB_URI")
+        # Checkpointer y store comparten el mismo cliente (y por tanto el mismo pool)
+        client = MongoClient(MONGODB_URI, maxPoolSize=BACKEND_POOL_SIZE)
+        try:
+            yield MongoDBSaver(client, db_name=MONGODB_DB), mongo_store(client)
+        finally:
+            client.close()
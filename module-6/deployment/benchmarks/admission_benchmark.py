@@ -0,0 +1,92 @@
+"""
+Generador de carga en lazo abierto contra /invoke, con y sin control de admisión.
+
+Envía peticiones a un ritmo fijo (por encima de la capacidad del servidor) usando el modelo
+falso de latencia fija y compara:
+- sin admisión: todas las peticiones se aceptan y la cola crece; la latencia se dispara
+- con admisión: las que no caben se rechazan al momento (503/429) y las admitidas
+  terminan con latencia acotada, manteniendo el rendimiento útil en la capacidad del servidor
+
+Uso:
+    python benchmarks/admission_benchmark.py --delay 0.1 --rate 300 --duration 5 --max-inflight 16
+"""
+import argparse # Lectura de argumentos de línea de comandos
+import asyncio # Lanzamiento de peticiones a ritmo fijo
+import time # Medición de latencias
+from collections import Counter # Conteo de códigos de estado
+
+import httpx # Cliente HTTP asíncrono (usa la app en proceso vía ASGITransport)
+import numpy as np # Percentiles de latencia
+
+from stub_model import install_stub_model # Sustituye Bedrock por el modelo falso
+
+
+async def run_load(client: httpx.AsyncClient, label: str, rate: float, duration: float, users: int, slo: float):
+    """Lanza `rate` peticiones/s durante `duration` segundos y resume los resultados."""
+    statuses, latencies = Counter(), []
+
+    async def one(i: int):
+        start = time.perf_counter()
+        response = await client.post("/invoke", json={
+            "messages": [{"role": "user", "content": "hola"}],
+            "thread_id": f"{label}-{i}", # Un hilo distinto por petición
+            "user_id": f"user-{i % users}",
+        })
+        statuses[response.status_code] += 1
+        if response.status_code == 200:
+            latencies.append(time.perf_counter() - start)
+
+    total = int(rate * duration)
+    start = time.perf_counter()
+    tasks = []
+    for i in range(total):
+        # Lazo abierto: cada petición sale a su hora, sin esperar a las anteriores
+        delay = start + i / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(one(i)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    ok = np.array(latencies) if latencies else np.zeros(1)
+    goodput = sum(1 for latency in latencies if latency <= slo) / elapsed
+    codes = " ".join(f"{code}={count}" for code, count in sorted(statuses.items()))
+    print(f"{label:>12} {codes:>28} {np.percentile(ok, 50):>8.2f} {np.percentile(ok, 95):>8.2f} "
+          f"{len(latencies) / elapsed:>8.1f} {goodput:>10.1f}")
+
+
+async def main(args):
+    install_stub_model(delay=args.delay)
+    import server # Se importa después de instalar el stub
+    from admission import AdmissionController
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with server.lifespan(server.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+            print(f"delay del modelo = {args.delay}s, ritmo = {args.rate} req/s durante {args.duration}s, "
+                  f"GRAPH_WORKERS = {server.GRAPH_WORKERS}, SLO = {args.slo}s")
+            print(f"{'admisión':>12} {'códigos':>28} {'p50 (s)':>8} {'p95 (s)':>8} {'ok/s':>8} {'ok<SLO/s':>10}")
+
+            server.admission = AdmissionController(max_inflight=0, rate=0)
+            await run_load(client, "sin", args.rate, args.duration, args.users, args.slo)
+
+            server.admission = AdmissionController(
+                max_inflight=args.max_inflight, queue_size=args.queue_size, queue_timeout=args.queue_timeout,
+                rate=args.user_rate, burst=args.user_burst,
+            )
+            await run_load(client, "con", args.rate, args.duration, args.users, args.slo)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--delay", type=float, default=0.1, help="latencia simulada del modelo (s)")
+    parser.add_argument("--rate", type=float, default=300, help="peticiones por segundo enviadas")
+    parser.add_argument("--duration", type=float, default=5, help="duración de cada fase (s)")
+    parser.add_argument("--users", type=int, default=50, help="número de user_id distintos")
+    parser.add_argument("--slo", type=float, default=1.0, help="latencia máxima para contar una respuesta como útil (s)")
+    parser.add_argument("--max-inflight", type=int, default=16)
+    parser.add_argument("--queue-size", type=int, default=16)
+    parser.add_argument("--queue-timeout", type=float, default=0.5)
+    parser.add_argument("--user-rate", type=float, default=0, help="límite por usuario (req/s, 0 = sin límite)")
+    parser.add_argument("--user-burst", type=float, default=10)
+    asyncio.run(main(parser.parse_args()))
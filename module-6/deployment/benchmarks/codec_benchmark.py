@@ -0,0 +1,83 @@
+"""
+Microbenchmark de message_codec con cargas de 10k mensajes.
+Compara la conversión por tabla con los bucles if/elif + hasattr que tenían los endpoints.
+Con --budget-us falla (exit 1) si algún sentido supera ese coste por mensaje; sirve de
+prueba de regresión en CI.
+
+Uso:
+    python benchmarks/codec_benchmark.py --messages 10000 --budget-us 20
+"""
+import argparse # Lectura de argumentos de línea de comandos
+import sys # Código de salida
+import timeit # Medición de microbenchmarks
+
+import stub_model # noqa: F401  (añade module-6/deployment al path)
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage # Mensajes de LangChain
+
+from message_codec import to_lc_messages, messages_to_dicts # Conversión por tabla
+from server import Message # Esquema de mensaje de la API
+
+
+def legacy_to_lc(messages):
+    """Bucle if/elif que tenía /invoke antes de message_codec."""
+    lc_messages = []
+    for msg in messages:
+        if msg.role == "user" or msg.role == "human":
+            lc_messages.append(HumanMessage(content=msg.content))
+        elif msg.role == "assistant" or msg.role == "ai":
+            lc_messages.append(AIMessage(content=msg.content))
+        elif msg.role == "system":
+            lc_messages.append(SystemMessage(content=msg.content))
+        else:
+            lc_messages.append(HumanMessage(content=msg.content))
+    return lc_messages
+
+
+def legacy_to_dicts(messages):
+    """Serialización con hasattr que tenía /invoke antes de message_codec."""
+    return [
+        {
+            "role": msg.type if hasattr(msg, 'type') else "unknown",
+            "content": msg.content if hasattr(msg, 'content') else str(msg),
+        }
+        for msg in messages
+    ]
+
+
+def per_message_us(fn, arg, n: int, repeat: int) -> float:
+    """Mejor tiempo de `repeat` ejecuciones, en microsegundos por mensaje."""
+    return min(timeit.repeat(lambda: fn(arg), number=1, repeat=repeat)) / n * 1e6
+
+
+def main(args):
+    roles = ["user", "assistant", "system", "ai", "human"]
+    api_messages = [Message(role=roles[i % len(roles)], content=f"mensaje {i}") for i in range(args.messages)]
+    lc_messages = to_lc_messages(api_messages)
+
+    # Ambos caminos deben producir lo mismo
+    assert legacy_to_dicts(lc_messages) == messages_to_dicts(lc_messages)
+    assert [type(m) for m in legacy_to_lc(api_messages)] == [type(m) for m in lc_messages]
+
+    results = {
+        "entrada legacy": per_message_us(legacy_to_lc, api_messages, args.messages, args.repeat),
+        "entrada codec": per_message_us(to_lc_messages, api_messages, args.messages, args.repeat),
+        "salida legacy": per_message_us(legacy_to_dicts, lc_messages, args.messages, args.repeat),
+        "salida codec": per_message_us(messages_to_dicts, lc_messages, args.messages, args.repeat),
+    }
+    print(f"{args.messages} mensajes")
+    for name, us in results.items():
+        print(f"{name:>15}: {us:7.2f} µs/mensaje")
+
+    if args.budget_us is not None:
+        over = [name for name, us in results.items() if "codec" in name and us > args.budget_us]
+        if over:
+            print(f"REGRESIÓN: {', '.join(over)} supera {args.budget_us} µs/mensaje")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-us", type=float, default=None, help="coste máximo permitido por mensaje")
+    main(parser.parse_args())
@@ -0,0 +1,101 @@
+"""
+Compactación de tareas casi duplicadas (memory_compaction.py) y lo que ahorra en cada turno.
+
+Llena un InMemoryStore con N tareas únicas de un usuario y, para una fracción de ellas, añade
+variantes casi duplicadas (como las que deja Trustcall con enable_inserts=True). Después ejecuta
+la compactación con el modelo falso (sin latencia) y muestra:
+- documentos antes/después, grupos fusionados, grupos que mezclan tareas distintas y duplicados
+  que quedaron sin fusionar
+- bytes del JSON de la colección y tokens estimados del bloque de tareas antes/después
+- tiempo de agrupar (embeddings + similitud) y de la compactación completa
+
+Uso:
+    python benchmarks/compaction_benchmark.py --todos 100 1000 5000 --duplicate-ratio 0.3
+"""
+import argparse # Lectura de argumentos de línea de comandos
+import random # Tareas y variantes de ejemplo
+import time # Medición de tiempos
+import uuid # Claves de las tareas, como las de Trustcall
+
+from langgraph.store.memory import InMemoryStore # Store en memoria
+
+from stub_model import install_stub_model # Sustituye Bedrock por el modelo falso
+
+VERBS = ["Comprar", "Llamar", "Revisar", "Pagar", "Preparar", "Reservar", "Enviar", "Ordenar", "Limpiar",
+         "Arreglar", "Renovar", "Cancelar"]
+WORDS = ["leche", "banco", "informe", "factura", "presentación", "dentista", "paquete", "armario", "entradas",
+         "seguro", "coche", "pasaporte", "regalo", "impuestos", "jardín", "bicicleta", "nevera", "vuelo", "hotel",
+         "contrato", "gimnasio", "médico", "colegio", "cumpleaños", "abuela", "garaje", "tejado", "ordenador",
+         "impresora", "correo", "alquiler", "hipoteca", "vacunas", "perro", "gato", "zapatos", "chaqueta"]
+SUFFIXES = ["mañana", "esta semana", "urgente", "antes del viernes"]
+
+
+def fill(repository, todos: int, duplicate_ratio: float):
+    """Tareas únicas más variantes casi duplicadas; devuelve cuántas variantes se añadieron.
+
+    El campo solutions identifica la tarea original de cada documento (para medir la precisión).
+    """
+    rng = random.Random(0)
+    duplicates = 0
+    for i in range(todos):
+        task = f"{rng.choice(VERBS)} {' '.join(rng.sample(WORDS, 4))}"
+        value = {"task": task, "time_to_complete": rng.randint(5, 120), "deadline": None,
+                 "solutions": [f"Solución {i}"], "status": "not started"}
+        repository.put(str(uuid.uuid4()), value)
+        if rng.random() < duplicate_ratio:
+            repository.put(str(uuid.uuid4()), {**value, "task": f"{task} {rng.choice(SUFFIXES)}"})
+            duplicates += 1
+    return duplicates
+
+
+def cluster_quality(items, clusters):
+    """(grupos que mezclan tareas distintas, variantes que quedaron sin fusionar)."""
+    original = [item.value["solutions"][0] for item in items]
+    mixed = sum(len({original[i] for i in members}) > 1 for members in clusters)
+    merged = {i for members in clusters for i in members}
+    counts = {}
+    for name in original:
+        counts[name] = counts.get(name, 0) + 1
+    missed = sum(1 for i, name in enumerate(original) if counts[name] > 1 and i not in merged)
+    return mixed, missed
+
+
+def main(args):
+    install_stub_model(delay=0)
+    import memory_compaction
+    from todo_repository import TodoRepository
+
+    print(f"{'tareas':>7} {'docs':>13} {'grupos':>7} {'bytes':>17} {'tokens':>15} "
+          f"{'agrupar ms':>11} {'total ms':>9}")
+    for todos in args.todos:
+        store = InMemoryStore()
+        user_id = f"user-{todos}"
+        repository = TodoRepository(store, user_id, "general")
+        duplicates = fill(repository, todos, args.duplicate_ratio)
+
+        items = memory_compaction.scan(store, repository.namespace)
+        start = time.perf_counter()
+        vectors = memory_compaction.get_embeddings().embed_documents([item.value["task"] for item in items])
+        clusters = memory_compaction.find_clusters(vectors, [""] * len(items), args.threshold)
+        cluster_ms = (time.perf_counter() - start) * 1000
+        mixed, missed = cluster_quality(items, clusters)
+
+        start = time.perf_counter()
+        report = memory_compaction.compact(store, user_id, "general", "todo", args.threshold)
+        total_ms = (time.perf_counter() - start) * 1000
+        assert repository.count() == report.items_after # El índice por estado sigue al día
+
+        tokens_before = report.prompt_chars_before // memory_compaction.CHARS_PER_TOKEN
+        tokens_after = report.prompt_chars_after // memory_compaction.CHARS_PER_TOKEN
+        print(f"{todos:>7} {report.items_before:>6}→{report.items_after:<6} {report.clusters:>7} "
+              f"{report.bytes_before:>8}→{report.bytes_after:<8} {tokens_before:>7}→{tokens_after:<7} "
+              f"{cluster_ms:>11.1f} {total_ms:>9.1f}"
+              f"   (variantes: {duplicates}, grupos mezclados: {mixed}, sin fusionar: {missed})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--todos", type=int, nargs="+", default=[100, 1000, 5000], help="tareas únicas por usuario")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.3, help="fracción de tareas con una variante")
+    parser.add_argument("--threshold", type=float, default=0.85, help="similitud coseno mínima entre duplicados")
+    main(parser.parse_args())
@@ -0,0 +1,91 @@
+"""
+Benchmark del protocolo delta frente al envío del historial completo.
+Para hilos de 10, 100 y 1000 turnos mide, en un turno adicional, los bytes de
+petición/respuesta, el tiempo de servidor de cada modo (con el modelo falso) y los mensajes que
+guarda el checkpoint del hilo.
+
+- full   : el cliente reenvía todo el historial y recibe todo el historial
+- delta*: el cliente envía solo el mensaje nuevo y recibe solo los mensajes del turno, pero el hilo
+  guarda todo el historial y lo serializa en cada paso (DELTA_HISTORY_MESSAGES=0,
+  DELTA_CHECKPOINT_DURABILITY=CHECKPOINT_DURABILITY): el tiempo por turno crece con el hilo
+- delta  : la configuración por defecto; el hilo conserva DELTA_HISTORY_MESSAGES mensajes y se
+  guarda una vez por ejecución (durability="exit"), así que el tiempo por turno deja de crecer
+
+Uso:
+    python benchmarks/delta_benchmark.py --turns 10 100 1000
+"""
+import argparse # Lectura de argumentos de línea de comandos
+import asyncio # Cliente asíncrono
+import json # Tamaño de las peticiones
+import time # Medición de tiempos
+
+import httpx # Cliente HTTP (la app se ejecuta en proceso vía ASGITransport)
+
+from stub_model import install_stub_model # Sustituye Bedrock por el modelo falso
+
+TEXT = "Necesito organizar la mudanza y llamar al fontanero el martes. " # Mensaje típico de un turno
+
+
+async def seed_thread(client: httpx.AsyncClient, thread_id: str, turns: int):
+    """Crea un hilo con `turns` turnos usando el modo delta."""
+    for _ in range(turns):
+        response = await client.post("/invoke", json={
+            "messages": [{"role": "user", "content": TEXT}], "thread_id": thread_id, "history_mode": "delta",
+        })
+        response.raise_for_status()
+
+
+async def measure(client: httpx.AsyncClient, body: dict, repeats: int):
+    """Retorna (bytes de petición, bytes de respuesta, ms medios por turno, mensajes en el hilo)."""
+    request_bytes = len(json.dumps(body))
+    start = time.perf_counter()
+    for _ in range(repeats):
+        response = await client.post("/invoke", json=body)
+        response.raise_for_status()
+    elapsed_ms = (time.perf_counter() - start) * 1000 / repeats
+    state = await client.get(f"/threads/{body['thread_id']}/state", params={"fields": "values"})
+    return request_bytes, len(response.content), elapsed_ms, len(state.json()["values"]["messages"])
+
+
+async def main(args):
+    install_stub_model(delay=0.0)
+    import server
+    from server import app, lifespan
+    # Configuración por defecto de delta (para restaurarla tras medir delta*)
+    bounded = (server.DELTA_HISTORY_MESSAGES, server.DELTA_CHECKPOINT_DURABILITY)
+    unbounded = (0, server.CHECKPOINT_DURABILITY)
+
+    async with lifespan(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", timeout=None) as client:
+            print(f"{'turnos':>7} {'modo':>6} {'req bytes':>10} {'resp bytes':>11} {'ms/turno':>9} {'mensajes hilo':>14}"
+                  f"  (DELTA_HISTORY_MESSAGES={bounded[0]})")
+            for turns in args.turns:
+                # Historial equivalente al que guardaría un cliente en modo full
+                history = []
+                for _ in range(turns):
+                    history += [{"role": "user", "content": TEXT}, {"role": "assistant", "content": "ok"}]
+
+                # full: hilo nuevo cada vez (si no, el historial reenviado se duplicaría en el checkpoint)
+                full = await measure(client, {
+                    "messages": history + [{"role": "user", "content": TEXT}], "thread_id": f"full-{turns}-{time.time()}",
+                }, 1)
+
+                # delta* y delta: hilo con `turns` turnos ya guardados; solo viaja el mensaje nuevo
+                results = {"full": full}
+                for mode, (window, durability) in (("delta*", unbounded), ("delta", bounded)):
+                    server.DELTA_HISTORY_MESSAGES, server.DELTA_CHECKPOINT_DURABILITY = window, durability
+                    thread_id = f"{mode}-{turns}"
+                    await seed_thread(client, thread_id, turns)
+                    results[mode] = await measure(client, {
+                        "messages": [{"role": "user", "content": TEXT}], "thread_id": thread_id, "history_mode": "delta",
+                    }, args.repeats)
+
+                for mode, (req, resp, ms, stored) in results.items():
+                    print(f"{turns:>7} {mode:>6} {req:>10} {resp:>11} {ms:>9.2f} {stored:>14}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeats", type=int, default=20, help="turnos delta medidos por tamaño")
+    asyncio.run(main(parser.parse_args()))
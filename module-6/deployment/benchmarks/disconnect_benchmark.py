@@ -0,0 +1,93 @@
+"""
+Comprueba que /stream deja de consumir trabajo cuando el cliente se desconecta.
+
+Arranca el servidor con uvicorn en este mismo proceso y un modelo falso que siempre pide
+UpdateMemory, de modo que cada ejecución encadena decenas de llamadas al modelo.
+Compara las llamadas al modelo de:
+- un cliente que lee el stream completo
+- un cliente que cierra la conexión tras los primeros eventos
+y después retoma la ejecución abandonada con resume=true desde su último checkpoint.
+
+Uso:
+    python benchmarks/disconnect_benchmark.py --delay 0.05 --events 2
+"""
+import argparse # Lectura de argumentos de línea de comandos
+import asyncio # Servidor y cliente en el mismo event loop
+import time # Medición de tiempos
+
+import httpx # Cliente HTTP real (la desconexión llega al servidor como en producción)
+import uvicorn # Servidor ASGI
+
+from stub_model import install_stub_model # Sustituye Bedrock por el modelo falso
+
+
+async def stream(client: httpx.AsyncClient, body: dict, max_events: int = None) -> int:
+    """Lee eventos de /stream; con `max_events` cierra la conexión tras leer ese número."""
+    events = 0
+    async with client.stream("POST", "/stream?stream_mode=updates", json=body) as response:
+        async for line in response.aiter_lines():
+            if line:
+                events += 1
+            if max_events is not None and events >= max_events:
+                break # Salir del bloque cierra la conexión
+    return events
+
+
+async def wait_until_idle(stub, settle: float) -> int:
+    """Espera a que el modelo deje de recibir llamadas y retorna el total."""
+    while True:
+        before = stub.calls
+        await asyncio.sleep(settle)
+        if stub.calls == before:
+            return stub.calls
+
+
+async def main(args):
+    stub = install_stub_model(delay=args.delay, tool_update_type="instructions")
+    stub.tool_turns = args.turns
+    import server # Se importa después de instalar el stub
+
+    config = uvicorn.Config(server.app, host="127.0.0.1", port=args.port, log_level="warning")
+    uvicorn_server = uvicorn.Server(config)
+    serving = asyncio.ensure_future(uvicorn_server.serve())
+    while not uvicorn_server.started:
+        await asyncio.sleep(0.05)
+
+    settle = max(4 * args.delay, 0.2)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=None) as client:
+            body = {"messages": [{"role": "user", "content": "hola"}], "thread_id": "completo"}
+            start = time.perf_counter()
+            events = await stream(client, body)
+            full_calls = await wait_until_idle(stub, settle)
+            print(f"cliente conectado    : {events} eventos, {full_calls} llamadas al modelo, "
+                  f"{time.perf_counter() - start:.2f}s")
+
+            stub.calls = 0
+            body = {"messages": [{"role": "user", "content": "hola"}], "thread_id": "abandonado"}
+            events = await stream(client, body, max_events=args.events)
+            disconnected_calls = await wait_until_idle(stub, settle)
+            print(f"cliente desconectado : {events} eventos, {disconnected_calls} llamadas al modelo "
+                  f"({full_calls - disconnected_calls} evitadas)")
+
+            state = await server.compiled_graph.aget_state({"configurable": {"thread_id": "abandonado"}})
+            print(f"checkpoint abandonado: {len(state.values['messages'])} mensajes, pendiente = {state.next}")
+
+            stub.calls = 0
+            events = await stream(client, {**body, "messages": [], "resume": True})
+            await wait_until_idle(stub, settle)
+            state = await server.compiled_graph.aget_state({"configurable": {"thread_id": "abandonado"}})
+            print(f"tras resume=true     : {events} eventos, {stub.calls} llamadas, "
+                  f"{len(state.values['messages'])} mensajes en el checkpoint")
+    finally:
+        uvicorn_server.should_exit = True
+        await serving
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--delay", type=float, default=0.05, help="latencia simulada del modelo (s)")
+    parser.add_argument("--turns", type=int, default=40, help="llamadas al modelo que piden UpdateMemory por ejecución")
+    parser.add_argument("--events", type=int, default=2, help="eventos leídos antes de desconectarse")
+    parser.add_argument("--port", type=int, default=8765)
+    asyncio.run(main(parser.parse_args()))
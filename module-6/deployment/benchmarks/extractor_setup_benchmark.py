@@ -0,0 +1,64 @@
+"""
+Coste de preparar el extractor de Trustcall de las tareas en cada llamada a update_todos.
+
+Compara, sin invocar el modelo:
+- crear: create_extractor(model, tools=[ToDo], ...) + callback, lo que hacía update_todos en cada turno
+- registro: get_todo_extractor() memoizado + callback, lo que hace ahora
+
+y después el nodo update_todos completo con el modelo falso sin latencia, para ver qué parte
+del turno era preparación.
+
+Uso:
+    python benchmarks/extractor_setup_benchmark.py --repeat 200
+"""
+import argparse # Lectura de argumentos de línea de comandos
+import time # Medición de tiempos
+
+from langchain_core.messages import AIMessage, HumanMessage # Estado de entrada del nodo
+from langgraph.store.memory import InMemoryStore # Store en memoria
+
+from stub_model import install_stub_model # Sustituye Bedrock por el modelo falso
+
+
+def timed(fn, repeat: int) -> float:
+    """Milisegundos por llamada (media de `repeat`)."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main(args):
+    install_stub_model(delay=0)
+    import task_maistro
+    from trustcall import create_extractor
+
+    def create():
+        recorder = task_maistro.ToolCallRecorder()
+        return create_extractor(
+            task_maistro.get_model(), tools=[task_maistro.ToDo], tool_choice="ToDo", enable_inserts=True,
+        ), recorder.attach()
+
+    def registry():
+        recorder = task_maistro.ToolCallRecorder()
+        return task_maistro.get_todo_extractor(), recorder.attach()
+
+    store = InMemoryStore()
+    state = {"messages": [
+        HumanMessage(content="Tengo que llevar la bici al taller"),
+        AIMessage(content="", tool_calls=[{"name": "UpdateMemory", "args": {"update_type": "todo"}, "id": "call_1"}]),
+    ]}
+    config = {"configurable": {"user_id": "bench", "todo_category": "general"}}
+
+    registry() # La primera llamada construye el extractor (lo hace warm_up al arrancar el servidor)
+    print(f"{'preparación':>12} {'ms/llamada':>12}")
+    print(f"{'crear':>12} {timed(create, args.repeat):>12.3f}")
+    print(f"{'registro':>12} {timed(registry, args.repeat):>12.3f}")
+    node = timed(lambda: task_maistro.update_todos(state, config, store), max(args.repeat // 10, 1))
+    print(f"\nupdate_todos completo (modelo sin latencia): {node:.3f} ms/llamada")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=200, help="llamadas medidas por modo")
+    main(parser.parse_args())
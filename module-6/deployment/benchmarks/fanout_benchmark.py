@@ -0,0 +1,64 @@
+"""
+Mide el reparto en paralelo (Send) de varias llamadas a UpdateMemory en un mismo turno.
+
+El modelo falso pide actualizar varias memorias en cada turno (por defecto perfil y tareas, con
+extracciones de Trustcall reales sobre el stub) y se compara:
+- secuencial: el modelo pide una actualización por mensaje, cada una con su vuelta a task_mAIstro
+  (lo que había que hacer cuando route_message solo atendía tool_calls[0])
+- paralelo: todas las llamadas en un mensaje; route_message las reparte con Send y sus
+  respuestas vuelven juntas a task_mAIstro
+
+Uso:
+    python benchmarks/fanout_benchmark.py --delay 0.1 --turns 20 --types user,todo
+"""
+import argparse # Lectura de argumentos de línea de comandos
+import asyncio # Cliente asíncrono
+import time # Medición de latencias
+
+import httpx # Cliente HTTP asíncrono (usa la app en proceso vía ASGITransport)
+import numpy as np # Percentiles de latencia
+
+from stub_model import install_stub_model # Sustituye Bedrock por el modelo falso
+
+
+async def run_turns(client: httpx.AsyncClient, label: str, turns: int):
+    """Un turno por usuario nuevo (Trustcall crea los documentos en vez de parchearlos)."""
+    latencies = []
+    for i in range(turns):
+        start = time.perf_counter()
+        response = await client.post("/invoke", json={
+            "messages": [{"role": "user", "content": "Soy Ana, vivo en Bogotá y tengo que llevar la bici al taller"}],
+            "thread_id": f"{label}-{i}",
+            "user_id": f"{label}-user-{i}",
+        })
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies)
+
+
+async def main(args):
+    stub = install_stub_model(delay=args.delay, tool_update_type=args.types)
+    stub.tool_turns = 10 ** 9
+    stub.reply_after_tool = True
+    stub.tool_call_text = "" # El modelo solo responde al usuario tras las actualizaciones
+    import server # Se importa después de instalar el stub
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with server.lifespan(server.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+            print(f"delay del modelo = {args.delay}s, tipos = {args.types}, turnos = {args.turns}")
+            print(f"{'modo':>12} {'p50 (ms)':>10} {'p95 (ms)':>10} {'llamadas/turno':>15}")
+            for label, parallel in (("secuencial", False), ("paralelo", True)):
+                stub.parallel_tool_calls = parallel
+                stub.calls = 0
+                latencies = await run_turns(client, label, args.turns)
+                print(f"{label:>12} {np.percentile(latencies, 50) * 1000:>10.1f} "
+                      f"{np.percentile(latencies, 95) * 1000:>10.1f} {stub.calls / args.turns:>15.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--delay", type=float, default=0.1, help="latencia simulada del modelo (s)")
+    parser.add_argument("--turns", type=int, default=20, help="turnos por modo")
+    parser.add_argument("--types", default="user,todo", help="tipos de memoria pedidos en cada turno")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,110 @@
+"""
+Perfil del arranque en frío del servidor (lo que paga cada contenedor nuevo).
+
+Mide en procesos nuevos:
+- el tiempo de `import task_maistro` y de `import server`
+- los módulos más costosos según `python -X importtime`
+- el tiempo desde que arranca el proceso hasta que /health (liveness) y /ready (readiness)
+  responden 200 con uvicorn
+
+Uso:
+    python benchmarks/import_profile.py --runs 5
+"""
+import argparse # Lectura de argumentos de línea de comandos
+import os # Rutas y entorno de los procesos hijos
+import statistics # Mediana de varias ejecuciones
+import subprocess # Cada medición se hace en un intérprete nuevo
+import sys # Intérprete actual
+import time # Medición de tiempos
+import urllib.request # Sondeo de /health y /ready sin dependencias
+
+DEPLOYMENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SCRIPT = """
+import time
+start = time.perf_counter()
+import task_maistro
+middle = time.perf_counter()
+import server
+print(middle - start, time.perf_counter() - middle)
+"""
+
+
+def run_python(args, **kwargs) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], cwd=DEPLOYMENT_DIR, capture_output=True, text=True, **kwargs)
+
+
+def import_times(runs: int):
+    """Mediana del tiempo de importación de task_maistro y del resto de server."""
+    samples = [tuple(map(float, run_python(["-c", IMPORT_SCRIPT]).stdout.split())) for _ in range(runs)]
+    return statistics.median(s[0] for s in samples), statistics.median(s[1] for s in samples)
+
+
+def top_imports(limit: int, parents=("server", "task_maistro")):
+    """Importaciones directas de server y task_maistro con mayor tiempo acumulado (según -X importtime)."""
+    stderr = run_python(["-X", "importtime", "-c", "import server"]).stderr
+    # -X importtime escribe cada módulo después de sus dependencias, sangrado según la profundidad
+    pending = {} # profundidad → filas que esperan a su módulo padre
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        row = (int(cumulative_us), int(self_us), name.strip())
+        children = pending.pop(depth + 1, [])
+        if row[2] in parents:
+            rows.extend((cumulative, own, f"{row[2]} → {child}") for cumulative, own, child in children)
+        pending.setdefault(depth, []).append(row)
+    return sorted(rows, reverse=True)[:limit]
+
+
+def wait_for(url: str, deadline: float) -> float:
+    """Sondea `url` hasta obtener 200 y retorna el instante en que respondió."""
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return time.perf_counter()
+        except OSError:
+            pass
+        time.sleep(0.01)
+    raise TimeoutError(url)
+
+
+def time_to_ready(port: int):
+    """Segundos hasta que /health y /ready responden 200 en un proceso recién arrancado."""
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "server.py", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=DEPLOYMENT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        health = wait_for(f"http://127.0.0.1:{port}/health", start + 60)
+        ready = wait_for(f"http://127.0.0.1:{port}/ready", start + 60)
+        return health - start, ready - start
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main(args):
+    task_maistro_s, server_s = import_times(args.runs)
+    print(f"import task_maistro : {task_maistro_s * 1000:7.0f} ms (mediana de {args.runs})")
+    print(f"import server (resto): {server_s * 1000:7.0f} ms")
+
+    print(f"\n{'acumulado (ms)':>15} {'propio (ms)':>12}  módulo")
+    for cumulative_us, self_us, name in top_imports(args.top):
+        print(f"{cumulative_us / 1000:>15.1f} {self_us / 1000:>12.1f}  {name}")
+
+    samples = [time_to_ready(args.port) for _ in range(args.runs)]
+    print(f"\nproceso → /health 200: {statistics.median(s[0] for s in samples) * 1000:7.0f} ms")
+    print(f"proceso → /ready 200 : {statistics.median(s[1] for s in samples) * 1000:7.0f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5, help="repeticiones por medición")
+    parser.add_argument("--top", type=int, default=10, help="módulos a mostrar en el perfil")
+    parser.add_argument("--port", type=int, default=8766)
+    main(parser.parse_args())
@@ -0,0 +1,61 @@
+"""
+Benchmark de la codificación de respuestas: camino original (validación Pydantic de
+InvokeResponse + JSONResponse, y json.dumps para NDJSON) frente a FastJSONResponse /
+encode_ndjson (orjson si está instalado).
+
+Uso:
+    python benchmarks/json_benchmark.py --messages 100 1000 10000
+"""
+import argparse # Lectura de argumentos de línea de comandos
+import json # Camino original de NDJSON
+import timeit # Medición de microbenchmarks
+
+import stub_model # noqa: F401  (añade module-6/deployment al path)
+from fastapi.encoders import jsonable_encoder # Lo que FastAPI aplica a los response_model
+from fastapi.responses import JSONResponse # Respuesta JSON estándar
+
+from server import InvokeResponse, FastJSONResponse, encode_ndjson, orjson # Camino rápido
+
+
+def legacy_response(messages):
+    """Lo que hacía /invoke: validar InvokeResponse, codificarlo y renderizarlo con json."""
+    return JSONResponse(jsonable_encoder(InvokeResponse(messages=messages))).body
+
+
+def fast_response(messages):
+    return FastJSONResponse({"messages": messages}).body
+
+
+def legacy_ndjson(events):
+    return [(json.dumps(event) + "\n").encode("utf-8") for event in events]
+
+
+def fast_ndjson(events):
+    return [encode_ndjson(event) for event in events]
+
+
+def best_ms(fn, arg, repeat: int) -> float:
+    return min(timeit.repeat(lambda: fn(arg), number=1, repeat=repeat)) * 1000
+
+
+def main(args):
+    print(f"orjson {'disponible' if orjson else 'NO instalado (se usa json)'}")
+    print(f"{'mensajes':>9} {'resp legacy':>12} {'resp rápida':>12} {'ndjson legacy':>14} {'ndjson rápido':>14}  (ms)")
+    for n in args.messages:
+        messages = [
+            {"role": "human" if i % 2 == 0 else "ai", "content": f"Mensaje número {i} con algo de texto. " * 4}
+            for i in range(n)
+        ]
+        events = [{"event": "update", "nodes": {"task_mAIstro": {"messages": [m]}}} for m in messages]
+        assert json.loads(legacy_response(messages)) == json.loads(fast_response(messages))
+        print(f"{n:>9} {best_ms(legacy_response, messages, args.repeat):>12.2f} "
+              f"{best_ms(fast_response, messages, args.repeat):>12.2f} "
+              f"{best_ms(legacy_ndjson, events, args.repeat):>14.2f} "
+              f"{best_ms(fast_ndjson, events, args.repeat):>14.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
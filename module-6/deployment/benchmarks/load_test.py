@@ -0,0 +1,53 @@
+"""
+Prueba de carga de /invoke con un modelo falso de latencia fija.
+Muestra cómo escalan las peticiones por segundo al aumentar la concurrencia.
+
+Uso:
+    python benchmarks/load_test.py --delay 0.1 --requests 64
+"""
+import argparse # Lectura de argumentos de línea de comandos
+import asyncio # Lanzamiento concurrente de peticiones
+import time # Medición del tiempo total
+
+import httpx # Cliente HTTP asíncrono (usa la app en proceso vía ASGITransport)
+
+from stub_model import install_stub_model # Sustituye Bedrock por el modelo falso
+
+
+async def run_level(client: httpx.AsyncClient, concurrency: int, total: int) -> float:
+    """Lanza `total` peticiones con `concurrency` en vuelo y retorna las peticiones por segundo."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            response = await client.post("/invoke", json={
+                "messages": [{"role": "user", "content": "hola"}],
+                "thread_id": f"load-{concurrency}-{i}", # Un hilo distinto por petición
+            })
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return total / (time.perf_counter() - start)
+
+
+async def main(args):
+    install_stub_model(delay=args.delay)
+    from server import app, lifespan # Se importa después de instalar el stub
+
+    transport = httpx.ASGITransport(app=app)
+    async with lifespan(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+            print(f"delay del modelo = {args.delay}s, peticiones por nivel = {args.requests}")
+            print(f"{'concurrencia':>12} {'req/s':>10}")
+            for concurrency in args.levels:
+                rps = await run_level(client, concurrency, args.requests)
+                print(f"{concurrency:>12} {rps:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--delay", type=float, default=0.1, help="latencia simulada del modelo (s)")
+    parser.add_argument("--requests", type=int, default=64, help="peticiones por nivel de concurrencia")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,89 @@
+"""
+Coste de montar el mensaje del sistema de task_mAIstro para usuarios con muchas tareas.
+
+Llena un InMemoryStore con N tareas (estados y fechas límite aleatorios) y compara por turno:
+- búsqueda completa: tres store.search (todas las tareas) y MODEL_SYSTEM_MESSAGE.format en cada turno
+- caché (fallo): primera lectura tras una escritura (bump_version), con el límite de tareas
+- caché (acierto): turno sin cambios en la memoria, solo se lee la versión
+
+También muestra el tamaño del prompt resultante (caracteres) con cada límite de tareas.
+
+Uso:
+    python benchmarks/memory_context_benchmark.py --todos 100 1000 --limit 10
+"""
+import argparse # Lectura de argumentos de línea de comandos
+import random # Tareas de ejemplo
+import time # Medición de tiempos
+import uuid # Claves de las tareas
+from datetime import datetime, timedelta # Fechas límite de ejemplo
+
+from langgraph.store.memory import InMemoryStore # Store en memoria
+
+import stub_model # noqa: F401 (añade el directorio del despliegue al path)
+import task_maistro
+from memory_context import bump_version
+
+STATUSES = ["not started", "in progress", "done", "archived"]
+
+
+def fill_store(store, user_id: str, todos: int):
+    rng = random.Random(0)
+    store.put(("profile", "general", user_id), "profile", {"name": "Ana", "location": "Bogotá", "interests": ["ciclismo"]})
+    store.put(("instructions", "general", user_id), "user_instructions", {"memory": "Añade siempre una fecha límite"})
+    for i in range(todos):
+        deadline = datetime(2026, 1, 1) + timedelta(days=rng.randint(0, 365)) if rng.random() < 0.7 else None
+        store.put(("todo", "general", user_id), str(uuid.uuid4()), {
+            "task": f"Tarea {i}", "time_to_complete": rng.randint(5, 120),
+            "deadline": deadline.isoformat() if deadline else None,
+            "solutions": [f"Solución {i}"], "status": rng.choice(STATUSES),
+        })
+    bump_version(store, user_id, "general")
+
+
+def full_search(store, user_id: str) -> str:
+    """Montaje sin caché: lee todo el store y formatea el prompt en cada turno."""
+    profile = store.search(("profile", "general", user_id))
+    todos = store.search(("todo", "general", user_id), limit=100_000)
+    instructions = store.search(("instructions", "general", user_id))
+    return task_maistro.MODEL_SYSTEM_MESSAGE.format(
+        task_maistro_role="role", user_profile=profile[0].value if profile else None,
+        todo="\n".join(f"{mem.value}" for mem in todos), instructions=instructions[0].value if instructions else "",
+    )
+
+
+def timed(fn, repeat: int) -> float:
+    """Milisegundos por llamada (media de `repeat`)."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main(args):
+    print(f"{'tareas':>7} {'modo':>22} {'ms/turno':>10} {'chars prompt':>13}")
+    for todos in args.todos:
+        store = InMemoryStore()
+        user_id = f"user-{todos}"
+        fill_store(store, user_id, todos)
+        build = lambda limit: task_maistro.build_system_message(store, user_id, "general", "role", limit)
+
+        def miss():
+            bump_version(store, user_id, "general")
+            return build(args.limit)
+
+        rows = [
+            ("búsqueda completa", timed(lambda: full_search(store, user_id), args.repeat), len(full_search(store, user_id))),
+            (f"caché fallo (≤{args.limit})", timed(miss, args.repeat), len(build(args.limit))),
+            (f"caché acierto (≤{args.limit})", timed(lambda: build(args.limit), args.repeat), len(build(args.limit))),
+            ("caché acierto (todas)", timed(lambda: build(0), args.repeat), len(build(0))),
+        ]
+        for name, ms, chars in rows:
+            print(f"{todos:>7} {name:>22} {ms:>10.3f} {chars:>13}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--todos", type=int, nargs="+", default=[100, 1000], help="tareas por usuario")
+    parser.add_argument("--limit", type=int, default=10, help="máximo de tareas en el prompt")
+    parser.add_argument("--repeat", type=int, default=50, help="turnos medidos por modo")
+    main(parser.parse_args())
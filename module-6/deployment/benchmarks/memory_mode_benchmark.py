@@ -0,0 +1,94 @@
+"""
+Compara la latencia por turno de /invoke con memory_update_mode "inline" y "background".
+
+Usa el modelo falso con latencia fija; en cada turno pide una actualización de memoria
+(update_type "instructions", la única que no necesita Trustcall) y responde tras la herramienta:
+- inline: llamada con la tool call + actualización (otra llamada) + respuesta final
+- background: llamada con la tool call y la respuesta en el mismo mensaje; la actualización
+  se encola y la aplica MemoryJobWorker después de responder
+
+Al final espera a que el worker vacíe la cola y comprueba que no quedan trabajos pendientes
+ni fallidos y que cada usuario vio sus actualizaciones en el orden de sus turnos.
+
+Uso:
+    python benchmarks/memory_mode_benchmark.py --delay 0.1 --turns 30 --users 4
+"""
+import argparse # Lectura de argumentos de línea de comandos
+import asyncio # Turnos concurrentes de varios usuarios
+import os # El modo se lee de MEMORY_UPDATE_MODE en cada ejecución
+import time # Medición de latencias
+
+import httpx # Cliente HTTP asíncrono (usa la app en proceso vía ASGITransport)
+import numpy as np # Percentiles de latencia
+
+from stub_model import install_stub_model # Sustituye Bedrock por el modelo falso
+
+
+async def run_turns(client: httpx.AsyncClient, label: str, turns: int, users: int):
+    """Cada usuario envía `turns` turnos seguidos a su hilo; retorna las latencias."""
+    latencies = []
+
+    async def user_turns(u: int):
+        for i in range(turns):
+            start = time.perf_counter()
+            response = await client.post("/invoke", json={
+                "messages": [{"role": "user", "content": f"turno {i}"}],
+                "thread_id": f"{label}-{u}",
+                "user_id": f"{label}-user-{u}",
+            })
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(user_turns(u) for u in range(users)))
+    return np.array(latencies)
+
+
+async def main(args):
+    stub = install_stub_model(delay=args.delay, tool_update_type="instructions")
+    stub.tool_turns = 10 ** 9
+    stub.reply_after_tool = True
+    import server # Se importa después de instalar el stub
+
+    # Registra el orden en que el worker aplica las actualizaciones de cada usuario
+    applied = {}
+    update_instructions = server.MEMORY_UPDATE_NODES["instructions"]
+
+    def recording_update(state, config, store):
+        turn = int(state["messages"][-2].content.split()[-1]) # Último mensaje humano: "turno i"
+        applied.setdefault(config["configurable"]["user_id"], []).append(turn)
+        return update_instructions(state, config, store)
+
+    server.MEMORY_UPDATE_NODES["instructions"] = recording_update
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with server.lifespan(server.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+            print(f"delay del modelo = {args.delay}s, {args.users} usuarios x {args.turns} turnos")
+            print(f"{'modo':>12} {'p50 (ms)':>10} {'p95 (ms)':>10} {'llamadas/turno':>15}")
+            for mode in ("inline", "background"):
+                os.environ["MEMORY_UPDATE_MODE"] = mode
+                # En background el modelo escribe la respuesta junto a la tool call (sin llamada extra)
+                stub.tool_call_text = "" if mode == "inline" else None
+                stub.calls = 0
+                latencies = await run_turns(client, mode, args.turns, args.users)
+                calls = stub.calls / (args.turns * args.users)
+                print(f"{mode:>12} {np.percentile(latencies, 50) * 1000:>10.1f} "
+                      f"{np.percentile(latencies, 95) * 1000:>10.1f} {calls:>15.1f}")
+
+            start = time.perf_counter()
+            await server.app.state.memory_worker.join()
+            print(f"\ncola vaciada {(time.perf_counter() - start) * 1000:.0f} ms después del último turno")
+            store = server.compiled_graph.store
+            pending = await store.asearch(("memory_jobs",), limit=10)
+            failed = await store.asearch(("memory_jobs_failed",), limit=10)
+            print(f"trabajos pendientes = {len(pending)}, fallidos = {len(failed)}")
+            in_order = sum(turns == list(range(args.turns)) for turns in applied.values())
+            print(f"usuarios con todas sus actualizaciones en orden = {in_order}/{args.users}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--delay", type=float, default=0.1, help="latencia simulada del modelo (s)")
+    parser.add_argument("--turns", type=int, default=30, help="turnos por usuario")
+    parser.add_argument("--users", type=int, default=4, help="usuarios concurrentes")
+    asyncio.run(main(parser.parse_args()))
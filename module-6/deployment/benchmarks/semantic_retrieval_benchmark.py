@@ -0,0 +1,91 @@
+"""
+Recuperación semántica top-k frente a inyectar todas las tareas en el prompt.
+
+Llena un InMemoryStore con N tareas por usuario y, para varias consultas cuya respuesta es una
+tarea concreta ("aguja"), compara el mensaje del sistema de task_mAIstro (build_system_message):
+- todas: todo_prompt_limit=0, todas las tareas en el prompt (lo que hacía task_mAIstro)
+- top-k: todo_prompt_limit=k, las k tareas más parecidas al último mensaje (índice vectorial de
+  memory_context con HashingEmbeddings)
+
+Muestra el tiempo por turno con la caché de memoria caliente, los caracteres del prompt y si la
+aguja está en el prompt (recall@k). También el coste de construir el índice la primera vez y de
+reconstruirlo después de modificar una tarea (solo se calcula el embedding de esa tarea).
+
+Uso:
+    python benchmarks/semantic_retrieval_benchmark.py --memories 100 1000 10000 --k 10
+"""
+import argparse # Lectura de argumentos de línea de comandos
+import random # Tareas de relleno
+import time # Medición de tiempos
+
+from langgraph.store.memory import InMemoryStore # Store en memoria
+
+from stub_model import install_stub_model # Sustituye Bedrock por el modelo falso
+
+FILLER = ["revisar", "correo", "informe", "pagar", "factura", "comprar", "regalo", "ordenar", "armario",
+          "preparar", "presentación", "llamar", "banco", "actualizar", "hoja", "cálculo", "limpiar", "garaje"]
+# (tarea aguja, consulta del usuario que debería recuperarla)
+NEEDLES = [
+    ("Renovar el pasaporte antes del viaje a Japón", "¿qué tenía que hacer con el pasaporte?"),
+    ("Llevar al perro Toby al veterinario", "tengo que llevar a Toby al veterinario"),
+    ("Cambiar el aceite de la moto", "recuérdame lo de la moto"),
+    ("Reservar mesa para el aniversario", "ya reservé la mesa del aniversario"),
+]
+
+
+def fill(store: InMemoryStore, namespace, memories: int):
+    rng = random.Random(0)
+    for i in range(memories - len(NEEDLES)):
+        store.put(namespace, f"t{i}", {"task": " ".join(rng.sample(FILLER, 4)) + f" {i}", "status": "not started"})
+    for i, (task, _) in enumerate(NEEDLES):
+        store.put(namespace, f"aguja{i}", {"task": task, "status": "not started"})
+
+
+def main(args):
+    install_stub_model(delay=0)
+    import task_maistro
+    from memory_context import bump_version
+
+    def turn(store, user_id, query, limit):
+        return task_maistro.build_system_message(store, user_id, "general", "", limit, query)
+
+    print(f"{'memorias':>9} {'modo':>6} {'ms/turno':>9} {'chars':>9} {'recall@k':>9}  (k = {args.k})")
+    for memories in args.memories:
+        store = InMemoryStore()
+        user_id = f"user-{memories}"
+        namespace = ("todo", "general", user_id)
+        fill(store, namespace, memories)
+        bump_version(store, user_id, "general")
+
+        for name, limit in (("todas", 0), ("top-k", args.k)):
+            turn(store, user_id, NEEDLES[0][1], limit) # Carga la caché (y el índice)
+            hits, chars = 0, 0
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                for i, (task, query) in enumerate(NEEDLES):
+                    prompt = turn(store, user_id, query, limit)
+                    hits += task in prompt
+                    chars += len(prompt)
+            turns = args.repeat * len(NEEDLES)
+            ms = (time.perf_counter() - start) / turns * 1000
+            print(f"{memories:>9} {name:>6} {ms:>9.3f} {chars // turns:>9} {hits / turns:>9.2f}")
+
+        # Índice desde cero (caché vacía) y tras modificar una tarea (solo se calcula ese embedding)
+        task_maistro.memory_context_cache = type(task_maistro.memory_context_cache)()
+        start = time.perf_counter()
+        turn(store, user_id, NEEDLES[0][1], args.k)
+        cold_ms = (time.perf_counter() - start) * 1000
+        store.put(namespace, "t0", {"task": "Comprar pilas para el mando", "status": "not started"})
+        bump_version(store, user_id, "general")
+        start = time.perf_counter()
+        turn(store, user_id, NEEDLES[0][1], args.k)
+        update_ms = (time.perf_counter() - start) * 1000
+        print(f"{'':>9} índice desde cero {cold_ms:.1f} ms, tras modificar una tarea {update_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--memories", type=int, nargs="+", default=[100, 1000, 10000], help="tareas por usuario")
+    parser.add_argument("--k", type=int, default=10, help="tareas en el prompt por turno")
+    parser.add_argument("--repeat", type=int, default=5, help="rondas de consultas medidas por modo")
+    main(parser.parse_args())
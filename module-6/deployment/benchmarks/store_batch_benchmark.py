@@ -0,0 +1,111 @@
+"""
+Viajes al store por actualización de memoria: una escritura por documento frente a un store.batch.
+
+Ejecuta el nodo update_todos con el modelo falso configurado para que Trustcall devuelva N tareas
+nuevas, sobre un SqliteStore (archivo en disco) que cuenta las llamadas a batch() (cada get/put/
+search del store es una) y puede añadir una latencia fija por llamada para simular un store en red
+(MongoDB/DynamoDB). Compara la fase de escritura:
+- bucle: lo que hacía update_todos antes (TodoRepository.put por tarea: leer la versión del índice,
+  leer la tarea, guardarla y guardar su entrada de índice; después bump_version)
+- lote: TodoRepository.write con la versión de la memoria en el mismo lote (lo que hace ahora): un
+  solo viaje, sin leer los valores anteriores ni, tras la primera vez, la versión del índice
+
+Muestra los viajes de la fase de escritura, los del nodo completo y el tiempo por actualización.
+
+Uso:
+    python benchmarks/store_batch_benchmark.py --documents 1 5 20 50 --latency-ms 2
+"""
+import argparse # Lectura de argumentos de línea de comandos
+import os # Archivo temporal de la base de datos
+import sqlite3 # Conexión del SqliteStore
+import tempfile # Directorio para la base de datos
+import time # Medición de tiempos y latencia simulada
+
+from langchain_core.messages import AIMessage, HumanMessage # Conversación de entrada del nodo
+from langgraph.store.base import GetOp # Lecturas de la escritura de antes
+from langgraph.store.sqlite import SqliteStore # Store sobre SQLite
+
+from stub_model import install_stub_model # Sustituye Bedrock por el modelo falso
+
+
+class CountingSqliteStore(SqliteStore):
+    """SqliteStore que cuenta los viajes (llamadas a batch) y simula su latencia de red."""
+    latency = 0.0
+    round_trips = 0
+
+    def batch(self, ops):
+        self.round_trips += 1
+        time.sleep(self.latency)
+        return super().batch(ops)
+
+
+def loop_write(store, todos, documents: dict, user_id: str):
+    """Escritura de antes: cuatro viajes por tarea y uno más para la versión."""
+    from memory_context import bump_version
+    from todo_repository import INDEX_VERSION, todo_status
+    for key, value in documents.items():
+        meta = store.get(todos.index_namespace, "meta")
+        assert meta is not None and meta.value["version"] == INDEX_VERSION
+        (previous,) = store.batch([GetOp(todos.namespace, key)])
+        store.put(todos.namespace, key, value)
+        if previous is not None and todo_status(previous.value) != todo_status(value):
+            store.delete(todos._status_namespace(todo_status(previous.value)), key)
+        store.put(todos._status_namespace(todo_status(value)), key, {"deadline": value.get("deadline")}, index=False)
+    bump_version(store, user_id, "general")
+
+
+def main(args):
+    stub = install_stub_model(delay=0)
+    import task_maistro
+    from memory_context import version_op
+    from todo_repository import TodoRepository
+
+    directory = tempfile.mkdtemp()
+    conn = sqlite3.connect(os.path.join(directory, "store.db"), check_same_thread=False, isolation_level=None)
+    store = CountingSqliteStore(conn)
+    store.setup()
+    store.latency = args.latency_ms / 1000
+
+    tool_call = {"name": "UpdateMemory", "args": {"update_type": "todo"}, "id": "call_todo"}
+    state = {"messages": [HumanMessage(content="Apunta estas tareas"), AIMessage(content="", tool_calls=[tool_call])],
+             "tool_calls": [tool_call]}
+
+    print(f"{'docs':>5} {'modo':>6} {'viajes escritura':>17} {'viajes nodo':>12} {'ms escritura':>13}  "
+          f"(latencia simulada {args.latency_ms} ms/viaje)")
+    for documents in args.documents:
+        stub.extractions = documents
+        user_id = f"user-{documents}"
+        todos = TodoRepository(store, user_id, "general")
+        todos.ensure_index()
+        config = {"configurable": {"user_id": user_id}}
+        result = task_maistro.get_todo_extractor().invoke({"messages": state["messages"][:1], "existing": None})
+        assert len(result["responses"]) == documents
+
+        writes = {
+            "bucle": lambda values: loop_write(store, todos, values, user_id),
+            "lote": lambda values: todos.write(values, extra_ops=[version_op(user_id, "general")]),
+        }
+        for name, write in writes.items():
+            trips, total_ms = 0, 0.0
+            for _ in range(args.repeat):
+                values = task_maistro.extracted_documents(result) # Claves nuevas en cada repetición
+                store.round_trips = 0
+                start = time.perf_counter()
+                write(values)
+                total_ms += (time.perf_counter() - start) * 1000
+                trips += store.round_trips
+            # El nodo completo (lecturas del contexto y de las tareas abiertas incluidas) solo existe en lote
+            node_trips = "-"
+            if name == "lote":
+                store.round_trips = 0
+                task_maistro.update_todos(state, config, store)
+                node_trips = store.round_trips
+            print(f"{documents:>5} {name:>6} {trips / args.repeat:>17.0f} {node_trips:>12} {total_ms / args.repeat:>13.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, nargs="+", default=[1, 5, 20, 50], help="tareas que devuelve Trustcall")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="latencia simulada por viaje al store")
+    parser.add_argument("--repeat", type=int, default=5, help="actualizaciones medidas por modo")
+    main(parser.parse_args())
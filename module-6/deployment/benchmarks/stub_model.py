@@ -0,0 +1,101 @@
+"""
+Modelo de chat falso con latencia fija para los benchmarks del servidor.
+Sustituye a ChatBedrockConverse para medir el servidor sin llamar a AWS.
+"""
+import asyncio # Espera asíncrona para la versión async del modelo
+import os # Manipulación de rutas
+import sys # Permite añadir el directorio del despliegue al path
+import time # Simula la latencia de red de Bedrock
+import uuid # Identificadores de las tool calls simuladas
+
+from typing import Any, List, Optional # Tipos para anotaciones
+
+from langchain_core.language_models.chat_models import BaseChatModel # Clase base de los modelos de chat
+from langchain_core.messages import AIMessage, BaseMessage # Mensajes de LangChain
+from langchain_core.outputs import ChatGeneration, ChatResult # Resultado estándar de un modelo de chat
+from langchain_core.utils.function_calling import convert_to_openai_tool # Nombre de las herramientas enlazadas
+
+# Argumentos que devuelve el stub cuando Trustcall le pide extraer un Profile, un ToDo o una Memory nuevos
+EXTRACTION_ARGS = {
+    "Profile": {"name": "Ana", "location": "Bogotá", "interests": ["ciclismo"]},
+    "ToDo": {"task": "Reservar el taller de la bici", "time_to_complete": 30, "solutions": ["Taller del barrio"]},
+    "Memory": {"content": "Le gusta el ciclismo de montaña"},
+}
+
+# Añade module-6/deployment al path para poder importar task_maistro y server
+DEPLOYMENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(DEPLOYMENT_DIR)
+
+
+class StubChatModel(BaseChatModel):
+    """Modelo que responde siempre lo mismo tras `delay` segundos, sin llamadas a herramientas."""
+    delay: float = 0.05 # Latencia simulada por llamada (segundos)
+    reply: str = "ok" # Texto fijo de la respuesta
+    # Si se indica, las primeras `tool_turns` respuestas piden UpdateMemory con este update_type y el
+    # grafo encadena task_mAIstro → update_* → task_mAIstro ... (ejecuciones largas).
+    # Varios tipos separados por comas ("user,todo") piden una llamada por tipo en el mismo mensaje
+    tool_update_type: Optional[str] = None
+    tool_turns: int = 10
+    # Con reply_after_tool, tras el resultado de una herramienta responde sin pedir otra (como un modelo real)
+    reply_after_tool: bool = False
+    # Con reply_after_tool y parallel_tool_calls=False pide los tipos de uno en uno (un mensaje por tipo)
+    parallel_tool_calls: bool = True
+    tool_call_text: Optional[str] = None # Texto junto a la tool call (None = `reply`)
+    extractions: int = 1 # Documentos que crea cada llamada de un extractor de Trustcall
+    calls: int = 0 # Llamadas recibidas (para comprobar cuánto trabajo hizo el servidor)
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub-chat-model"
+
+    def bind_tools(self, tools: Any, **kwargs: Any):
+        # Guarda los nombres de las herramientas para distinguir task_mAIstro de los extractores de Trustcall
+        names = [convert_to_openai_tool(tool)["function"]["name"] for tool in tools]
+        return self.bind(stub_tools=names)
+
+    def _message(self, messages: List[BaseMessage], tools: Optional[List[str]] = None) -> AIMessage:
+        self.calls += 1
+        # Extractor de Trustcall: crea el documento pedido
+        extraction = [name for name in tools or [] if name in EXTRACTION_ARGS]
+        if extraction:
+            return AIMessage(content="", tool_calls=[{
+                "name": extraction[0], "args": EXTRACTION_ARGS[extraction[0]], "id": f"call_{uuid.uuid4().hex[:8]}",
+            } for _ in range(self.extractions)])
+        if self.tool_update_type is None or self.calls > self.tool_turns:
+            return AIMessage(content=self.reply)
+        update_types = self.tool_update_type.split(",")
+        if self.reply_after_tool:
+            # Tipos ya respondidos desde el último mensaje humano
+            answered = 0
+            for message in reversed(messages):
+                if message.type == "human":
+                    break
+                answered += message.type == "tool"
+            if self.parallel_tool_calls:
+                update_types = [] if answered else update_types
+            else:
+                update_types = update_types[answered:answered + 1]
+            if not update_types:
+                return AIMessage(content=self.reply)
+        text = self.reply if self.tool_call_text is None else self.tool_call_text
+        return AIMessage(content=text, tool_calls=[{
+            "name": "UpdateMemory", "args": {"update_type": update_type}, "id": f"call_{uuid.uuid4().hex[:8]}",
+        } for update_type in update_types])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.delay) # Bloquea el hilo igual que una llamada síncrona a boto3
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages, kwargs.get("stub_tools")))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.delay)
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages, kwargs.get("stub_tools")))])
+
+
+def install_stub_model(delay: float = 0.05, tool_update_type: Optional[str] = None) -> StubChatModel:
+    """Reemplaza el modelo activo de task_maistro por un StubChatModel y lo retorna."""
+    import task_maistro
+    stub = StubChatModel(delay=delay, tool_update_type=tool_update_type)
+    task_maistro.model = stub # Los nodos leen la variable global en cada llamada
+    return stub
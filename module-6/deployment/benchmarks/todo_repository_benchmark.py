@@ -0,0 +1,71 @@
+"""
+Qué tareas recibe el extractor de Trustcall de update_todos como `existing`, y a qué coste.
+
+Llena un InMemoryStore con N tareas de un usuario (la mayoría done/archived, como un historial
+largo) a través de TodoRepository y compara:
+- search por defecto: store.search(namespace), lo que hacía update_todos (10 tareas cualesquiera)
+- namespace completo: todas las tareas del usuario
+- índice: TodoRepository.open_items(limit), las abiertas de fecha límite más próxima
+
+Para cada una muestra el tiempo de la consulta, cuántas tareas llegan, cuántas de ellas están
+abiertas y el tamaño del `existing` serializado (caracteres que van al prompt del extractor).
+
+Uso:
+    python benchmarks/todo_repository_benchmark.py --todos 100 1000 10000 --open-ratio 0.1
+"""
+import argparse # Lectura de argumentos de línea de comandos
+import random # Tareas de ejemplo
+import time # Medición de tiempos
+import uuid # Claves de las tareas
+from datetime import datetime, timedelta # Fechas límite de ejemplo
+
+from langgraph.store.memory import InMemoryStore # Store en memoria
+
+import stub_model # noqa: F401 (añade el directorio del despliegue al path)
+from todo_repository import OPEN_STATUSES, TodoRepository, scan
+
+
+def fill(repository: TodoRepository, todos: int, open_ratio: float):
+    rng = random.Random(0)
+    for i in range(todos):
+        deadline = datetime(2026, 1, 1) + timedelta(days=rng.randint(0, 365)) if rng.random() < 0.7 else None
+        status = rng.choice(OPEN_STATUSES) if rng.random() < open_ratio else rng.choice(["done", "archived"])
+        repository.put(str(uuid.uuid4()), {
+            "task": f"Tarea {i}", "time_to_complete": rng.randint(5, 120),
+            "deadline": deadline.isoformat() if deadline else None,
+            "solutions": [f"Solución {i}"], "status": status,
+        })
+
+
+def timed(fn, repeat: int):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main(args):
+    print(f"{'tareas':>7} {'consulta':>20} {'ms':>8} {'llegan':>7} {'abiertas':>9} {'chars existing':>15}")
+    for todos in args.todos:
+        store = InMemoryStore()
+        repository = TodoRepository(store, f"user-{todos}", "general")
+        fill(repository, todos, args.open_ratio)
+        queries = [
+            ("search por defecto", lambda: store.search(repository.namespace)),
+            ("namespace completo", lambda: scan(store, repository.namespace)),
+            (f"índice (≤{args.limit})", lambda: repository.open_items(limit=args.limit)),
+        ]
+        for name, query in queries:
+            ms, items = timed(query, args.repeat)
+            opened = sum(item.value["status"] in OPEN_STATUSES for item in items)
+            chars = len(str([(item.key, "ToDo", item.value) for item in items]))
+            print(f"{todos:>7} {name:>20} {ms:>8.3f} {len(items):>7} {opened:>9} {chars:>15}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--todos", type=int, nargs="+", default=[100, 1000, 10000], help="tareas por usuario")
+    parser.add_argument("--open-ratio", type=float, default=0.1, help="fracción de tareas abiertas")
+    parser.add_argument("--limit", type=int, default=50, help="máximo de tareas abiertas para el extractor")
+    parser.add_argument("--repeat", type=int, default=20, help="consultas medidas por modo")
+    main(parser.parse_args())
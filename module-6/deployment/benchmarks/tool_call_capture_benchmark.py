@@ -0,0 +1,74 @@
+"""
+Coste de capturar las tool calls de Trustcall en update_profile/update_todos.
+
+Ejecuta el extractor de tareas con el modelo falso sin latencia y compara:
+- spy: el listener anterior (with_listeners(on_end=Spy())), que espera al árbol de ejecuciones
+  completo y lo recorre buscando las ejecuciones chat_model
+- recorder: ToolCallRecorder, un callback on_llm_end que guarda solo las tool calls
+
+Mide el tiempo por llamada y el pico de memoria asignada durante una llamada (tracemalloc).
+
+Uso:
+    python benchmarks/tool_call_capture_benchmark.py --repeat 200
+"""
+import argparse # Lectura de argumentos de línea de comandos
+import time # Medición de tiempos
+import tracemalloc # Pico de memoria por llamada
+
+from langchain_core.messages import HumanMessage # Conversación de entrada del extractor
+
+from stub_model import install_stub_model # Sustituye Bedrock por el modelo falso
+
+
+class Spy:
+    """Listener de antes: recorre el árbol de ejecuciones al terminar."""
+    def __init__(self):
+        self.called_tools = []
+
+    def __call__(self, run):
+        q = [run]
+        while q:
+            r = q.pop()
+            if r.child_runs:
+                q.extend(r.child_runs)
+            if r.run_type == "chat_model":
+                self.called_tools.append(r.outputs["generations"][0][0]["message"]["kwargs"]["tool_calls"])
+
+
+def main(args):
+    install_stub_model(delay=0)
+    import task_maistro
+
+    extractor = task_maistro.get_todo_extractor()
+    payload = {"messages": [HumanMessage(content="Tengo que llevar la bici al taller")], "existing": None}
+
+    def with_spy():
+        spy = Spy()
+        extractor.with_listeners(on_end=spy).invoke(payload)
+        return task_maistro.extract_tool_info(spy.called_tools, "ToDo")
+
+    def with_recorder():
+        recorder = task_maistro.ToolCallRecorder()
+        extractor.invoke(payload, recorder.attach())
+        return recorder.summary("ToDo")
+
+    assert with_spy() == with_recorder() # Mismo resumen para task_mAIstro
+    print(f"{'captura':>10} {'ms/llamada':>11} {'pico KiB':>9}")
+    for name, fn in (("spy", with_spy), ("recorder", with_recorder)):
+        for _ in range(10):
+            fn() # Calentamiento
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            fn()
+        ms = (time.perf_counter() - start) / args.repeat * 1000
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{name:>10} {ms:>11.3f} {peak / 1024:>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=200, help="llamadas medidas por modo")
+    main(parser.parse_args())
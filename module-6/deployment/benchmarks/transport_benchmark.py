@@ -0,0 +1,93 @@
+"""
+Compara la latencia por turno de los transportes de streaming con un servidor uvicorn real:
+- /stream (NDJSON) y /stream/sse abriendo una conexión HTTP nueva por turno
+- /stream reutilizando la conexión HTTP (keep-alive)
+- /ws: una sola conexión WebSocket para todos los turnos del hilo
+
+Usa el modelo falso (por defecto sin latencia) para que domine el coste del transporte.
+
+Uso:
+    python benchmarks/transport_benchmark.py --turns 100
+"""
+import argparse # Lectura de argumentos de línea de comandos
+import asyncio # Servidor y cliente en el mismo event loop
+import json # Mensajes del WebSocket
+import statistics # Mediana de latencias
+import time # Medición de tiempos
+
+import httpx # Cliente HTTP
+import uvicorn # Servidor ASGI
+import websockets # Cliente WebSocket (también lo usa uvicorn como servidor)
+
+from stub_model import install_stub_model # Sustituye Bedrock por el modelo falso
+
+
+async def http_turn(client: httpx.AsyncClient, path: str, thread_id: str, i: int):
+    body = {"messages": [{"role": "user", "content": f"turno {i}"}], "thread_id": thread_id, "history_mode": "delta"}
+    async with client.stream("POST", path, json=body) as response:
+        async for _ in response.aiter_bytes():
+            pass
+
+
+async def http_turns(base_url: str, path: str, turns: int, thread_id: str, keep_alive: bool = False):
+    """Latencias por turno: con un cliente nuevo por turno o reutilizando la conexión (keep-alive)."""
+    latencies = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=None) as shared:
+        for i in range(turns):
+            start = time.perf_counter()
+            if keep_alive:
+                await http_turn(shared, path, thread_id, i)
+            else:
+                async with httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+                    await http_turn(client, path, thread_id, i)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def websocket_turns(ws_url: str, turns: int, thread_id: str):
+    """Latencias por turno sobre una única conexión WebSocket."""
+    latencies = []
+    async with websockets.connect(f"{ws_url}/ws?thread_id={thread_id}") as ws:
+        for i in range(turns):
+            start = time.perf_counter()
+            await ws.send(json.dumps({"messages": [{"role": "user", "content": f"turno {i}"}]}))
+            while json.loads(await ws.recv()).get("event") != "end":
+                pass
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def main(args):
+    install_stub_model(delay=args.delay)
+    import server # Se importa después de instalar el stub
+
+    config = uvicorn.Config(server.app, host="127.0.0.1", port=args.port, log_level="warning")
+    uvicorn_server = uvicorn.Server(config)
+    serving = asyncio.ensure_future(uvicorn_server.serve())
+    while not uvicorn_server.started:
+        await asyncio.sleep(0.05)
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        print(f"turnos = {args.turns}, delay del modelo = {args.delay}s")
+        print(f"{'transporte':>22} {'p50 (ms)':>10} {'p95 (ms)':>10}")
+        results = [
+            ("/stream (NDJSON)", await http_turns(base_url, "/stream", args.turns, "bench-ndjson")),
+            ("/stream/sse", await http_turns(base_url, "/stream/sse", args.turns, "bench-sse")),
+            ("/stream (keep-alive)", await http_turns(base_url, "/stream", args.turns, "bench-keepalive", keep_alive=True)),
+            ("/ws (1 conexión)", await websocket_turns(base_url.replace("http", "ws"), args.turns, "bench-ws")),
+        ]
+        for name, latencies in results:
+            p95 = statistics.quantiles(latencies, n=20)[-1]
+            print(f"{name:>22} {statistics.median(latencies) * 1000:>10.2f} {p95 * 1000:>10.2f}")
+    finally:
+        uvicorn_server.should_exit = True
+        await serving
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=100, help="turnos por transporte")
+    parser.add_argument("--delay", type=float, default=0.0, help="latencia simulada del modelo (s)")
+    parser.add_argument("--port", type=int, default=8767)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,94 @@
+"""
+Benchmark del modo multi-worker: compara 1, 2, 4 y 8 procesos con estado compartido en SQLite.
+Cada nivel arranca el servidor real (gunicorn + uvicorn) con el modelo falso y lo carga por HTTP.
+Las peticiones llevan un historial largo para que domine el trabajo de CPU
+(conversión de mensajes, orquestación del grafo y codificación JSON).
+
+Uso:
+    python benchmarks/workers_benchmark.py --workers 1 2 4 8 --history 200
+"""
+import argparse # Lectura de argumentos de línea de comandos
+import asyncio # Lanzamiento concurrente de peticiones
+import os # Variables de entorno del servidor hijo
+import subprocess # Arranque del servidor en otro proceso
+import sys # Ruta del intérprete actual
+import tempfile # Archivo SQLite temporal compartido por los workers
+import time # Medición de tiempos
+
+import httpx # Cliente HTTP asíncrono
+
+
+def serve(port: int, workers: int, delay: float):
+    """Proceso hijo: instala el modelo falso y arranca el servidor (el stub se hereda por fork)."""
+    from stub_model import install_stub_model
+    install_stub_model(delay=delay)
+    import server
+    server.serve("127.0.0.1", port, workers)
+
+
+async def wait_until_healthy(client: httpx.AsyncClient, timeout: float = 60.0):
+    """Espera a que /health responda antes de empezar a medir."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("El servidor no arrancó a tiempo")
+
+
+async def load(base_url: str, total: int, concurrency: int, history: int) -> float:
+    """Lanza `total` peticiones con `concurrency` en vuelo y retorna las peticiones por segundo."""
+    messages = [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"mensaje {i} " * 20}
+        for i in range(history)
+    ]
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as client:
+        await wait_until_healthy(client)
+
+        async def one(i: int):
+            async with semaphore:
+                response = await client.post("/invoke", json={"messages": messages, "thread_id": f"w-{i}"})
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        return total / (time.perf_counter() - start)
+
+
+def main(args):
+    print(f"historial = {args.history} mensajes, peticiones = {args.requests}, concurrencia = {args.concurrency}")
+    print(f"{'workers':>8} {'req/s':>10}")
+    for i, workers in enumerate(args.workers):
+        port = args.port + i
+        db = tempfile.NamedTemporaryFile(suffix=".db", delete=False).name
+        env = {**os.environ, "MEMORY_BACKEND": "sqlite", "SQLITE_PATH": db}
+        proc = subprocess.Popen(
+            [sys.executable, __file__, "--serve", str(port), str(workers), str(args.delay)],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            rps = asyncio.run(load(f"http://127.0.0.1:{port}", args.requests, args.concurrency, args.history))
+            print(f"{workers:>8} {rps:>10.1f}")
+        finally:
+            proc.terminate()
+            proc.wait()
+            os.remove(db)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 5 and sys.argv[1] == "--serve":
+        serve(int(sys.argv[2]), int(sys.argv[3]), float(sys.argv[4]))
+        sys.exit(0)
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--history", type=int, default=200, help="mensajes enviados por petición")
+    parser.add_argument("--delay", type=float, default=0.0, help="latencia simulada del modelo (s)")
+    parser.add_argument("--port", type=int, default=8300)
+    main(parser.parse_args())
@@ -12,6 +12,20 @@ class Configuration:
     todo_category: str = "general" # Categoría de la lista de tareas (por defecto 'general')
     # Rol predefinido del sistema para el asistente
     task_maistro_role: str = "You are a helpful task management assistant. You help you create, organize, and manage the user's ToDo list."
+    # "inline": las memorias se actualizan antes de responder (comportamiento original)
+    # "background": se encolan (memory_jobs.py) y la respuesta no espera a Trustcall. Solo con server.py, que arranca
+    # el worker de la cola; con langgraph.json (langgraph-api) nadie procesa los trabajos y hay que usar "inline"
+    memory_update_mode: str = "inline"
+    # Máximo de tareas en el prompt (0 = todas; por entorno: TODO_PROMPT_LIMIT=0). Si hay más, las más parecidas
+    # al último mensaje (embeddings.py; con MEMORY_EMBEDDINGS=none, las abiertas por fecha límite)
+    todo_prompt_limit: int = 10
+    # Máximo de tareas abiertas que recibe el extractor de Trustcall como existentes (0 = todas; TODO_EXTRACTOR_LIMIT=0),
+    # elegidas igual que las del prompt
+    todo_extractor_limit: int = 50
+    # Máximo de mensajes que se conservan en el hilo (0 = todos). Los turnos más antiguos se borran del
+    # checkpoint (nunca a mitad de un turno), así que cargar el hilo y llamar al modelo no crece con la
+    # conversación. server.py lo activa en history_mode="delta" (DELTA_HISTORY_MESSAGES)
+    max_history_messages: int = 0
 
     @classmethod # Método de clase para instanciar la configuración desde una fuente externa
     def from_runnable_config(
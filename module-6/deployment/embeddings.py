@@ -0,0 +1,107 @@
+"""
+Embeddings e índice vectorial local (NumPy, similitud coseno) para elegir las tareas relevantes.
+
+El modelo de embeddings se elige con MEMORY_EMBEDDINGS:
+- hashing (por defecto): HashingEmbeddings, local y determinista; no necesita red ni credenciales,
+  así que sirve para desarrollo, pruebas y benchmarks. Compara palabras y trigramas de caracteres,
+  no sinónimos
+- bedrock: Amazon Titan Text Embeddings v2 en Bedrock (misma región que el modelo de chat)
+- none: sin búsqueda semántica; las tareas se eligen por estado y fecha límite
+
+El índice no depende del backend del store (memory, sqlite, dynamodb, mongodb): lo mantiene
+memory_context junto al bloque de memoria cacheado y solo calcula los embeddings de las tareas
+nuevas o modificadas.
+"""
+import hashlib # Hash estable entre procesos (hash() de Python cambia en cada arranque)
+import math # Normalización de los vectores
+import os # Lectura de variables de entorno
+import re # Separación en palabras
+import threading # Creación única del modelo de embeddings
+import unicodedata # Eliminación de tildes
+from typing import List, Optional, Sequence # Tipos para anotaciones
+
+from langchain_core.embeddings import Embeddings # Interfaz común de los embeddings de LangChain
+
+MEMORY_EMBEDDINGS = os.environ.get("MEMORY_EMBEDDINGS", "hashing").lower()
+# Dimensiones del vector de HashingEmbeddings
+HASHING_DIMS = int(os.environ.get("HASHING_EMBEDDING_DIMS", "256"))
+
+_embeddings: Optional[Embeddings] = None
+_embeddings_lock = threading.Lock()
+
+
+class HashingEmbeddings(Embeddings):
+    """Embeddings por feature hashing de palabras y trigramas, normalizados (coseno = producto escalar)."""
+
+    def __init__(self, dims: int = HASHING_DIMS):
+        self.dims = dims
+
+    def _features(self, text: str) -> List[str]:
+        # Minúsculas y sin tildes: "Reunión" y "reunion" comparten rasgos
+        text = unicodedata.normalize("NFKD", text.lower())
+        text = "".join(char for char in text if not unicodedata.combining(char))
+        words = re.findall(r"\w+", text)
+        trigrams = [f"#{word[i:i + 3]}" for word in words for i in range(max(len(word) - 2, 1))]
+        return words + trigrams
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dims
+        for feature in self._features(text):
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            # El bit alto decide el signo para que las colisiones tiendan a cancelarse
+            vector[value % self.dims] += 1.0 if value >> 63 else -1.0
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+def get_embeddings() -> Optional[Embeddings]:
+    """Modelo de embeddings según MEMORY_EMBEDDINGS (None = sin búsqueda semántica); se crea una sola vez."""
+    global _embeddings
+    if MEMORY_EMBEDDINGS == "none":
+        return None
+    if _embeddings is None:
+        with _embeddings_lock:
+            if _embeddings is None:
+                if MEMORY_EMBEDDINGS == "bedrock":
+                    from langchain_aws import BedrockEmbeddings # Solo se importa si se usa
+                    _embeddings = BedrockEmbeddings(model_id="amazon.titan-embed-text-v2:0", region_name="us-east-1")
+                elif MEMORY_EMBEDDINGS == "hashing":
+                    _embeddings = HashingEmbeddings()
+                else:
+                    raise ValueError(f"MEMORY_EMBEDDINGS desconocido: {MEMORY_EMBEDDINGS} (opciones: hashing, bedrock, none)")
+    return _embeddings
+
+
+class VectorIndex:
+    """Matriz de vectores normalizados: la similitud coseno con una consulta es un producto matriz-vector."""
+
+    def __init__(self, vectors: Sequence[Sequence[float]]):
+        import numpy as np # Se importa con el primer índice, no al arrancar el servidor
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        self.matrix = matrix / np.where(norms == 0, 1, norms)
+
+    def __len__(self) -> int:
+        return len(self.matrix)
+
+    def top_k(self, query: Sequence[float], k: int, rows: Optional[int] = None) -> List[int]:
+        """Posiciones de los `k` vectores más parecidos a `query`, de más a menos parecido.
+
+        Con `rows` solo se consideran las primeras `rows` filas.
+        """
+        import numpy as np
+        matrix = self.matrix if rows is None else self.matrix[:rows]
+        k = min(k, len(matrix))
+        if k <= 0:
+            return []
+        scores = matrix @ np.asarray(query, dtype=np.float32)
+        # argpartition deja las k mejores sin ordenar todo el vector (O(n)); solo se ordenan esas k
+        top = np.argpartition(-scores, k - 1)[:k]
+        return [int(i) for i in top[np.argsort(-scores[top])]]
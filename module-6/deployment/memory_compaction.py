@@ -0,0 +1,228 @@
+"""
+Compactación offline de las colecciones de Trustcall: fusiona documentos casi duplicados.
+
+Con enable_inserts=True, Trustcall crea un documento nuevo (clave UUID) cada vez que no reconoce
+uno existente, así que se acumulan variantes de la misma tarea ("Comprar leche", "comprar leche
+mañana") que engordan cada store.search y cada prompt. Este trabajo, por usuario:
+1. lee la colección completa y calcula los embeddings de su texto (embeddings.py)
+2. agrupa los casi duplicados: similitud coseno vectorizada (NumPy, por bloques de filas) por
+   encima de `threshold` con cada documento líder; las tareas solo se agrupan con otras del mismo
+   estado
+3. fusiona cada grupo con una llamada al LLM (extractor de Trustcall con el esquema de la
+   colección); las llamadas de todos los grupos van en un único extractor.batch, y los grupos
+   cuya llamada falla o no devuelve documento se dejan como estaban (CompactionReport.skipped)
+4. reescribe la colección en un único store.batch: el documento fusionado se guarda con la clave
+   del más reciente del grupo y se borran los demás (en una transacción con el backend sqlite);
+   las tareas pasan por TodoRepository.write para mantener el índice, con la nueva versión de la
+   memoria (version_op) en el mismo lote
+5. informa de los documentos, bytes y tokens de prompt ahorrados
+
+Colecciones: "todo" (ToDo de task_mAIstro, ("todo", todo_category, user_id)) y "memories" (Memory de
+module-5/studio/memoryschema_collection.py, ("memories", user_id)).
+
+Uso (con el backend de MEMORY_BACKEND):
+    python memory_compaction.py --collection todo --category general [--user-id U ...] [--dry-run]
+"""
+import argparse # Lectura de argumentos de línea de comandos
+import asyncio # Apertura de los backends (asíncronos)
+import json # Tamaño serializado de los documentos
+from dataclasses import dataclass, field # Colecciones e informes
+from typing import Callable, Dict, List, Optional, Tuple, Type # Tipos para anotaciones
+
+from langchain_core.messages import HumanMessage, SystemMessage # Mensajes de la llamada de fusión
+from langgraph.store.base import BaseStore, PutOp # Interfaz común de los stores
+from pydantic import BaseModel, Field # Esquema Memory
+
+import task_maistro # Modelo, extractores de Trustcall y esquema ToDo
+from embeddings import HashingEmbeddings, VectorIndex, get_embeddings # Embeddings y matriz normalizada
+from memory_context import version_op # Invalida el bloque de memoria cacheado
+from todo_repository import TodoRepository, scan, todo_status # Escritura con índice y lectura paginada
+
+CHARS_PER_TOKEN = 4 # Estimación de tokens de prompt (sin tokenizador del modelo)
+SIMILARITY_BLOCK = 1024 # Filas de la matriz de similitud calculadas a la vez (acota la memoria)
+
+MERGE_INSTRUCTION = """The following {kind} records were saved separately but describe the same thing.
+
+Merge them into a single {kind} record that keeps every distinct detail from all of them.
+When they conflict, prefer the most recent record (they are listed from oldest to newest).
+
+Use the {kind} tool to return the merged record."""
+
+
+# Esquema de las memorias de module-5/studio/memoryschema_collection.py
+class Memory(BaseModel):
+    content: str = Field(description="The main content of the memory. For example: User expressed interest in learning about French.")
+
+
+@dataclass(frozen=True)
+class Collection:
+    """Colección de Trustcall: esquema, campo con el texto comparable y namespace por usuario."""
+    schema: Type[BaseModel]
+    text_field: str
+    namespace: Callable[[str, str], Tuple[str, ...]] # (user_id, todo_category) → namespace
+    group: Callable[[dict], str] = lambda value: "" # Solo se fusionan documentos del mismo grupo
+
+
+COLLECTIONS = {
+    "todo": Collection(task_maistro.ToDo, "task", lambda user_id, todo_category: ("todo", todo_category, user_id),
+                       group=todo_status),
+    "memories": Collection(Memory, "content", lambda user_id, todo_category: ("memories", user_id)),
+}
+
+
+@dataclass
+class CompactionReport:
+    """Resultado de compactar la colección de un usuario."""
+    namespace: Tuple[str, ...]
+    items_before: int = 0
+    items_after: int = 0
+    clusters: int = 0 # Grupos de casi duplicados fusionados
+    skipped: int = 0 # Grupos sin fusionar (la llamada al LLM falló o no devolvió documento)
+    bytes_before: int = 0 # JSON de los documentos
+    bytes_after: int = 0
+    prompt_chars_before: int = 0 # Documentos tal como se insertan en el prompt
+    prompt_chars_after: int = 0
+    merged: Dict[str, List[str]] = field(default_factory=dict) # Clave conservada → claves borradas
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_before - self.bytes_after
+
+    @property
+    def prompt_tokens_saved(self) -> int:
+        return (self.prompt_chars_before - self.prompt_chars_after) // CHARS_PER_TOKEN
+
+    def summary(self) -> str:
+        return (f"{'/'.join(self.namespace)}: {self.items_before} → {self.items_after} documentos "
+                f"({self.clusters} grupos, {self.skipped} sin fusionar), {self.bytes_saved} bytes y ~{self.prompt_tokens_saved} tokens de prompt menos")
+
+
+def value_bytes(value: dict) -> int:
+    return len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+
+def find_clusters(vectors, groups: List[str], threshold: float) -> List[List[int]]:
+    """Grupos (de 2 o más) de posiciones con similitud coseno >= `threshold` y el mismo grupo.
+
+    Cada grupo se forma alrededor de un documento (el primero sin grupo) con los vecinos que le
+    superan el umbral: sin encadenar A~B~C, que uniría tareas distintas con textos parecidos.
+    """
+    import numpy as np # Solo lo necesita el trabajo offline
+    matrix = VectorIndex(vectors).matrix
+    groups = np.asarray(groups)
+    neighbours: List[List[int]] = []
+    for start in range(0, len(matrix), SIMILARITY_BLOCK):
+        scores = matrix[start:start + SIMILARITY_BLOCK] @ matrix.T
+        same_group = groups[start:start + SIMILARITY_BLOCK, None] == groups[None, :]
+        neighbours.extend(np.flatnonzero(row).tolist() for row in (scores >= threshold) & same_group)
+
+    assigned = [False] * len(matrix)
+    clusters = []
+    for i, candidates in enumerate(neighbours):
+        if assigned[i]:
+            continue
+        members = [j for j in candidates if not assigned[j]]
+        for j in members:
+            assigned[j] = True
+        if len(members) > 1:
+            clusters.append(members)
+    return clusters
+
+
+def merge_clusters(collection: Collection, clusters: List[list], max_concurrency: int) -> List[Optional[dict]]:
+    """Un documento fusionado por grupo: una llamada al LLM por grupo, todas en un extractor.batch.
+
+    Los grupos cuya llamada falla o no devuelve documento quedan como None (no se fusionan).
+    """
+    name = collection.schema.__name__
+    extractor = task_maistro.get_extractor(collection.schema, tool_choice=name)
+    inputs = [{
+        "messages": [
+            SystemMessage(content=MERGE_INSTRUCTION.format(kind=name)),
+            HumanMessage(content="\n".join(f"- {json.dumps(item.value, ensure_ascii=False)}" for item in items)),
+        ],
+    } for items in clusters]
+    # Un error en un grupo no descarta las fusiones ya pagadas de los demás
+    results = extractor.batch(inputs, config={"max_concurrency": max_concurrency}, return_exceptions=True)
+    return [None if isinstance(result, Exception) or not result.get("responses")
+            else result["responses"][0].model_dump(mode="json") for result in results]
+
+
+def compact(store: BaseStore, user_id: str, todo_category: str = "general", collection: str = "todo",
+            threshold: float = 0.85, dry_run: bool = False, max_concurrency: int = 4) -> CompactionReport:
+    """Fusiona los documentos casi duplicados de una colección del usuario y devuelve el informe."""
+    spec = COLLECTIONS[collection]
+    namespace = spec.namespace(user_id, todo_category)
+    items = scan(store, namespace)
+    report = CompactionReport(namespace, items_before=len(items), items_after=len(items))
+    report.bytes_before = report.bytes_after = sum(value_bytes(item.value) for item in items)
+    report.prompt_chars_before = report.prompt_chars_after = sum(len(f"{item.value}") + 1 for item in items)
+    if len(items) < 2:
+        return report
+
+    embeddings = get_embeddings() or HashingEmbeddings() # Con MEMORY_EMBEDDINGS=none, el embedder local
+    vectors = embeddings.embed_documents([str(item.value.get(spec.text_field, "")) for item in items])
+    clusters = [sorted((items[i] for i in members), key=lambda item: item.updated_at)
+                for members in find_clusters(vectors, [spec.group(item.value) for item in items], threshold)]
+    if not clusters:
+        return report
+
+    merged_values = merge_clusters(spec, clusters, max_concurrency)
+    puts: Dict[str, dict] = {}
+    deletes: List[str] = []
+    for members, value in zip(clusters, merged_values):
+        if value is None:
+            report.skipped += 1 # Sus documentos se quedan como estaban
+            continue
+        report.clusters += 1
+        if collection == "todo":
+            value["status"] = todo_status(members[-1].value) # La fusión no reabre ni cierra tareas
+        keep, removed = members[-1], members[:-1] # Se conserva la clave del más reciente
+        puts[keep.key] = value
+        deletes.extend(item.key for item in removed)
+        report.merged[keep.key] = [item.key for item in removed]
+        report.items_after -= len(removed)
+        report.bytes_after += value_bytes(value) - sum(value_bytes(item.value) for item in members)
+        report.prompt_chars_after += len(f"{value}") + 1 - sum(len(f"{item.value}") + 1 for item in members)
+
+    if not dry_run and puts:
+        if collection == "todo":
+            TodoRepository(store, user_id, todo_category).write(puts, deletes, [version_op(user_id, todo_category)])
+        else:
+            store.batch([PutOp(namespace, key, value) for key, value in puts.items()]
+                        + [PutOp(namespace, key, None) for key in deletes])
+    return report
+
+
+def list_users(store: BaseStore, collection: str, todo_category: str) -> List[str]:
+    """Usuarios con documentos en la colección."""
+    prefix = COLLECTIONS[collection].namespace("", todo_category)[:-1]
+    users, offset = [], 0
+    while True:
+        page = store.list_namespaces(prefix=prefix, max_depth=len(prefix) + 1, limit=1000, offset=offset)
+        users.extend(namespace[len(prefix)] for namespace in page)
+        if len(page) < 1000:
+            return users
+        offset += len(page)
+
+
+async def main(args):
+    from backends import open_backends # Mismo backend que el servidor (MEMORY_BACKEND)
+    async with open_backends() as (_, store):
+        user_ids = args.user_id or await asyncio.to_thread(list_users, store, args.collection, args.category)
+        for user_id in user_ids:
+            # Los métodos síncronos del store no pueden llamarse desde el bucle de eventos
+            report = await asyncio.to_thread(compact, store, user_id, args.category, args.collection,
+                                             args.threshold, args.dry_run, args.max_concurrency)
+            print(report.summary() + (" (dry run)" if args.dry_run else ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collection", choices=sorted(COLLECTIONS), default="todo", help="colección a compactar")
+    parser.add_argument("--category", default="general", help="todo_category de las tareas")
+    parser.add_argument("--user-id", nargs="+", help="usuarios a compactar (por defecto, todos)")
+    parser.add_argument("--threshold", type=float, default=0.85, help="similitud coseno mínima entre duplicados")
+    parser.add_argument("--max-concurrency", type=int, default=4, help="llamadas de fusión al LLM en paralelo")
+    parser.add_argument("--dry-run", action="store_true", help="solo informa, sin escribir en el store")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,176 @@
+"""
+Bloque de memoria (perfil, tareas e instrucciones) que task_mAIstro inserta en el prompt, con caché.
+
+Cada turno, task_mAIstro necesitaba tres store.search y volver a renderizar todas las tareas.
+Ahora el bloque se guarda por (user_id, todo_category) junto a la versión de la memoria de ese
+usuario: un documento ("memory_version", todo_category, user_id) que los nodos update_* cambian
+cada vez que escriben (version_op() en su mismo store.batch, o bump_version()). Un acierto cuesta
+un store.get (válido también con varios procesos compartiendo el store); un fallo vuelve a leer
+el store y re-renderiza solo las tareas que cambiaron.
+
+Las tareas se ordenan con las abiertas primero y por fecha límite, y se recortan a `todo_limit`
+para acotar el tamaño del prompt. Si el usuario tiene más tareas que el límite, relevant_todo_block
+elige en su lugar las más parecidas al último mensaje con un índice vectorial local (embeddings.py)
+que se guarda en la misma entrada: los embeddings de las tareas sin cambios pasan de una versión a
+la siguiente, así que solo se calculan los de las tareas nuevas o modificadas.
+
+Las escrituras en los namespaces de memoria sin bump_version()/version_op() no invalidan la caché.
+"""
+import os # Lectura de variables de entorno
+import threading # Los nodos se ejecutan en el pool de hilos del servidor
+import uuid # Versiones únicas (sin leer-modificar-escribir entre procesos)
+from collections import OrderedDict # Orden de uso para la expulsión LRU
+from dataclasses import dataclass, field # Entradas de la caché
+from typing import Dict, Hashable, List, Optional, Tuple # Tipos para anotaciones
+
+from langchain_core.embeddings import Embeddings # Modelo de embeddings (embeddings.get_embeddings)
+from langgraph.store.base import BaseStore, PutOp # Interfaz común de los stores
+
+from embeddings import VectorIndex # Índice vectorial local (similitud coseno)
+from todo_repository import CLOSED_STATUSES, scan # Estados y lectura paginada
+
+VERSION_NAMESPACE = "memory_version"
+
+# Usuarios (user_id, todo_category) cuyo bloque se mantiene en memoria
+MEMORY_CONTEXT_CACHE_SIZE = int(os.environ.get("MEMORY_CONTEXT_CACHE_SIZE", "1024"))
+
+
+def version_op(user_id: str, todo_category: str) -> PutOp:
+    """La escritura de bump_version(), para añadirla al mismo store.batch que las de la memoria."""
+    return PutOp((VERSION_NAMESPACE, todo_category, user_id), "version", {"version": uuid.uuid4().hex}, index=False)
+
+
+def bump_version(store: BaseStore, user_id: str, todo_category: str):
+    """Marca la memoria del usuario como modificada (llamar después de cada escritura)."""
+    store.batch([version_op(user_id, todo_category)])
+
+
+def current_version(store: BaseStore, user_id: str, todo_category: str) -> Optional[str]:
+    item = store.get((VERSION_NAMESPACE, todo_category, user_id), "version")
+    return item.value["version"] if item else None
+
+
+def todo_sort_key(value: dict):
+    """Abiertas primero; dentro de cada grupo por fecha límite (sin fecha al final)."""
+    deadline = value.get("deadline")
+    return (value.get("status") in CLOSED_STATUSES, deadline is None, deadline or "")
+
+
+@dataclass
+class MemoryContext:
+    """Bloque de memoria renderizado de un usuario."""
+    version: Optional[str]
+    user_profile: Optional[dict] = None
+    instructions: str = ""
+    # Tareas ya renderizadas y ordenadas: (clave, updated_at, texto, campo task)
+    todos: list = field(default_factory=list)
+    todo_count: int = 0 # Tareas totales del usuario (antes del recorte)
+    open_count: int = 0 # Tareas abiertas (son las primeras de `todos`)
+    # Texto del bloque de tareas por límite aplicado
+    rendered_todos: Dict[int, str] = field(default_factory=dict)
+    # Prompts del sistema ya formateados con este bloque (los llena task_mAIstro)
+    prompts: Dict[Hashable, str] = field(default_factory=dict)
+    # Embeddings del campo task por clave: (updated_at, vector); se heredan de la versión anterior
+    vectors: Dict[str, tuple] = field(default_factory=dict)
+    index: Optional[VectorIndex] = None # Se construye con la primera búsqueda
+    index_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def todo_block(self, todo_limit: int) -> str:
+        """Tareas unidas por saltos de línea, como mucho `todo_limit` (0 = todas)."""
+        if todo_limit not in self.rendered_todos:
+            todos = self.todos[:todo_limit] if todo_limit > 0 else self.todos
+            self.rendered_todos[todo_limit] = "\n".join(todo[2] for todo in todos)
+        return self.rendered_todos[todo_limit]
+
+    def _vector_index(self, embeddings: Embeddings) -> VectorIndex:
+        with self.index_lock:
+            if self.index is None:
+                # Solo se calculan los embeddings que faltan o que corresponden a otra versión de la tarea
+                missing = [(key, updated_at, task) for key, updated_at, _, task in self.todos
+                           if self.vectors.get(key, (None,))[0] != updated_at]
+                if missing:
+                    vectors = embeddings.embed_documents([task for _, _, task in missing])
+                    for (key, updated_at, _), vector in zip(missing, vectors):
+                        self.vectors[key] = (updated_at, vector)
+                self.index = VectorIndex([self.vectors[key][1] for key, _, _, _ in self.todos])
+            return self.index
+
+    def _similar(self, embeddings: Embeddings, query: str, limit: int, open_only: bool) -> list:
+        if not self.todos:
+            return []
+        index = self._vector_index(embeddings)
+        positions = index.top_k(embeddings.embed_query(query), limit, rows=self.open_count if open_only else None)
+        return [self.todos[i] for i in positions]
+
+    def similar(self, embeddings: Embeddings, query: str, limit: int, open_only: bool = False) -> List[str]:
+        """Claves de las `limit` tareas más parecidas a `query` (solo abiertas con `open_only`)."""
+        return [todo[0] for todo in self._similar(embeddings, query, limit, open_only)]
+
+    def relevant_todo_block(self, embeddings: Optional[Embeddings], query: Optional[str],
+                            todo_limit: int) -> Optional[str]:
+        """Las `todo_limit` tareas más parecidas a `query`, o None si caben todas o no hay embeddings."""
+        if todo_limit <= 0 or self.todo_count <= todo_limit or not query or embeddings is None:
+            return None
+        return "\n".join(todo[2] for todo in self._similar(embeddings, query, todo_limit, open_only=False))
+
+
+class MemoryContextCache:
+    """Caché LRU de bloques de memoria por (user_id, todo_category), validada por versión."""
+
+    def __init__(self, maxsize: int = MEMORY_CONTEXT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Tuple[str, str], MemoryContext]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, store: BaseStore, user_id: str, todo_category: str) -> MemoryContext:
+        """Bloque de memoria actual del usuario: de la caché si su versión sigue vigente."""
+        key = (user_id, todo_category)
+        version = current_version(store, user_id, todo_category)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached.version == version:
+                self._entries.move_to_end(key) # Marca la entrada como usada recientemente
+                return cached
+        context = self._load(store, user_id, todo_category, version, cached)
+        if self.maxsize > 0:
+            with self._lock:
+                self._entries[key] = context
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False) # Expulsa la menos usada
+        return context
+
+    def _load(self, store: BaseStore, user_id: str, todo_category: str, version: Optional[str],
+              previous: Optional[MemoryContext]) -> MemoryContext:
+        profiles = store.search(("profile", todo_category, user_id), limit=1)
+        instructions = store.search(("instructions", todo_category, user_id), limit=1)
+
+        # Todas las tareas (store.search devuelve 10 por defecto)
+        items = scan(store, ("todo", todo_category, user_id))
+
+        # Solo se vuelven a renderizar las tareas nuevas o modificadas
+        rendered = {todo[0]: (todo[1], todo[2]) for todo in previous.todos} if previous else {}
+        todos = []
+        for item in sorted(items, key=lambda item: todo_sort_key(item.value)):
+            updated_at = item.updated_at.isoformat()
+            cached = rendered.get(item.key)
+            text = cached[1] if cached and cached[0] == updated_at else f"{item.value}"
+            todos.append((item.key, updated_at, text, str(item.value.get("task", ""))))
+
+        # Embeddings de la versión anterior que siguen valiendo (las tareas borradas se descartan)
+        vectors = {}
+        if previous:
+            vectors = {key: previous.vectors[key] for key, _, _, _ in todos if key in previous.vectors}
+
+        return MemoryContext(
+            version=version,
+            user_profile=profiles[0].value if profiles else None,
+            instructions=instructions[0].value if instructions else "",
+            todos=todos,
+            todo_count=len(items),
+            open_count=sum(item.value.get("status") not in CLOSED_STATUSES for item in items),
+            vectors=vectors,
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,222 @@
+"""
+Cola duradera de actualizaciones de memoria en segundo plano (memory_update_mode="background").
+
+En modo background, el nodo schedule_memory_update de task_maistro no ejecuta Trustcall: guarda un
+trabajo en el store (namespace ("memory_jobs", user_id)) y el grafo responde al usuario de inmediato.
+MemoryJobWorker, arrancado por el servidor, procesa los trabajos:
+- durables: viven en el mismo store que la memoria larga, así que sobreviven a reinicios
+  (con MEMORY_BACKEND=memory se pierden al reiniciar, como el resto de la memoria)
+- en orden por usuario: los trabajos de un user_id se aplican de uno en uno, por orden de llegada;
+  usuarios distintos se procesan en paralelo
+- con reintentos: un trabajo que falla se reintenta con espera creciente y, tras MEMORY_JOB_MAX_ATTEMPTS,
+  se mueve a ("memory_jobs_failed", user_id) para no bloquear los siguientes; los trabajos mal
+  formados o con un update_type sin nodo se mueven ahí directamente
+
+Solo server.py (FastAPI) arranca el worker. Con el despliegue de langgraph.json (langgraph-api) nadie
+procesa ("memory_jobs", ...) y las actualizaciones nunca se aplican: ahí hay que usar el modo inline.
+
+El orden por usuario exige que un solo proceso ejecute los trabajos. Con varios workers de gunicorn
+(que comparten el entorno), todos arrancan un MemoryJobWorker pero solo procesa trabajos el que
+tiene el cerrojo de MEMORY_JOB_LOCK_FILE (flock); los demás lo reintentan en cada barrido y lo
+toman si ese proceso muere o se recicla. Los trabajos que encola otro worker se recogen en el
+siguiente barrido. El cerrojo es por máquina: con varios nodos contra el mismo backend, dejar
+MEMORY_JOB_WORKER=1 solo en uno de ellos.
+"""
+import asyncio # Tareas del worker
+import os # Lectura de variables de entorno
+import tempfile # Ruta por defecto del cerrojo entre procesos
+import threading # Las notificaciones llegan desde los hilos que ejecutan los nodos
+import time # Claves ordenadas por tiempo
+import uuid # Sufijo único de las claves
+from typing import Any, Callable, Dict, List, Optional # Tipos para anotaciones
+
+from langchain_core.messages import BaseMessage, messages_from_dict, messages_to_dict # Serialización de mensajes
+from langgraph.store.base import BaseStore # Interfaz común de los stores
+
+from todo_repository import ascan # Lectura paginada de los trabajos pendientes
+
+JOBS_NAMESPACE = "memory_jobs"
+FAILED_NAMESPACE = "memory_jobs_failed"
+
+# Usuarios cuyos trabajos se procesan a la vez
+MEMORY_JOB_CONCURRENCY = int(os.environ.get("MEMORY_JOB_CONCURRENCY", "4"))
+# Intentos antes de mover un trabajo a memory_jobs_failed
+MEMORY_JOB_MAX_ATTEMPTS = int(os.environ.get("MEMORY_JOB_MAX_ATTEMPTS", "5"))
+# Arranca el worker en este proceso (con varios nodos, dejarlo activo solo en uno; ver ProcessLock)
+MEMORY_JOB_WORKER = os.environ.get("MEMORY_JOB_WORKER", "1").lower() in ("1", "true", "yes")
+# Segundos entre barridos del store (recoge trabajos de otros procesos o de antes de un reinicio)
+MEMORY_JOB_POLL_INTERVAL = float(os.environ.get("MEMORY_JOB_POLL_INTERVAL", "5"))
+# Cerrojo que elige el único proceso de la máquina que ejecuta los trabajos
+MEMORY_JOB_LOCK_FILE = os.environ.get("MEMORY_JOB_LOCK_FILE",
+                                      os.path.join(tempfile.gettempdir(), "task_maistro_memory_jobs.lock"))
+
+# Workers activos en este proceso (enqueue_job los despierta)
+_workers: List["MemoryJobWorker"] = []
+_workers_lock = threading.Lock()
+
+
+def enqueue_job(store: BaseStore, user_id: str, todo_category: str, update_type: str,
+                messages: List[BaseMessage]) -> str:
+    """Guarda un trabajo de actualización de memoria y retorna su clave (la usan los nodos, en un hilo)."""
+    # Claves ordenadas por tiempo de llegada: el orden lexicográfico es el orden de procesamiento
+    key = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+    store.put((JOBS_NAMESPACE, user_id), key, {
+        "user_id": user_id,
+        "todo_category": todo_category,
+        "update_type": update_type,
+        "messages": messages_to_dict(messages),
+        "attempts": 0,
+    }, index=False)
+    with _workers_lock:
+        for worker in _workers:
+            worker.wake(user_id)
+    return key
+
+
+class ProcessLock:
+    """Cerrojo exclusivo entre los procesos de una máquina (flock); el sistema lo libera si el proceso muere."""
+
+    def __init__(self, path: str = MEMORY_JOB_LOCK_FILE):
+        self.path = path
+        self.held = False # Si este proceso tiene el cerrojo
+        self._file = None
+
+    def acquire(self) -> bool:
+        """Intenta tomar el cerrojo sin esperar; True si este proceso lo tiene."""
+        if self.held:
+            return True
+        try:
+            import fcntl # Solo existe en sistemas POSIX
+        except ImportError:
+            self.held = True # Sin flock (Windows): un solo proceso, como con uvicorn directamente
+            return True
+        lock_file = open(self.path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close() # Lo tiene otro proceso
+            return False
+        self._file = lock_file
+        self.held = True
+        return True
+
+    def release(self):
+        if self._file is not None:
+            self._file.close() # Cerrar el archivo libera el flock
+            self._file = None
+        self.held = False
+
+
+class MemoryJobWorker:
+    """Procesa los trabajos pendientes del store, en orden por usuario."""
+
+    def __init__(self, store: BaseStore, handlers: Dict[str, Callable[..., Any]],
+                 concurrency: int = MEMORY_JOB_CONCURRENCY, poll_interval: float = MEMORY_JOB_POLL_INTERVAL,
+                 max_attempts: int = MEMORY_JOB_MAX_ATTEMPTS, lock: Optional[ProcessLock] = None):
+        self.store = store
+        self.lock = lock or ProcessLock() # Solo el proceso que lo tiene ejecuta trabajos
+        self.handlers = handlers # update_type → función del nodo (state, config, store)
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self._slots = asyncio.Semaphore(concurrency)
+        self._users: Dict[str, asyncio.Task] = {} # Usuario → tarea que vacía su cola
+        self._again: set = set() # Usuarios con avisos recibidos mientras su tarea terminaba
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Arranca el barrido periódico (debe llamarse desde el event loop del servidor)."""
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.ensure_future(self._poll())
+        with _workers_lock:
+            _workers.append(self)
+
+    async def stop(self):
+        """Detiene el worker; los trabajos a medias siguen en el store y se reintentan al arrancar."""
+        with _workers_lock:
+            _workers.remove(self)
+        self._again.clear()
+        tasks = [self._task, *self._users.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.lock.release() # Otro worker lo toma en su siguiente barrido
+
+    def wake(self, user_id: str):
+        """Avisa de un trabajo nuevo de `user_id` (seguro desde cualquier hilo)."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._drain, user_id)
+
+    async def join(self):
+        """Espera a que no quede ningún trabajo en curso (útil en benchmarks y pruebas)."""
+        while self._users:
+            await asyncio.gather(*self._users.values(), return_exceptions=True)
+
+    async def _poll(self):
+        while True:
+            if not self.lock.acquire():
+                # Otro proceso ejecuta los trabajos; se reintenta en el siguiente barrido
+                await asyncio.sleep(self.poll_interval)
+                continue
+            namespaces = await self.store.alist_namespaces(prefix=(JOBS_NAMESPACE,), max_depth=2, limit=10_000)
+            for namespace in namespaces:
+                self._drain(namespace[1])
+            await asyncio.sleep(self.poll_interval)
+
+    def _drain(self, user_id: str):
+        # Solo el proceso con el cerrojo ejecuta trabajos (los demás los dejan para su barrido)
+        if not self.lock.held:
+            return
+        # Una sola tarea por usuario garantiza el orden de sus trabajos
+        if user_id in self._users:
+            self._again.add(user_id)
+            return
+        task = asyncio.ensure_future(self._drain_user(user_id))
+        self._users[user_id] = task
+        task.add_done_callback(lambda _: self._drained(user_id))
+
+    def _drained(self, user_id: str):
+        del self._users[user_id]
+        if user_id in self._again:
+            # Pudo llegar un trabajo entre la última consulta y el final de la tarea
+            self._again.discard(user_id)
+            self._drain(user_id)
+
+    async def _drain_user(self, user_id: str):
+        async with self._slots:
+            while True:
+                # Todos los pendientes: una sola página no vale, el store decide su orden (p. ej. sqlite
+                # devuelve primero los más recientes) y los más antiguos podrían quedarse fuera
+                jobs = await ascan(self.store, (JOBS_NAMESPACE, user_id))
+                if not jobs:
+                    return
+                for job in sorted(jobs, key=lambda item: item.key):
+                    await self._run(job)
+
+    async def _run(self, job):
+        value = job.value
+        try:
+            state = {"messages": messages_from_dict(value["messages"])}
+            config = {"configurable": {"user_id": value["user_id"], "todo_category": value["todo_category"]}}
+            handler = self.handlers[value["update_type"]]
+        except Exception as error:
+            # Trabajo mal formado o de un tipo sin nodo: reintentarlo no sirve y bloquearía la cola
+            await self._fail(job, {**value, "error": f"trabajo no ejecutable: {error!r}"})
+            return
+        for attempt in range(value["attempts"], self.max_attempts):
+            try:
+                # Los nodos son síncronos (Trustcall, llamadas a Bedrock): se ejecutan en el pool de hilos
+                await asyncio.get_running_loop().run_in_executor(None, handler, state, config, self.store)
+                await self.store.adelete(job.namespace, job.key)
+                return
+            except Exception as error:
+                # Guarda el intento para que un reinicio no reinicie la cuenta
+                value = {**value, "attempts": attempt + 1, "error": str(error)}
+                await self.store.aput(job.namespace, job.key, value, index=False)
+                await asyncio.sleep(min(2 ** attempt, 60))
+        # Agotados los intentos: se aparta para no bloquear los trabajos siguientes del usuario
+        await self._fail(job, value)
+
+    async def _fail(self, job, value: dict):
+        await self.store.aput((FAILED_NAMESPACE, job.namespace[1]), job.key, value, index=False)
+        await self.store.adelete(job.namespace, job.key)
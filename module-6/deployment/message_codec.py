@@ -0,0 +1,80 @@
+"""
+Conversión de mensajes entre el formato JSON de la API y los objetos de LangChain.
+La usan todos los endpoints de server.py (/invoke, /stream, /batch) para que el
+mapeo de roles sea siempre el mismo.
+"""
+from typing import Any, Callable, Dict, Iterable, List # Tipos para anotaciones
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage # Clases de mensajes
+
+# Tabla rol → clase de LangChain (los roles desconocidos se tratan como mensajes del usuario)
+ROLE_TO_CLASS: Dict[str, type] = {
+    "user": HumanMessage,
+    "human": HumanMessage,
+    "assistant": AIMessage,
+    "ai": AIMessage,
+    "system": SystemMessage,
+}
+DEFAULT_CLASS = HumanMessage
+
+
+def to_lc_messages(messages: Iterable[Any]) -> List[BaseMessage]:
+    """Convierte mensajes con `role` y `content` (modelos Pydantic de la API) a objetos de LangChain."""
+    lookup = ROLE_TO_CLASS.get
+    return [lookup(msg.role, DEFAULT_CLASS)(content=msg.content) for msg in messages]
+
+
+def content_text(content: Any) -> str:
+    """Extrae el texto de un contenido de mensaje (string o lista de bloques de Bedrock)."""
+    if isinstance(content, str):
+        return content
+    # Bedrock Converse devuelve el contenido como bloques [{"type": "text", "text": ...}, ...]
+    return "".join(
+        block.get("text", "") if isinstance(block, dict) else str(block)
+        for block in content or []
+    )
+
+
+# SERIALIZADORES DE SALIDA
+def _serialize_message(msg: BaseMessage) -> Dict[str, Any]:
+    return {"role": msg.type, "content": msg.content}
+
+
+def _serialize_dict(msg: Dict[str, Any]) -> Dict[str, Any]:
+    # Los nodos de memoria devuelven mensajes de herramienta como diccionarios
+    return {"role": msg.get("role", "unknown"), "content": msg.get("content", "")}
+
+
+def _serialize_other(msg: Any) -> Dict[str, Any]:
+    return {"role": "unknown", "content": str(msg)}
+
+
+# Serializador elegido por clase; se rellena la primera vez que aparece cada clase
+_SERIALIZERS: Dict[type, Callable[[Any], Dict[str, Any]]] = {}
+
+
+def _serializer_for(cls: type) -> Callable[[Any], Dict[str, Any]]:
+    if issubclass(cls, BaseMessage):
+        serializer = _serialize_message
+    elif issubclass(cls, dict):
+        serializer = _serialize_dict
+    else:
+        serializer = _serialize_other
+    _SERIALIZERS[cls] = serializer
+    return serializer
+
+
+def message_to_dict(msg: Any) -> Dict[str, Any]:
+    """Serializa un mensaje (objeto de LangChain, dict de un nodo u otro valor) a JSON."""
+    cls = type(msg)
+    return (_SERIALIZERS.get(cls) or _serializer_for(cls))(msg)
+
+
+def messages_to_dicts(messages: Iterable[Any]) -> List[Dict[str, Any]]:
+    """Serializa una lista de mensajes; resuelve el serializador una sola vez por clase."""
+    serializers = _SERIALIZERS
+    out = []
+    for msg in messages:
+        cls = type(msg)
+        out.append((serializers.get(cls) or _serializer_for(cls))(msg))
+    return out
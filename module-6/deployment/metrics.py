@@ -0,0 +1,216 @@
+"""
+Métricas de latencia en formato Prometheus para el servidor FastAPI (sin dependencias externas).
+
+Fuentes de datos:
+- MetricsMiddleware  : latencia total por endpoint (incluye el stream completo) y código HTTP
+- GraphMetricsHandler: callbacks del grafo → latencia por nodo, llamadas al LLM y tokens
+- instrument_checkpointer: latencia de lecturas/escrituras del checkpointer
+- timed(...)         : etapas del propio servidor (conversión de mensajes, codificación)
+
+Se activa con METRICS_ENABLED=1; desactivado, el servidor no registra callbacks ni envoltorios.
+"""
+import os # Lectura de variables de entorno
+import threading # Los nodos síncronos reportan desde hilos del executor
+import time # Medición de tiempos
+from bisect import bisect_left # Búsqueda del bucket de un histograma
+from contextlib import contextmanager # Temporizador como context manager
+from functools import wraps # Conserva el nombre de los métodos envueltos
+from typing import Any, Dict, Optional, Sequence, Tuple # Tipos para anotaciones
+from uuid import UUID # Identificadores de ejecución de LangChain
+
+from langchain_core.callbacks import BaseCallbackHandler # Interfaz de callbacks de LangChain
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "0").lower() in ("1", "true", "yes")
+
+# Buckets (segundos) pensados para latencias de LLM: de milisegundos a un minuto
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(names: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    """Histograma con etiquetas; observe() es O(log buckets) y seguro entre hilos."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS):
+        self.name, self.documentation, self.labelnames = name, documentation, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], list] = {} # etiquetas → [conteos por bucket..., suma, total]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labels, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {series[-1]}")
+        return "\n".join(lines)
+
+
+class Counter:
+    """Contador con etiquetas, seguro entre hilos."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name, self.documentation, self.labelnames = name, documentation, tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float, *labels: str):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = dict(self._values)
+        for labels, value in sorted(snapshot.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return "\n".join(lines)
+
+
+# MÉTRICAS DEL SERVIDOR
+REQUEST_SECONDS = Histogram("task_maistro_request_seconds", "Latencia de cada petición HTTP", ("endpoint", "status"))
+STAGE_SECONDS = Histogram("task_maistro_stage_seconds", "Latencia de etapas internas del servidor", ("stage",))
+NODE_SECONDS = Histogram("task_maistro_node_seconds", "Latencia de cada nodo del grafo", ("node",))
+LLM_SECONDS = Histogram("task_maistro_llm_seconds", "Latencia de cada llamada al modelo", ("node",))
+LLM_TOKENS = Counter("task_maistro_llm_tokens_total", "Tokens consumidos por las llamadas al modelo", ("node", "type"))
+CHECKPOINT_SECONDS = Histogram("task_maistro_checkpoint_seconds", "Latencia de lecturas/escrituras del checkpointer", ("op",))
+
+ALL_METRICS = (REQUEST_SECONDS, STAGE_SECONDS, NODE_SECONDS, LLM_SECONDS, LLM_TOKENS, CHECKPOINT_SECONDS)
+
+
+def render_metrics() -> str:
+    """Texto en formato de exposición de Prometheus con todas las métricas."""
+    return "\n".join(metric.render() for metric in ALL_METRICS) + "\n"
+
+
+@contextmanager
+def timed(stage: str):
+    """Mide una etapa del servidor (no hace nada si las métricas están desactivadas)."""
+    if not METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage)
+
+
+class GraphMetricsHandler(BaseCallbackHandler):
+    """Callbacks del grafo: tiempos por nodo, por llamada al LLM y tokens consumidos."""
+
+    run_inline = True # Se ejecuta en el mismo hilo, sin saltar a un executor
+
+    def __init__(self):
+        # run_id → (inicio, nodo); las entradas viven solo mientras dura la ejecución
+        self._starts: Dict[UUID, Tuple[float, str]] = {}
+
+    def on_chain_start(self, serialized: Optional[Dict[str, Any]], inputs: Any, *, run_id: UUID,
+                       metadata: Optional[Dict[str, Any]] = None, **kwargs: Any):
+        node = (metadata or {}).get("langgraph_node")
+        # Solo la ejecución del nodo en sí (no cada runnable interno) lleva su propio nombre
+        if node is not None and kwargs.get("name") == node:
+            self._starts[run_id] = (time.perf_counter(), node)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any):
+        start = self._starts.pop(run_id, None)
+        if start is not None:
+            NODE_SECONDS.observe(time.perf_counter() - start[0], start[1])
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self.on_chain_end(None, run_id=run_id)
+
+    def on_chat_model_start(self, serialized: Optional[Dict[str, Any]], messages: Any, *, run_id: UUID,
+                            metadata: Optional[Dict[str, Any]] = None, **kwargs: Any):
+        self._starts[run_id] = (time.perf_counter(), (metadata or {}).get("langgraph_node", "unknown"))
+
+    def on_llm_start(self, serialized: Optional[Dict[str, Any]], prompts: Any, *, run_id: UUID,
+                     metadata: Optional[Dict[str, Any]] = None, **kwargs: Any):
+        self.on_chat_model_start(serialized, prompts, run_id=run_id, metadata=metadata)
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any):
+        start = self._starts.pop(run_id, None)
+        if start is None:
+            return
+        elapsed, node = time.perf_counter() - start[0], start[1]
+        LLM_SECONDS.observe(elapsed, node)
+        # Los modelos de chat reportan el uso en usage_metadata de cada mensaje generado
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    LLM_TOKENS.inc(usage.get("input_tokens", 0), node, "input")
+                    LLM_TOKENS.inc(usage.get("output_tokens", 0), node, "output")
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        start = self._starts.pop(run_id, None)
+        if start is not None:
+            LLM_SECONDS.observe(time.perf_counter() - start[0], start[1])
+
+
+def instrument_checkpointer(checkpointer):
+    """Envuelve (en la propia instancia) los métodos de lectura/escritura del checkpointer."""
+    def wrap_async(name: str, op: str):
+        method = getattr(checkpointer, name)
+
+        @wraps(method)
+        async def timed_method(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                CHECKPOINT_SECONDS.observe(time.perf_counter() - start, op)
+        setattr(checkpointer, name, timed_method)
+
+    wrap_async("aget_tuple", "read")
+    wrap_async("aput", "write")
+    wrap_async("aput_writes", "write_pending")
+    return checkpointer
+
+
+class MetricsMiddleware:
+    """Middleware ASGI que mide cada petición hasta el último byte de la respuesta."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        status = "500"
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Se usa la plantilla de la ruta (no la URL) para no multiplicar las series
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint, status)
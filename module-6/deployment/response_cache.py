@@ -0,0 +1,64 @@
+"""
+Caché de respuestas de /invoke para peticiones repetidas (reintentos, tests de integración).
+
+Una respuesta se guarda bajo dos claves posibles:
+- hash(petición + checkpoint del hilo tras la ejecución): un reenvío idéntico encuentra el hilo
+  exactamente en ese checkpoint, así que obtiene la misma respuesta sin volver a ejecutar el grafo.
+  Solo con history_mode=full: en modo delta el mismo texto repetido es un turno nuevo
+- (thread_id, Idempotency-Key): si el cliente envía la cabecera, el reintento acierta aunque
+  el cuerpo no sea byte a byte igual
+
+Las entradas caducan tras `ttl` segundos y, si se llena, se expulsa la menos usada (LRU).
+"""
+import hashlib # Hash estable de las peticiones
+import json # Serialización canónica antes del hash
+import os # Lectura de variables de entorno
+import time # Caducidad de las entradas
+from collections import OrderedDict # Orden de uso para la expulsión LRU
+from typing import Any, Dict, Hashable, Optional # Tipos para anotaciones
+
+# Número máximo de respuestas guardadas (0 = caché desactivada)
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "0"))
+# Segundos que una respuesta sigue siendo válida
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", "300"))
+
+
+def request_key(payload: Dict[str, Any], checkpoint_id: Optional[str]) -> str:
+    """Clave de caché: hash de la petición (mensajes y configuración) y del checkpoint del hilo."""
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    digest = hashlib.sha256(canonical.encode("utf-8"))
+    digest.update(b"\0" + (checkpoint_id or "").encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """Caché LRU con caducidad por entrada (pensada para usarse desde el event loop)."""
+
+    def __init__(self, maxsize: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict() # clave → (expira_en, valor)
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key) # Marca la entrada como usada recientemente
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False) # Expulsa la menos usada
+
+    def __len__(self) -> int:
+        return len(self._entries)
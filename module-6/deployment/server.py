@@ -3,37 +3,108 @@ Servidor FastAPI sencillo para exponer el grafo de LangGraph como una API.
 Esta es una alternativa ligera a 'langgraph up' para despliegues con Docker.
 """
 # Importa los módulos necesarios de FastAPI para el servidor web y manejo de errores
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Header, Request, WebSocket, WebSocketDisconnect
 # Importa StreamingResponse para manejar respuestas en tiempo real (streaming)
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
 # Importa BaseModel de Pydantic para definir el esquema de los datos de entrada/salida
 from pydantic import BaseModel
 # Importa tipos de Python para anotaciones de tipo claras
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal, AsyncIterator
 # Importa uvicorn para ejecutar la aplicación web ASGI
 import uvicorn
 # Importa json para manipular strings en formato JSON
 import json
+# orjson (opcional) acelera la codificación JSON de respuestas y líneas NDJSON
+try:
+    import orjson
+except ImportError:
+    orjson = None
+# Importa os para leer la configuración desde variables de entorno
+import os
+# Importa uuid para identificar los mensajes nuevos de cada turno
+import uuid
+# Importa asyncio para configurar el executor del event loop
+import asyncio
+# Cuenta los thread_id repetidos de un /batch
+from collections import Counter
+# Pool de hilos acotado donde se ejecutan los nodos síncronos del grafo
+from concurrent.futures import ThreadPoolExecutor
+# Permite definir el ciclo de vida (arranque/apagado) de la aplicación
+from contextlib import asynccontextmanager, aclosing
 
-# Importa el grafo definido anteriormente en el archivo task_maistro
-from task_maistro import graph
-# Importa el almacenamiento en memoria para nodos que requieren guardar datos (como el perfil del usuario)
-from langgraph.store.memory import InMemoryStore
-# Importa el checkpointer en memoria para guardar el historial de la conversación (threads)
-from langgraph.checkpoint.memory import MemorySaver
+# Importa el constructor del grafo para compilarlo con persistencia
+from task_maistro import builder
+# Construcción anticipada del modelo y los extractores (se hace en segundo plano al arrancar)
+from task_maistro import warm_up
+# Nodos de actualización de memoria que ejecuta el worker del modo background
+from task_maistro import MEMORY_UPDATE_NODES
+# Worker de la cola duradera de actualizaciones de memoria (memory_update_mode="background")
+from memory_jobs import MemoryJobWorker, MEMORY_JOB_WORKER
+# Fábrica de backends de persistencia (memoria, SQLite, DynamoDB o MongoDB según MEMORY_BACKEND)
+from backends import open_backends, CHECKPOINT_DURABILITY, DELTA_CHECKPOINT_DURABILITY, MEMORY_BACKEND
+# Conversión de mensajes JSON <-> LangChain compartida por todos los endpoints
+from message_codec import to_lc_messages, content_text, messages_to_dicts
+# Control de concurrencia por thread_id (políticas de "double texting")
+from thread_runs import ThreadRunManager, ThreadBusyError, RunInterruptedError, ClientDisconnectedError
+# Métricas de latencia en formato Prometheus (se activan con METRICS_ENABLED=1)
+from metrics import (
+    METRICS_ENABLED, GraphMetricsHandler, MetricsMiddleware, instrument_checkpointer, render_metrics, timed,
+)
+# Control de admisión: límite de concurrencia, cola acotada y límite por usuario (429/503 con Retry-After)
+from admission import AdmissionController, AdmissionRejected, is_throttling_error
+# Caché opcional de respuestas de /invoke (se activa con RESPONSE_CACHE_SIZE > 0)
+from response_cache import ResponseCache, request_key
 
-# Inicializa el almacenamiento de nodos (InMemoryStore)
-store = InMemoryStore()
-# Inicializa el guardado de historial de hilos (MemorySaver)
-memory = MemorySaver()
+# Grafo compilado con el checkpointer (memoria corta) y el store (memoria larga persistente).
+# Se compila en el arranque (lifespan) porque los backends abren conexiones asíncronas
+compiled_graph = None
+# Tarea en segundo plano que construye el modelo y los extractores; /ready responde 200 cuando termina
+warmup_task: Optional[asyncio.Future] = None
+
+# Número máximo de nodos síncronos (llamadas a Bedrock, Trustcall...) ejecutándose a la vez
+GRAPH_WORKERS = int(os.environ.get("GRAPH_WORKERS", "16"))
+
+
+def start_warm_up() -> asyncio.Future:
+    """Lanza warm_up() en el pool de hilos y retorna su futuro."""
+    return asyncio.get_running_loop().run_in_executor(None, warm_up)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Abre los backends de persistencia y configura el pool de hilos de los nodos síncronos."""
+    global compiled_graph, warmup_task
+    async with open_backends() as (checkpointer, store):
+        if METRICS_ENABLED:
+            # Mide las lecturas/escrituras de checkpoints
+            checkpointer = instrument_checkpointer(checkpointer)
+        # Compila el grafo inyectándole el checkpointer y el store del backend elegido
+        compiled_graph = builder.compile(checkpointer=checkpointer, store=store)
+        # ainvoke/astream delegan los nodos síncronos al executor por defecto del loop,
+        # así que lo sustituimos por uno acotado y configurable
+        executor = ThreadPoolExecutor(max_workers=GRAPH_WORKERS, thread_name_prefix="graph")
+        asyncio.get_running_loop().set_default_executor(executor)
+        # El cliente de Bedrock y los extractores se crean sin bloquear el arranque:
+        # /health responde de inmediato y /ready cuando ya se pueden atender peticiones sin coste extra
+        warmup_task = start_warm_up()
+        # Procesa las actualizaciones de memoria encoladas (también las pendientes de antes de un reinicio)
+        memory_worker = MemoryJobWorker(store, MEMORY_UPDATE_NODES) if MEMORY_JOB_WORKER else None
+        if memory_worker is not None:
+            memory_worker.start()
+        app.state.memory_worker = memory_worker
+        yield
+        if memory_worker is not None:
+            await memory_worker.stop()
+        # Espera a que terminen los nodos en curso antes de cerrar las conexiones
+        executor.shutdown(wait=True)
 
-# Importa el constructor del grafo para recompilarlo con persistencia
-from task_maistro import builder
-# Compila el grafo inyectándole el checkpointer (memoria corta) y el store (memoria larga persistente)
-compiled_graph = builder.compile(checkpointer=memory, store=store)
 
 # Crea la instancia principal de la aplicación FastAPI con un título y versión
-app = FastAPI(title="Task Maistro API", version="1.0.0")
+app = FastAPI(title="Task Maistro API", version="1.0.0", lifespan=lifespan)
+# Callbacks que alimentan las métricas por nodo/LLM (None si las métricas están desactivadas)
+metrics_handler = GraphMetricsHandler() if METRICS_ENABLED else None
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
 
 
 # DEFINE LOS MODELOS DE DATOS (SCHEMAS)
@@ -50,6 +121,15 @@ class InvokeRequest(BaseModel):
     user_id: str = "default_user" # ID del usuario (por defecto 'default_user')
     todo_category: str = "personal" # Categoría de tareas (por defecto 'personal')
     task_maistro_role: str = "You are a helpful chatbot." # Instrucciones del sistema
+    # "full": el cliente envía y recibe todo el historial (comportamiento original)
+    # "delta": el cliente envía solo el turno nuevo; el historial se retoma del checkpoint del
+    # thread_id y la respuesta contiene solo los mensajes de este turno
+    history_mode: Literal["full", "delta"] = "full"
+    # Qué hacer si el hilo ya tiene una ejecución en curso (None = MULTITASK_STRATEGY del servidor)
+    multitask_strategy: Optional[Literal["reject", "enqueue", "interrupt", "rollback"]] = None
+    # Continúa una ejecución que quedó a medias (cliente desconectado) desde su último checkpoint;
+    # en ese caso se ignoran los mensajes
+    resume: bool = False
 
 
 # Modelo de la respuesta de salida del endpoint /invoke
@@ -57,106 +137,643 @@ class InvokeResponse(BaseModel):
     messages: List[Dict[str, Any]] # Lista de mensajes procesados por el agente
 
 
+# Modelo de la petición de entrada al endpoint /batch
+class BatchRequest(BaseModel):
+    requests: List[InvokeRequest] # Conversaciones a ejecutar (cada una con su propio thread_id)
+    max_concurrency: Optional[int] = None # Límite de ejecuciones simultáneas (acotado por BATCH_MAX_CONCURRENCY)
+
+
+# Máximo de ejecuciones simultáneas de un mismo /batch
+BATCH_MAX_CONCURRENCY = int(os.environ.get("BATCH_MAX_CONCURRENCY", "8"))
+
+# Mensajes que conserva un hilo en history_mode="delta" (0 = todos; ver Configuration.max_history_messages)
+DELTA_HISTORY_MESSAGES = int(os.environ.get("DELTA_HISTORY_MESSAGES", "200"))
+
+# Política por defecto ante ejecuciones simultáneas sobre un mismo hilo (ver thread_runs.py)
+MULTITASK_STRATEGY = os.environ.get("MULTITASK_STRATEGY", "enqueue")
+thread_runs = ThreadRunManager(MULTITASK_STRATEGY)
+
+# Límites de admisión del servidor (ver admission.py; desactivados por defecto)
+admission = AdmissionController()
+
+# Respuestas de /invoke ya calculadas (ver response_cache.py)
+response_cache = ResponseCache()
+
+# Modos de streaming soportados por /stream (ver stream_graph)
+STREAM_MODES = ("values", "updates", "messages")
+
+
+# CODIFICACIÓN JSON RÁPIDA
+def dumps_bytes(obj: Any) -> bytes:
+    """Codifica a JSON (bytes) con orjson si está instalado, o con la librería estándar."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str)
+    return json.dumps(obj, ensure_ascii=False, default=str).encode("utf-8")
+
+
+def encode_ndjson(obj: Any) -> bytes:
+    """Codifica un objeto como una línea NDJSON."""
+    return dumps_bytes(obj) + b"\n"
+
+
+class FastJSONResponse(JSONResponse):
+    """Respuesta JSON que serializa directamente datos generados por el servidor.
+
+    Al devolver esta respuesta, FastAPI no vuelve a validar el contenido contra
+    response_model: los mensajes ya salen con la forma correcta de messages_to_dicts.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
+
+
+# FUNCIONES AUXILIARES DE CONVERSIÓN
+def prepare_input(request: InvokeRequest) -> Optional[Dict[str, Any]]:
+    """Construye la entrada del grafo; en modo delta marca el primer mensaje nuevo con un id."""
+    if request.resume:
+        # Sin entrada, LangGraph ejecuta los nodos pendientes del último checkpoint del hilo
+        return None
+    lc_messages = to_lc_messages(request.messages)
+    if request.history_mode == "delta":
+        if not lc_messages:
+            raise HTTPException(status_code=422, detail="history_mode=delta requiere al menos un mensaje nuevo")
+        # El id permite localizar el inicio de este turno en el estado final (ver to_response_messages)
+        lc_messages[0].id = str(uuid.uuid4())
+    return {"messages": lc_messages}
+
+
+def build_config(request: InvokeRequest) -> Dict[str, Any]:
+    """Construye la configuración configurable (usada por los nodos del grafo)."""
+    config = {
+        "configurable": {
+            "thread_id": request.thread_id,
+            "user_id": request.user_id,
+            "todo_category": request.todo_category,
+            "task_maistro_role": request.task_maistro_role,
+        }
+    }
+    if request.history_mode == "delta":
+        # El historial vive en el checkpoint: se acota para que el coste por turno no crezca con el hilo
+        config["configurable"]["max_history_messages"] = DELTA_HISTORY_MESSAGES
+    if metrics_handler is not None:
+        config["callbacks"] = [metrics_handler]
+    return config
+
+
+def checkpoint_durability(request: InvokeRequest) -> str:
+    """Durabilidad de los checkpoints de /invoke y /batch (en modo delta, una escritura por ejecución)."""
+    return DELTA_CHECKPOINT_DURABILITY if request.history_mode == "delta" else CHECKPOINT_DURABILITY
+
+
+def to_response_messages(result: Dict[str, Any], graph_input: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Convierte los objetos de mensaje de LangChain de vuelta a diccionarios JSON.
+
+    Si la entrada viene en modo delta (primer mensaje con id), solo se devuelven
+    los mensajes desde ese mensaje en adelante, es decir, los de este turno.
+    """
+    messages = result.get("messages", [])
+    first_id = graph_input["messages"][0].id if graph_input and graph_input["messages"] else None
+    if first_id:
+        # Busca desde el final: el turno actual siempre está al final del historial
+        for start in range(len(messages) - 1, -1, -1):
+            if getattr(messages[start], "id", None) == first_id:
+                messages = messages[start:]
+                break
+    return messages_to_dicts(messages)
+
+
+def cache_payload(request: InvokeRequest) -> Dict[str, Any]:
+    """Campos de la petición que determinan la respuesta (mensajes y configuración)."""
+    # La política de concurrencia no cambia el resultado, así que no forma parte de la clave
+    return request.model_dump(exclude={"multitask_strategy"})
+
+
+async def latest_checkpoint_id(thread_id: str) -> Optional[str]:
+    """Id del checkpoint más reciente del hilo (None si el hilo no existe)."""
+    saved = await compiled_graph.checkpointer.aget_tuple({"configurable": {"thread_id": thread_id}})
+    return saved.config["configurable"]["checkpoint_id"] if saved else None
+
+
+def rejection(error: AdmissionRejected) -> HTTPException:
+    """Convierte un rechazo de admisión en la respuesta HTTP con su Retry-After."""
+    return HTTPException(status_code=error.status_code, detail=error.detail,
+                         headers={"Retry-After": str(error.retry_after)})
+
+
+async def admit_request(user_id: Optional[str]) -> Optional[float]:
+    """Obtiene un hueco de ejecución o responde 429/503 al momento."""
+    try:
+        return await admission.admit(user_id)
+    except AdmissionRejected as e:
+        raise rejection(e)
+
+
+async def acquire_thread(request: InvokeRequest, config: Dict[str, Any]):
+    """Obtiene el turno del hilo; con la política 'reject' responde 409 si está ocupado."""
+    try:
+        return await thread_runs.acquire(compiled_graph, config, request.multitask_strategy)
+    except ThreadBusyError:
+        raise HTTPException(status_code=409, detail=f"El hilo {request.thread_id} tiene una ejecución en curso")
+
+
+# FUNCIONES AUXILIARES DE STREAMING
+def parse_stream_modes(stream_mode: str) -> List[str]:
+    """Valida los modos solicitados (separados por comas) antes de arrancar el grafo."""
+    modes = [mode.strip() for mode in stream_mode.split(",") if mode.strip()]
+    invalid = [mode for mode in modes if mode not in STREAM_MODES]
+    if not modes or invalid:
+        raise HTTPException(status_code=422, detail=f"stream_mode inválido: {stream_mode}")
+    return modes
+
+
+async def start_stream(request: InvokeRequest):
+    """Prepara la entrada y obtiene la admisión y el turno del hilo (antes de responder, para poder
+    devolver 429/503/409). Retorna (entrada del grafo, ThreadRun, admisión)."""
+    graph_input = prepare_input(request)
+    admitted = await admit_request(request.user_id)
+    try:
+        run = await acquire_thread(request, build_config(request))
+    except BaseException:
+        admission.release(admitted)
+        raise
+    return graph_input, run, admitted
+
+
+async def stream_events(graph_input: Optional[Dict[str, Any]], run, admitted: Optional[float],
+                        modes: List[str], http_request: Optional[Request] = None) -> AsyncIterator[Dict[str, Any]]:
+    """Ejecuta el grafo en streaming y emite cada evento como diccionario (común a NDJSON, SSE y WebSocket).
+
+    Libera el hilo y la admisión al terminar. Con `http_request`, si el cliente se va se cancela el
+    grafo: no se gastan más llamadas al modelo ni escrituras, y los pasos ya completados quedan en el
+    checkpoint para retomarlos con resume=true.
+    """
+    watcher = asyncio.ensure_future(cancel_on_disconnect(http_request, run)) if http_request is not None else None
+    try:
+        # Con una lista de modos, astream emite tuplas (modo, chunk)
+        async for mode, chunk in run.stream(compiled_graph.astream(
+            graph_input, config=run.config, stream_mode=modes, durability=CHECKPOINT_DURABILITY
+        )):
+            event = encode_stream_event(mode, chunk)
+            if event is not None:
+                yield event
+    except RunInterruptedError:
+        # Otra petición sobre el mismo hilo canceló esta ejecución
+        yield {"event": "interrupted"}
+    except ClientDisconnectedError:
+        # Nadie lee ya el stream
+        return
+    except Exception as e:
+        # Los errores a mitad del stream se notifican como un evento (la cabecera 200 ya se envió)
+        yield {"event": "error", "detail": str(e)}
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        # Cede el hilo a la siguiente petición en espera (cuando el grafo termine de cancelarse)
+        run.release()
+        admission.release(admitted)
+
+
+def encode_sse(event: Dict[str, Any]) -> bytes:
+    """Codifica un evento como mensaje Server-Sent Events (el tipo va en el campo `event`)."""
+    # El JSON compacto no contiene saltos de línea, así que cabe en un único campo `data`
+    return b"event: " + event.get("event", "values").encode() + b"\ndata: " + dumps_bytes(event) + b"\n\n"
+
+
+async def send_ws_event(websocket: WebSocket, event: Dict[str, Any]):
+    """Envía un evento como mensaje de texto JSON por el WebSocket."""
+    await websocket.send_text(dumps_bytes(event).decode("utf-8"))
+
+
+async def cancel_on_disconnect(http_request: Request, run):
+    """Espera a que el cliente cierre la conexión y cancela la ejecución del grafo."""
+    # Tras leer el cuerpo, el siguiente mensaje ASGI de la petición solo llega al desconectarse
+    while (await http_request.receive())["type"] != "http.disconnect":
+        pass
+    run.abandon()
+
+
+def encode_stream_event(mode: str, chunk: Any) -> Optional[Dict[str, Any]]:
+    """Convierte un evento de `astream` en un objeto JSON compacto (None si no aporta nada)."""
+    if mode == "messages":
+        # Delta de tokens: (fragmento del mensaje, metadatos del nodo que lo generó)
+        message, metadata = chunk
+        text = content_text(message.content)
+        if not text:
+            # Fragmentos vacíos (p.ej. argumentos de tool calls de Trustcall) no se envían
+            return None
+        return {
+            "event": "token",
+            "node": metadata.get("langgraph_node"),
+            "id": message.id,
+            "type": message.type,
+            "content": text,
+        }
+    if mode == "updates":
+        # Diff por nodo: solo los mensajes que cada nodo añadió al estado
+        return {
+            "event": "update",
+            "nodes": {
+                node: {"messages": messages_to_dicts((update or {}).get("messages", []))}
+                for node, update in chunk.items()
+            },
+        }
+    # Modo "values": estado completo acumulado (formato original del endpoint)
+    return {"messages": [{"content": str(chunk)}]}
+
+
+# FUNCIONES AUXILIARES DE ESTADO DE HILOS
+# Campos que se pueden pedir de un checkpoint (?fields=...) y cómo se serializa cada uno
+SNAPSHOT_FIELDS = {
+    "values": None, # Se serializa en project_snapshot (admite last_messages)
+    "next": lambda snapshot: list(snapshot.next),
+    "checkpoint_id": lambda snapshot: snapshot.config["configurable"].get("checkpoint_id"),
+    "parent_checkpoint_id": lambda snapshot: (snapshot.parent_config or {}).get("configurable", {}).get("checkpoint_id"),
+    "created_at": lambda snapshot: snapshot.created_at,
+    "metadata": lambda snapshot: snapshot.metadata,
+}
+# Por defecto el historial no incluye los mensajes de cada checkpoint (son la parte más pesada)
+HISTORY_DEFAULT_FIELDS = "checkpoint_id,parent_checkpoint_id,created_at,next,metadata"
+# Tamaño máximo de página de /threads/{thread_id}/history
+HISTORY_MAX_LIMIT = 100
+
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """Valida la proyección pedida (campos separados por comas; None = todos)."""
+    if fields is None:
+        return list(SNAPSHOT_FIELDS)
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    invalid = [name for name in names if name not in SNAPSHOT_FIELDS]
+    if not names or invalid:
+        raise HTTPException(status_code=422, detail=f"fields inválido: {fields} (opciones: {', '.join(SNAPSHOT_FIELDS)})")
+    return names
+
+
+def project_snapshot(snapshot, fields: List[str], last_messages: Optional[int] = None) -> Dict[str, Any]:
+    """Serializa solo los campos pedidos de un StateSnapshot."""
+    item = {name: SNAPSHOT_FIELDS[name](snapshot) for name in fields if name != "values"}
+    if "values" in fields:
+        messages = snapshot.values.get("messages", [])
+        if last_messages is not None:
+            # Solo la cola del historial (lo que el cliente va a pintar)
+            messages = messages[-last_messages:] if last_messages else []
+        item["values"] = {"messages": messages_to_dicts(messages)}
+    return item
+
+
 # DEFINE LOS ENDPOINTS (RUTAS)
 # Endpoint de diagnóstico para verificar que el servidor está vivo
 @app.get("/health")
 async def health_check():
-    """Endpoint de salud del servicio."""
+    """Endpoint de salud del servicio (liveness: el proceso responde)."""
     return {"status": "healthy"} # Retorna un status 200 OK
 
 
+# Endpoint de disponibilidad: el balanceador solo debe enviar tráfico cuando responde 200
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: backends abiertos, grafo compilado y modelo/extractores construidos."""
+    global warmup_task
+    if compiled_graph is None or warmup_task is None or not warmup_task.done():
+        return JSONResponse({"status": "starting"}, status_code=503)
+    error = warmup_task.exception()
+    if error is not None:
+        # Reintenta en segundo plano (p.ej. credenciales que aún no estaban disponibles)
+        warmup_task = start_warm_up()
+        return JSONResponse({"status": "error", "detail": str(error)}, status_code=503)
+    return {"status": "ready"}
+
+
+# Endpoint de métricas en formato de exposición de Prometheus
+if METRICS_ENABLED:
+    @app.get("/metrics")
+    async def metrics_endpoint():
+        """Latencias por endpoint, nodo, llamada al LLM y checkpoint, y tokens consumidos."""
+        return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+# Endpoint para leer el estado actual de un hilo (evita que el cliente guarde y reenvíe el historial)
+@app.get("/threads/{thread_id}/state")
+async def get_thread_state(
+    thread_id: str,
+    # Campos a devolver, separados por comas (por defecto todos)
+    fields: Optional[str] = Query(None),
+    # Devuelve solo los últimos N mensajes de values
+    last_messages: Optional[int] = Query(None, ge=0),
+):
+    """Estado del último checkpoint del hilo."""
+    names = parse_fields(fields)
+    snapshot = await compiled_graph.aget_state({"configurable": {"thread_id": thread_id}})
+    if snapshot.created_at is None:
+        # Sin checkpoints: el hilo no existe
+        raise HTTPException(status_code=404, detail=f"El hilo {thread_id} no existe")
+    return FastJSONResponse(project_snapshot(snapshot, names, last_messages))
+
+
+# Endpoint para recorrer los checkpoints de un hilo, del más reciente al más antiguo
+@app.get("/threads/{thread_id}/history")
+async def get_thread_history(
+    thread_id: str,
+    limit: int = Query(10, ge=1, le=HISTORY_MAX_LIMIT),
+    # Cursor: checkpoint_id a partir del cual continuar (next_cursor de la página anterior)
+    before: Optional[str] = Query(None),
+    fields: str = Query(HISTORY_DEFAULT_FIELDS),
+    last_messages: Optional[int] = Query(None, ge=0),
+):
+    """Página de checkpoints del hilo con paginación por cursor."""
+    names = parse_fields(fields)
+    config = {"configurable": {"thread_id": thread_id}}
+    cursor = {"configurable": {"thread_id": thread_id, "checkpoint_id": before}} if before else None
+    if cursor is not None and await compiled_graph.checkpointer.aget_tuple(cursor) is None:
+        # Los checkpointers filtran por checkpoint_id < before: un cursor inventado devolvería una página
+        if await compiled_graph.checkpointer.aget_tuple(config) is None:
+            raise HTTPException(status_code=404, detail=f"El hilo {thread_id} no existe")
+        raise HTTPException(status_code=422, detail=f"El cursor {before} no pertenece al historial de {thread_id}")
+    # Se pide un elemento de más para saber si hay otra página sin una consulta adicional
+    snapshots = [
+        snapshot async for snapshot in compiled_graph.aget_state_history(config, before=cursor, limit=limit + 1)
+    ]
+    if not snapshots and cursor is None:
+        # Sin checkpoints: el hilo no existe (igual que en /threads/{thread_id}/state)
+        raise HTTPException(status_code=404, detail=f"El hilo {thread_id} no existe")
+    page = snapshots[:limit]
+    return FastJSONResponse({
+        "items": [project_snapshot(snapshot, names, last_messages) for snapshot in page],
+        "next_cursor": page[-1].config["configurable"]["checkpoint_id"] if len(snapshots) > limit else None,
+    })
+
+
 # Endpoint para ejecutar el grafo de forma síncrona (espera a que termine)
 @app.post("/invoke", response_model=InvokeResponse)
-async def invoke_graph(request: InvokeRequest):
+async def invoke_graph(
+    request: InvokeRequest,
+    # Clave opcional del cliente para que los reintentos de una misma petición no repitan la ejecución
+    idempotency_key: Optional[str] = Header(None),
+):
     """Invoca el grafo con una lista de mensajes."""
+    with timed("convert"):
+        graph_input = prepare_input(request)
+    # Rechaza al momento (429/503) si el usuario superó su límite o el servidor está saturado
+    admitted = await admit_request(request.user_id)
     try:
-        # Importa las clases de mensajes oficiales de LangChain
-        from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-        
-        # Convierte los mensajes recibidos formato JSON a objetos de LangChain
-        lc_messages = []
-        for msg in request.messages:
-            if msg.role == "user" or msg.role == "human":
-                lc_messages.append(HumanMessage(content=msg.content))
-            elif msg.role == "assistant" or msg.role == "ai":
-                lc_messages.append(AIMessage(content=msg.content))
-            elif msg.role == "system":
-                lc_messages.append(SystemMessage(content=msg.content))
-            else:
-                lc_messages.append(HumanMessage(content=msg.content))
-        
-        # Configuración del estado configurable (usado por los nodos del grafo)
-        config = {
-            "configurable": {
-                "thread_id": request.thread_id,
-                "user_id": request.user_id,
-                "todo_category": request.todo_category,
-                "task_maistro_role": request.task_maistro_role,
-            }
-        }
-        
-        # Ejecuta el grafo pasando los mensajes y la configuración
-        result = compiled_graph.invoke({"messages": lc_messages}, config=config)
-        
-        # Convierte los objetos de mensaje de LangChain de vuelta a diccionarios JSON
-        response_messages = []
-        for msg in result.get("messages", []):
-            response_messages.append({
-                "role": msg.type if hasattr(msg, 'type') else "unknown",
-                "content": msg.content if hasattr(msg, 'content') else str(msg),
-            })
+        # Espera el turno del hilo (o interrumpe la ejecución en curso) según la política
+        run = await acquire_thread(request, build_config(request))
+    except BaseException:
+        admission.release(admitted)
+        raise
+    try:
+        if response_cache.enabled:
+            # Un reenvío idéntico encuentra el hilo en el checkpoint que dejó la ejecución original
+            # (la espera por el turno del hilo garantiza que esa ejecución ya terminó). Solo vale con el
+            # historial completo: en modo delta, repetir el mismo texto ("ok", "gracias") es un turno
+            # nuevo, así que esos reintentos solo se reconocen por Idempotency-Key
+            idempotency = ("idempotency", request.thread_id, idempotency_key) if idempotency_key else None
+            payload = cache_payload(request) if request.history_mode == "full" else None
+            cached = idempotency and response_cache.get(idempotency)
+            if cached is None and payload is not None:
+                cached = response_cache.get(request_key(payload, run.start_checkpoint_id))
+                if cached is not None and idempotency:
+                    # Los reintentos con esta clave deben acertar aunque cambie el cuerpo
+                    response_cache.put(idempotency, cached)
+            if cached is not None:
+                return FastJSONResponse(cached, headers={"X-Cache": "hit"})
+
+        # Ejecuta el grafo de forma asíncrona para no bloquear el event loop
+        result = await run.execute(compiled_graph.ainvoke(graph_input, config=run.config, durability=checkpoint_durability(request)))
         
         # Retorna la lista de mensajes generada por el agente
-        return InvokeResponse(messages=response_messages)
+        # (response_model=InvokeResponse se mantiene solo para documentar el esquema en OpenAPI)
+        with timed("encode"):
+            response = {"messages": to_response_messages(result, graph_input)}
+
+        if response_cache.enabled:
+            if payload is not None:
+                # Se guarda bajo el checkpoint resultante: es el que verá un reenvío de la misma petición
+                response_cache.put(request_key(payload, await latest_checkpoint_id(request.thread_id)), response)
+            if idempotency:
+                response_cache.put(idempotency, response)
+        return FastJSONResponse(response)
     
+    except RunInterruptedError:
+        # Otra petición sobre el mismo hilo canceló esta ejecución (política interrupt/rollback)
+        raise HTTPException(status_code=409, detail=f"Ejecución interrumpida por un mensaje más reciente en {request.thread_id}")
     except Exception as e:
+        if is_throttling_error(e):
+            # Bedrock limitó las llamadas: 503 con Retry-After en lugar de un 500 genérico
+            raise rejection(admission.throttled())
         # En caso de error, retorna un error 500 con el detalle de la excepción
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        # Cede el hilo a la siguiente petición en espera
+        run.release()
+        admission.release(admitted)
+
+
+# Endpoint para ejecutar muchas conversaciones en una sola petición
+@app.post("/batch")
+async def batch_graph(batch: BatchRequest):
+    """Ejecuta varias peticiones en paralelo y devuelve cada resultado (NDJSON) según va terminando."""
+    concurrency = min(batch.max_concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+    if concurrency < 1:
+        raise HTTPException(status_code=422, detail="max_concurrency debe ser >= 1")
+
+    # Dos conversaciones del mismo hilo en un lote no tienen un orden definido: se rechaza el lote
+    thread_counts = Counter(request.thread_id for request in batch.requests)
+    duplicated = sorted(thread_id for thread_id, count in thread_counts.items() if count > 1)
+    if duplicated:
+        raise HTTPException(status_code=422, detail=f"thread_id repetido en el lote: {', '.join(duplicated)}")
+
+    inputs = [prepare_input(request) for request in batch.requests]
+    configs = [build_config(request) for request in batch.requests]
+
+    # Cada conversación del lote consume un token de su usuario; el lote ocupa un hueco de ejecución
+    try:
+        for request in batch.requests:
+            admission.charge(request.user_id)
+    except AdmissionRejected as e:
+        raise rejection(e)
+    admitted = await admit_request(None)
+    slots = asyncio.Semaphore(concurrency)
+
+    async def run_item(index: int):
+        request = batch.requests[index]
+        async with slots:
+            # Turno del hilo como en /invoke: el lote se coordina con /invoke, /stream y /ws del mismo hilo
+            try:
+                run = await thread_runs.acquire(compiled_graph, configs[index], request.multitask_strategy)
+            except ThreadBusyError:
+                return index, f"El hilo {request.thread_id} tiene una ejecución en curso"
+            try:
+                result = await run.execute(
+                    compiled_graph.ainvoke(inputs[index], config=run.config, durability=checkpoint_durability(request))
+                )
+                return index, result
+            except RunInterruptedError:
+                return index, f"Ejecución interrumpida por un mensaje más reciente en {request.thread_id}"
+            except Exception as e:
+                # Un fallo se reporta en su línea sin abortar el resto del lote
+                return index, str(e)
+            finally:
+                run.release()
+
+    async def generate():
+        tasks = [asyncio.ensure_future(run_item(index)) for index in range(len(inputs))]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                index, result = await finished
+                item = {"index": index, "thread_id": batch.requests[index].thread_id}
+                if isinstance(result, str):
+                    item["error"] = result
+                else:
+                    item["messages"] = to_response_messages(result, inputs[index])
+                yield encode_ndjson(item)
+        finally:
+            # Si el cliente se desconecta, se cancelan las conversaciones que queden
+            for task in tasks:
+                task.cancel()
+            admission.release(admitted)
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
 
 
 # Endpoint para ejecutar el grafo en modo streaming (recibir tokens poco a poco)
 @app.post("/stream")
-async def stream_graph(request: InvokeRequest):
-    """Retorna la respuesta del grafo en modo streaming."""
+async def stream_graph(
+    request: InvokeRequest,
+    http_request: Request,
+    # Modos separados por comas: "messages" (deltas de tokens), "updates" (diff por nodo)
+    # o "values" (estado completo en cada paso, el formato original)
+    stream_mode: str = Query("messages,updates"),
+):
+    """Retorna la respuesta del grafo en modo streaming (NDJSON: un objeto JSON por línea)."""
+    modes = parse_stream_modes(stream_mode)
+    graph_input, run, admitted = await start_stream(request)
+    events = stream_events(graph_input, run, admitted, modes, http_request)
+    # Retorna una respuesta de streaming con cada evento como un objeto JSON seguido de un salto de línea
+    return StreamingResponse((encode_ndjson(event) async for event in events), media_type="application/x-ndjson")
+
+
+# Endpoint de streaming con Server-Sent Events (mejor soportado por proxies y por EventSource)
+@app.post("/stream/sse")
+async def stream_graph_sse(
+    request: InvokeRequest,
+    http_request: Request,
+    stream_mode: str = Query("messages,updates"),
+):
+    """Retorna los mismos eventos que /stream en formato text/event-stream."""
+    modes = parse_stream_modes(stream_mode)
+    graph_input, run, admitted = await start_stream(request)
+    events = stream_events(graph_input, run, admitted, modes, http_request)
+    return StreamingResponse(
+        (encode_sse(event) async for event in events),
+        media_type="text/event-stream",
+        # Evita que proxies intermedios (p.ej. nginx) almacenen el stream antes de reenviarlo
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Endpoint WebSocket: una conexión para muchos turnos de la misma conversación
+@app.websocket("/ws")
+async def websocket_graph(websocket: WebSocket):
+    """Chat interactivo sobre un WebSocket.
+
+    Los parámetros de la URL fijan la sesión (thread_id, user_id, todo_category, stream_mode...)
+    y cada mensaje del cliente es un turno: {"messages": [...]} (puede sobreescribir campos de la sesión).
+    Por defecto la sesión usa history_mode=delta: el historial vive en el checkpoint del hilo.
+    Cada turno emite los eventos del stream y termina con {"event": "end"}.
+    """
+    await websocket.accept()
+    session: Dict[str, Any] = dict(websocket.query_params)
     try:
-        from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-        
-        # Convierte los mensajes recibidos formato JSON a objetos de LangChain
-        lc_messages = []
-        for msg in request.messages:
-            if msg.role == "user" or msg.role == "human":
-                lc_messages.append(HumanMessage(content=msg.content))
-            elif msg.role == "assistant" or msg.role == "ai":
-                lc_messages.append(AIMessage(content=msg.content))
-            else:
-                lc_messages.append(HumanMessage(content=msg.content))
-        
-        # Configuración del estado configurable (usado por los nodos del grafo)
-        config = {
-            "configurable": {
-                "thread_id": request.thread_id,
-                "user_id": request.user_id,
-                "todo_category": request.todo_category,
-                "task_maistro_role": request.task_maistro_role,
-            }
-        }
-        
-        # Función generadora interna para el streaming
-        async def generate():
-            # Itera sobre los chunks generados por el grafo en tiempo real
-            for chunk in compiled_graph.stream({"messages": lc_messages}, config=config, stream_mode="values"):
-                # Retorna cada chunk como un string JSON seguido de un salto de línea
-                yield json.dumps({"messages": [{"content": str(chunk)}]}) + "\n"
-        
-        # Retorna una respuesta de streaming con el generador definido
-        return StreamingResponse(generate(), media_type="application/x-ndjson")
-    
-    except Exception as e:
-        # Manejo de excepciones para el stream
-        raise HTTPException(status_code=500, detail=str(e))
+        modes = parse_stream_modes(session.pop("stream_mode", "messages,updates"))
+    except HTTPException as e:
+        # 1008: la sesión pedida no es válida
+        await websocket.close(code=1008, reason=e.detail)
+        return
+    session.setdefault("history_mode", "delta")
+
+    # Los turnos se leen en una tarea aparte para detectar la desconexión a mitad de un turno;
+    # los que llegan mientras se procesa otro esperan en la cola (se atienden en orden)
+    turns: asyncio.Queue = asyncio.Queue()
+    current: Dict[str, Any] = {} # Ejecución en curso ("run")
+
+    async def read_turns():
+        try:
+            while True:
+                await turns.put(await websocket.receive_text())
+        except WebSocketDisconnect:
+            pass
+        finally:
+            await turns.put(None)
+            if "run" in current:
+                current["run"].abandon()
+
+    reader = asyncio.ensure_future(read_turns())
+    try:
+        while (frame := await turns.get()) is not None:
+            try:
+                request = InvokeRequest(**{**session, **json.loads(frame)})
+                graph_input, run, admitted = await start_stream(request)
+            except (ValueError, TypeError) as e:
+                # JSON inválido o turno que no cumple el esquema (ValidationError es un ValueError)
+                await send_ws_event(websocket, {"event": "error", "status": 422, "detail": str(e)})
+                continue
+            except HTTPException as e:
+                # Rechazos de admisión (429/503) o hilo ocupado (409): la conexión sigue abierta
+                event = {"event": "error", "status": e.status_code, "detail": e.detail}
+                if e.headers and "Retry-After" in e.headers:
+                    event["retry_after"] = int(e.headers["Retry-After"])
+                await send_ws_event(websocket, event)
+                continue
+            current["run"] = run
+            async with aclosing(stream_events(graph_input, run, admitted, modes)) as events:
+                async for event in events:
+                    await send_ws_event(websocket, event)
+            current.pop("run", None)
+            await send_ws_event(websocket, {"event": "end"})
+    except (WebSocketDisconnect, RuntimeError):
+        # El cliente se fue mientras se le enviaban eventos
+        pass
+    finally:
+        reader.cancel()
+
+
+# ARRANQUE DEL SERVIDOR
+def serve(host: str = "0.0.0.0", port: int = 8000, workers: int = 1):
+    """Arranca la API con uno o varios procesos worker."""
+    if workers <= 1:
+        # Un solo proceso: uvicorn directamente
+        uvicorn.run(app, host=host, port=port)
+        return
+
+    # Con varios procesos, cada worker tiene su propia memoria: el estado debe vivir en un backend compartido
+    if MEMORY_BACKEND == "memory":
+        raise SystemExit("--workers > 1 requiere un backend compartido (MEMORY_BACKEND=sqlite, dynamodb o mongodb)")
+
+    # Gunicorn con workers de uvicorn: el proceso maestro ya importó este módulo (y task_maistro.builder),
+    # así que con preload_app los workers heredan el grafo por fork en lugar de reimportarlo
+    from gunicorn.app.base import BaseApplication
+
+    class TaskMaistroApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{host}:{port}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("worker_class", "uvicorn_worker.UvicornWorker")
+            self.cfg.set("preload_app", True)
+
+        def load(self):
+            return app
+
+    TaskMaistroApplication().run()
 
 
 # PUNTO DE ENTRADA DEL SCRIPT
 if __name__ == "__main__":
-    # Inicia el servidor uvicorn escuchando en todas las interfaces (0.0.0.0) y en el puerto 8000
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    import argparse
+    parser = argparse.ArgumentParser(description="Task Maistro API")
+    # Por defecto escucha en todas las interfaces (0.0.0.0) y en el puerto 8000
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    # Número de procesos worker (WEB_CONCURRENCY es la convención de uvicorn/gunicorn)
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", "1")))
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers)
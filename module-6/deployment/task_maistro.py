@@ -1,52 +1,68 @@
 import uuid # Genera identificadores únicos universales (UUID)
+import threading # Protege la construcción diferida del modelo y los extractores
 from datetime import datetime # Maneja fechas y horas
 
 from pydantic import BaseModel, Field # Validación de datos y esquemas con Pydantic
 
-from trustcall import create_extractor # Librería especializada en extraer información estructurada
-
 from typing import Literal, Optional, TypedDict # Tipos de datos para anotaciones de tipo claras
 
 from langchain_core.runnables import RunnableConfig # Configuración para ejecuciones de LangChain
+from langchain_core.runnables.config import merge_configs # Añade callbacks sin perder los del grafo
+from langchain_core.callbacks import BaseCallbackHandler # Base del callback que recoge las tool calls
+from langchain_core.outputs import LLMResult # Resultado que recibe on_llm_end
 from langchain_core.messages import merge_message_runs # Combina mensajes consecutivos del mismo rol
 from langchain_core.messages import SystemMessage, HumanMessage # Clases para mensajes de sistema y humanos
+from langchain_core.messages import RemoveMessage # Borra del hilo los mensajes fuera de la ventana
 
 # from langchain_openai import ChatOpenAI # (Comentado) Integración con OpenAI
-from langchain_aws import ChatBedrockConverse # Integración para modelos de AWS Bedrock
+# (ChatBedrockConverse y Trustcall se importan al construir el modelo y los extractores, ver get_model)
 from dotenv import load_dotenv # Carga variables desde archivos .env
 
 load_dotenv() # Carga las credenciales del entorno
 
 from langgraph.checkpoint.memory import MemorySaver # Checkpointer en memoria para persistencia de hilos
 from langgraph.graph import StateGraph, MessagesState, START, END # Elementos básicos para construir grafos
+from langgraph.types import Send # Reparte las actualizaciones de memoria entre nodos en paralelo
 from langgraph.store.base import BaseStore # Clase base para almacenamiento persistente
 from langgraph.store.memory import InMemoryStore # Implementación en memoria del store
 
 import configuration # Importa la configuración personalizada del proyecto
+import memory_jobs # Cola duradera de actualizaciones de memoria (modo background)
+from embeddings import get_embeddings # Embeddings para elegir las tareas relevantes (MEMORY_EMBEDDINGS)
+from memory_context import MemoryContextCache, version_op # Bloque de memoria del prompt, con caché
+from todo_repository import TodoRepository, put_many # Tareas con índice por estado y fecha límite; escrituras en lote
 
 ## Utilities (Utilidades)
 
-# Clase Spy para inspeccionar las llamadas a herramientas (tool calls) hechas por Trustcall
-class Spy:
+# Recoge las llamadas a herramientas de cada respuesta del modelo dentro de Trustcall, según terminan.
+# A diferencia de un listener on_end, no necesita que se conserve el árbol de ejecuciones completo
+class ToolCallRecorder(BaseCallbackHandler):
     def __init__(self):
-        self.called_tools = [] # Lista para almacenar las herramientas invocadas
-
-    def __call__(self, run):
-        # Función que se ejecuta al terminar un paso del grafo
-        q = [run]
-        while q:
-            r = q.pop()
-            if r.child_runs:
-                q.extend(r.child_runs) # Explora ejecuciones hijas
-            if r.run_type == "chat_model":
-                # Si es un modelo de chat, guarda sus llamadas a herramientas
-                self.called_tools.append(
-                    r.outputs["generations"][0][0]["message"]["kwargs"]["tool_calls"]
-                )
-
-# Función para extraer información legible de las llamadas a herramientas (parches o memorias nuevas)
-def extract_tool_info(tool_calls, schema_name="Memory"):
-    """Extrae información de llamadas a herramientas tanto para actualizaciones como creaciones."""
+        self.called_tools = [] # Una lista de tool calls por respuesta del modelo
+
+    def on_llm_end(self, response: LLMResult, **kwargs):
+        # Se ejecuta al terminar cada llamada al modelo (también en los reintentos de Trustcall)
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                if message is not None:
+                    self.called_tools.append(getattr(message, "tool_calls", []))
+
+    def attach(self, config: Optional[RunnableConfig] = None) -> RunnableConfig:
+        """Config del nodo con este callback añadido (se conservan los callbacks del grafo, p. ej. streaming)."""
+        return merge_configs(config, {"callbacks": [self]})
+
+    def changes(self, schema_name="Memory"):
+        """Cambios estructurados hechos por el extractor (ver tool_changes)."""
+        return tool_changes(self.called_tools, schema_name)
+
+    def summary(self, schema_name="Memory"):
+        """Resumen legible de los cambios; solo se formatea al pedirlo."""
+        return format_changes(self.changes(schema_name), schema_name)
+
+# Función para extraer los cambios de las llamadas a herramientas (parches o memorias nuevas)
+def tool_changes(tool_calls, schema_name="Memory"):
+    """Registros de cambio ({'type': 'update' | 'no_update' | 'new', ...}) a partir de las tool calls."""
     # Lista para acumular los cambios detectados
     changes = []
     
@@ -74,8 +90,11 @@ def extract_tool_info(tool_calls, schema_name="Memory"):
                     'type': 'new',
                     'value': call['args']
                 })
+    return changes
 
-    # Formatea los resultados en un solo string amigable para el usuario
+# Formatea los registros de cambio en un solo string amigable para el usuario
+def format_changes(changes, schema_name="Memory"):
+    """Texto con un párrafo por cambio (el que recibe task_mAIstro como respuesta de la herramienta)."""
     result_parts = []
     for change in changes:
         if change['type'] == 'update':
@@ -97,6 +116,16 @@ def extract_tool_info(tool_calls, schema_name="Memory"):
     
     return "\n\n".join(result_parts) # Une todo con saltos de línea
 
+# Función para extraer información legible de las llamadas a herramientas (parches o memorias nuevas)
+def extract_tool_info(tool_calls, schema_name="Memory"):
+    """Extrae información de llamadas a herramientas tanto para actualizaciones como creaciones."""
+    return format_changes(tool_changes(tool_calls, schema_name), schema_name)
+
+# Respuesta de un nodo de actualización a cada llamada a UpdateMemory que atiende
+def tool_responses(tool_calls, content):
+    """Un mensaje de herramienta por llamada: el modelo necesita respuesta para todas antes de seguir."""
+    return {"messages": [{"role": "tool", "content": content, "tool_call_id": tool_call['id']} for tool_call in tool_calls]}
+
 ## Schema definitions (Definición de Esquemas)
 
 # Esquema para el perfil del usuario
@@ -141,24 +170,90 @@ class UpdateMemory(TypedDict):
     """ Decisión sobre qué tipo de memoria actualizar """
     update_type: Literal['user', 'todo', 'instructions'] # Puede ser perfil, tareas o instrucciones
 
-# Inicialización del LLM (AWS Bedrock Nova Lite)
-llm_nova_lite = ChatBedrockConverse(
-    model="us.amazon.nova-2-lite-v1:0", # ID del modelo Nova 2 Lite
-    region_name="us-east-1", # Región de AWS
-    temperature=0.5, # Creatividad balanceada
-    max_tokens=2048, # Límite de tokens de salida
-    top_p=0.9, # Muestreo núcleo (nucleous sampling)
-)
-
-# Establece el modelo activo
-model = llm_nova_lite
-
-# Crea el extractor de Trustcall para el perfil del usuario (usado en el nodo update_profile)
-profile_extractor = create_extractor(
-    model,
-    tools=[Profile], # Usa el esquema Profile
-    tool_choice="Profile", # Forza al modelo a usar este esquema
-)
+# Estado que recibe cada nodo de actualización desde route_message (vía Send)
+class MemoryUpdateState(MessagesState):
+    tool_calls: list[dict] # Llamadas a UpdateMemory de su tipo que el nodo debe responder
+
+# Llamadas a UpdateMemory que atiende un nodo de actualización
+def requested_tool_calls(state: MemoryUpdateState, update_type: str) -> list[dict]:
+    """Las que envió route_message o, si el nodo se ejecuta fuera del grafo (memory_jobs), las del último mensaje."""
+    if state.get("tool_calls"):
+        return state["tool_calls"]
+    return [tool_call for tool_call in state['messages'][-1].tool_calls
+            if tool_call['args'].get('update_type') == update_type]
+
+# Documentos que devolvió Trustcall (nuevos o parcheados) por clave, listos para guardarse en lote
+def extracted_documents(result: dict) -> dict[str, dict]:
+    return {rmeta.get("json_doc_id", str(uuid.uuid4())): r.model_dump(mode="json")
+            for r, rmeta in zip(result["responses"], result["response_metadata"])}
+
+# Modelo activo. Se construye en el primer uso (get_model) para que importar este módulo no cree
+# el cliente de Bedrock; los benchmarks lo sustituyen asignando task_maistro.model directamente
+model = None
+_model_lock = threading.Lock()
+
+# Extractores de Trustcall memoizados por (esquemas, opciones), junto al modelo con el que se crearon
+_extractors = (None, {})
+_extractors_lock = threading.Lock()
+
+
+def get_model():
+    """Retorna el modelo activo, creando el cliente de Bedrock (Nova Lite) la primera vez."""
+    global model
+    if model is None:
+        with _model_lock:
+            if model is None:
+                from langchain_aws import ChatBedrockConverse # Integración para modelos de AWS Bedrock
+                model = ChatBedrockConverse(
+                    model="us.amazon.nova-2-lite-v1:0", # ID del modelo Nova 2 Lite
+                    region_name="us-east-1", # Región de AWS
+                    temperature=0.5, # Creatividad balanceada
+                    max_tokens=2048, # Límite de tokens de salida
+                    top_p=0.9, # Muestreo núcleo (nucleous sampling)
+                )
+    return model
+
+
+def get_extractor(*tools, tool_choice: Optional[str] = None, enable_inserts: bool = False):
+    """Retorna el extractor de Trustcall para `tools` y estas opciones, creándolo la primera vez.
+
+    create_extractor convierte los esquemas y compila el grafo interno de Trustcall; el resultado
+    no guarda estado entre llamadas, así que se comparte y cada nodo solo le añade su ToolCallRecorder.
+    """
+    global _extractors
+    current = get_model()
+    key = (tools, tool_choice, enable_inserts)
+    with _extractors_lock:
+        built_for, extractors = _extractors
+        if built_for is not current:
+            # El modelo cambió (p. ej. el stub de los benchmarks): los extractores anteriores no sirven
+            extractors = {}
+            _extractors = (current, extractors)
+        if key not in extractors:
+            from trustcall import create_extractor # Librería especializada en extraer información estructurada
+            extractors[key] = create_extractor(
+                current,
+                tools=list(tools),
+                tool_choice=tool_choice,
+                enable_inserts=enable_inserts,
+            )
+        return extractors[key]
+
+
+def get_profile_extractor():
+    """Retorna el extractor de Trustcall del perfil (usado en el nodo update_profile)."""
+    return get_extractor(Profile, tool_choice="Profile") # Forza al modelo a usar el esquema Profile
+
+
+def get_todo_extractor():
+    """Retorna el extractor de Trustcall de las tareas (usado en el nodo update_todos; permite inserciones)."""
+    return get_extractor(ToDo, tool_choice="ToDo", enable_inserts=True)
+
+
+def warm_up():
+    """Construye el modelo y los extractores por adelantado (lo usa la comprobación de readiness)."""
+    get_profile_extractor()
+    get_todo_extractor()
 
 ## Prompts (Mensajes del Sistema)
 
@@ -225,6 +320,61 @@ Your current instructions are:
 
 ## Node definitions (Definición de Nodos)
 
+# Bloques de memoria ya renderizados por (user_id, todo_category); los invalida bump_version()
+memory_context_cache = MemoryContextCache()
+
+# Texto del último mensaje del usuario (consulta para la búsqueda semántica de tareas)
+def latest_user_text(messages) -> Optional[str]:
+    for message in reversed(messages):
+        if message.type == "human":
+            content = message.content
+            if isinstance(content, str):
+                return content
+            # Contenido en bloques [{"type": "text", "text": ...}, ...]
+            return " ".join(block.get("text", "") for block in content if isinstance(block, dict))
+    return None
+
+# Mensaje del sistema de task_mAIstro con la memoria larga del usuario
+def build_system_message(store: BaseStore, user_id: str, todo_category: str, task_maistro_role: str, todo_limit: int,
+                         query: Optional[str] = None) -> str:
+    """Formatea MODEL_SYSTEM_MESSAGE una vez por versión de la memoria (como mucho `todo_limit` tareas).
+
+    Si hay más tareas que el límite, incluye las más parecidas a `query` (índice vectorial de memory_context).
+    """
+    # Perfil, tareas e instrucciones (de la caché si no cambiaron desde el último turno)
+    context = memory_context_cache.get(store, user_id, todo_category)
+    relevant = context.relevant_todo_block(get_embeddings(), query, todo_limit)
+    if relevant is not None:
+        return MODEL_SYSTEM_MESSAGE.format(
+            task_maistro_role=task_maistro_role, 
+            user_profile=context.user_profile, 
+            todo=relevant, 
+            instructions=context.instructions
+        )
+    prompt_key = (task_maistro_role, todo_limit)
+    system_msg = context.prompts.get(prompt_key)
+    if system_msg is None:
+        system_msg = context.prompts[prompt_key] = MODEL_SYSTEM_MESSAGE.format(
+            task_maistro_role=task_maistro_role, 
+            user_profile=context.user_profile, 
+            todo=context.todo_block(todo_limit), 
+            instructions=context.instructions
+        )
+    return system_msg
+
+def history_start(messages, limit: int) -> int:
+    """Posición del primer mensaje que se conserva con un máximo de `limit` mensajes (0 = todos).
+
+    El corte cae siempre al inicio de un turno (un HumanMessage) para no separar una llamada a
+    herramienta de su respuesta; el turno en curso nunca se recorta.
+    """
+    if limit <= 0 or len(messages) <= limit:
+        return 0
+    turns = [i for i, message in enumerate(messages) if isinstance(message, HumanMessage)]
+    if not turns:
+        return 0
+    return next((i for i in turns if len(messages) - i <= limit), turns[-1])
+
 # Nodo principal: conversa con el usuario y decide si hay que guardar información
 def task_mAIstro(state: MessagesState, config: RunnableConfig, store: BaseStore):
     """Carga memorias del store y las usa para personalizar la respuesta del chatbot."""
@@ -235,38 +385,24 @@ def task_mAIstro(state: MessagesState, config: RunnableConfig, store: BaseStore)
     todo_category = configurable.todo_category # Categoría de tareas
     task_maistro_role = configurable.task_maistro_role # Rol personalizado
 
-    # Busca el perfil del usuario en el store permanente
-    namespace = ("profile", todo_category, user_id)
-    memories = store.search(namespace)
-    user_profile = memories[0].value if memories else None
+    # Con max_history_messages, los turnos más antiguos salen del hilo (y del prompt)
+    start = history_start(state["messages"], int(configurable.max_history_messages))
+    messages = state["messages"][start:]
 
-    # Busca la lista de tareas en el store permanente
-    namespace = ("todo", todo_category, user_id)
-    memories = store.search(namespace)
-    todo = "\n".join(f"{mem.value}" for mem in memories) # Concatena las tareas
-
-    # Busca instrucciones personalizadas
-    namespace = ("instructions", todo_category, user_id)
-    memories = store.search(namespace)
-    instructions = memories[0].value if memories else ""
-    
-    # Prepara el mensaje del sistema con la información recuperada
-    system_msg = MODEL_SYSTEM_MESSAGE.format(
-        task_maistro_role=task_maistro_role, 
-        user_profile=user_profile, 
-        todo=todo, 
-        instructions=instructions
-    )
+    # Prepara el mensaje del sistema con la información recuperada del store
+    system_msg = build_system_message(store, user_id, todo_category, task_maistro_role, int(configurable.todo_prompt_limit),
+                                      latest_user_text(messages))
 
     # El modelo decide qué hacer; se le asocia la herramienta UpdateMemory para decidir la ruta
-    response = model.bind_tools([UpdateMemory]).invoke(
-        [SystemMessage(content=system_msg)] + state["messages"]
+    response = get_model().bind_tools([UpdateMemory]).invoke(
+        [SystemMessage(content=system_msg)] + messages
     )
 
-    return {"messages": [response]} # Retorna el mensaje del modelo
+    # Retorna el mensaje del modelo (y el borrado de los mensajes recortados)
+    return {"messages": [RemoveMessage(id=message.id) for message in state["messages"][:start]] + [response]}
 
 # Nodo para actualizar el perfil del usuario
-def update_profile(state: MessagesState, config: RunnableConfig, store: BaseStore):
+def update_profile(state: MemoryUpdateState, config: RunnableConfig, store: BaseStore):
     """Reflexiona sobre la historia y actualiza la colección de memorias del perfil."""
     
     # Configuración de usuario
@@ -290,31 +426,27 @@ def update_profile(state: MessagesState, config: RunnableConfig, store: BaseStor
         messages=[SystemMessage(content=TRUSTCALL_INSTRUCTION_FORMATTED)] + state["messages"][:-1]
     ))
 
-    # Usa el Spy para capturar qué herramientas llama el extractor
-    spy = Spy()
-    profile_extractor_with_spy = profile_extractor.with_listeners(on_end=spy)
+    # Recorder para capturar qué herramientas llama el extractor
+    recorder = ToolCallRecorder()
 
     # Lanza el extractor de Trustcall
-    result = profile_extractor_with_spy.invoke({
+    result = get_profile_extractor().invoke({
         "messages": updated_messages, 
         "existing": existing_memories
-    })
+    }, recorder.attach(config))
 
-    # Guarda los resultados (nuevos o parches) en el store persistente
-    for r, rmeta in zip(result["responses"], result["response_metadata"]):
-        store.put(namespace,
-                  rmeta.get("json_doc_id", str(uuid.uuid4())),
-                  r.model_dump(mode="json"),
-            )
+    # Guarda los resultados (nuevos o parches) en el store persistente en un solo viaje,
+    # junto con la nueva versión que invalida el bloque de memoria en caché de task_mAIstro
+    put_many(store, namespace, extracted_documents(result), [version_op(user_id, todo_category)])
     
-    # Recupera ID de la llamada a la herramienta original para responderla correctamente
-    tool_calls = state['messages'][-1].tool_calls
+    # Recupera los IDs de las llamadas a la herramienta original para responderlas correctamente
+    tool_calls = requested_tool_calls(state, "user")
     # Extrae descripción legible de lo que cambió para que el agente sepa
-    profile_update_msg = extract_tool_info(spy.called_tools, tool_name)
-    return {"messages": [{"role": "tool", "content": profile_update_msg, "tool_call_id": tool_calls[0]['id']}]}
+    profile_update_msg = recorder.summary(tool_name)
+    return tool_responses(tool_calls, profile_update_msg)
 
 # Nodo para actualizar la lista de tareas (ToDos)
-def update_todos(state: MessagesState, config: RunnableConfig, store: BaseStore):
+def update_todos(state: MemoryUpdateState, config: RunnableConfig, store: BaseStore):
     """Reflexiona sobre la historia y actualiza la colección de tareas."""
     
     # Configuración de usuario y categoría
@@ -322,11 +454,22 @@ def update_todos(state: MessagesState, config: RunnableConfig, store: BaseStore)
     user_id = configurable.user_id
     todo_category = configurable.todo_category
 
-    # Ruta para las tareas
-    namespace = ("todo", todo_category, user_id)
-
-    # Contexto de tareas existentes
-    existing_items = store.search(namespace)
+    # Tareas del usuario (con índice por estado y fecha límite)
+    todos = TodoRepository(store, user_id, todo_category)
+
+    # Contexto de tareas existentes: solo las abiertas, las de fecha límite más próxima primero
+    todo_limit = int(configurable.todo_extractor_limit)
+    query = latest_user_text(state["messages"])
+    embeddings = get_embeddings()
+    # Las abiertas salen del índice por estado (sin leer el historial de done/archived)
+    open_entries = todos.index_entries()
+    if todo_limit > 0 and len(open_entries) > todo_limit and query and embeddings is not None:
+        # Si no caben todas, las más parecidas al último mensaje del usuario (solo entonces hace falta
+        # el índice vectorial del bloque de memoria)
+        context = memory_context_cache.get(store, user_id, todo_category)
+        existing_items = todos.get_many(context.similar(embeddings, query, todo_limit, open_only=True))
+    else:
+        existing_items = todos.fetch(open_entries, todo_limit)
     tool_name = "ToDo"
     existing_memories = ([(existing_item.key, tool_name, existing_item.value)
                           for existing_item in existing_items]
@@ -338,39 +481,31 @@ def update_todos(state: MessagesState, config: RunnableConfig, store: BaseStore)
         messages=[SystemMessage(content=TRUSTCALL_INSTRUCTION_FORMATTED)] + state["messages"][:-1]
     ))
 
-    # Spy para ver las llamadas internas de Trustcall
-    spy = Spy()
+    # Recorder para ver las llamadas internas de Trustcall
+    recorder = ToolCallRecorder()
     
-    # Crea un extractor específico para las ToDos (permite inserciones nuevas)
-    todo_extractor = create_extractor(
-        model,
-        tools=[ToDo],
-        tool_choice=tool_name,
-        enable_inserts=True
-    ).with_listeners(on_end=spy)
+    # Extractor de las ToDos (permite inserciones nuevas), compartido entre llamadas; solo el recorder es propio
+    todo_extractor = get_todo_extractor()
 
     # Ejecuta el extractor
     result = todo_extractor.invoke({
         "messages": updated_messages, 
         "existing": existing_memories
-    })
+    }, recorder.attach(config))
 
-    # Persiste los cambios en el store (MongoDB/Memoria)
-    for r, rmeta in zip(result["responses"], result["response_metadata"]):
-        store.put(namespace,
-                  rmeta.get("json_doc_id", str(uuid.uuid4())),
-                  r.model_dump(mode="json"),
-            )
+    # Persiste los cambios en el store (MongoDB/Memoria) y en el índice en un solo store.batch,
+    # junto con la nueva versión que invalida el bloque de memoria en caché de task_mAIstro
+    todos.write(extracted_documents(result), extra_ops=[version_op(user_id, todo_category)])
         
-    # Obtiene ID de la herramienta llamada en task_mAIstro
-    tool_calls = state['messages'][-1].tool_calls
+    # Obtiene los IDs de las llamadas a la herramienta hechas en task_mAIstro
+    tool_calls = requested_tool_calls(state, "todo")
 
     # Genera el resumen legible de lo que se actualizó o creó
-    todo_update_msg = extract_tool_info(spy.called_tools, tool_name)
-    return {"messages": [{"role": "tool", "content": todo_update_msg, "tool_call_id": tool_calls[0]['id']}]}
+    todo_update_msg = recorder.summary(tool_name)
+    return tool_responses(tool_calls, todo_update_msg)
 
 # Nodo para actualizar las instrucciones de preferencia del usuario
-def update_instructions(state: MessagesState, config: RunnableConfig, store: BaseStore):
+def update_instructions(state: MemoryUpdateState, config: RunnableConfig, store: BaseStore):
     """Reflexiona sobre la historia y actualiza las instrucciones generales."""
     
     # Carga configuración
@@ -388,38 +523,83 @@ def update_instructions(state: MessagesState, config: RunnableConfig, store: Bas
     system_msg = CREATE_INSTRUCTIONS.format(
         current_instructions=existing_memory.value if existing_memory else None
     )
-    new_memory = model.invoke(
+    new_memory = get_model().invoke(
         [SystemMessage(content=system_msg)] + state['messages'][:-1] + 
         [HumanMessage(content="Please update the instructions based on the conversation")]
     )
 
     # Sobreescribe las instrucciones anteriores con las nuevas
     key = "user_instructions"
-    store.put(namespace, key, {"memory": new_memory.content})
+    put_many(store, namespace, {key: {"memory": new_memory.content}}, [version_op(user_id, todo_category)]) # E invalida la caché
     
-    # Responde a la llamada técnica de la herramienta
-    tool_calls = state['messages'][-1].tool_calls
-    return {"messages": [{"role": "tool", "content": "updated instructions", "tool_call_id": tool_calls[0]['id']}]}
+    # Responde a las llamadas técnicas de la herramienta
+    return tool_responses(requested_tool_calls(state, "instructions"), "updated instructions")
+
+# Nodo que aplica cada tipo de actualización (lo usa también el worker de memory_jobs)
+MEMORY_UPDATE_NODES = {
+    "user": update_profile,
+    "todo": update_todos,
+    "instructions": update_instructions,
+}
+# Nombre del nodo del grafo para cada tipo (route_message los reparte con Send)
+MEMORY_UPDATE_NODE_NAMES = {update_type: node.__name__ for update_type, node in MEMORY_UPDATE_NODES.items()}
+
+# Nodo del modo background: encola la actualización en lugar de ejecutar Trustcall antes de responder
+def schedule_memory_update(state: MessagesState, config: RunnableConfig, store: BaseStore):
+    """Guarda las actualizaciones de memoria pedidas en la cola duradera y responde a la herramienta."""
+
+    # Configuración de usuario y categoría
+    configurable = configuration.Configuration.from_runnable_config(config)
 
-# Función de enrutamiento (Conditional Edge): decide a qué nodo ir basándose en la salida de task_mAIstro
-def route_message(state: MessagesState, config: RunnableConfig) -> Literal[END, "update_todos", "update_instructions", "update_profile"]:
+    # Un trabajo por tipo de memoria; lleva la conversación tal como la vería el nodo de actualización
+    responses = []
+    for update_type, tool_calls in group_tool_calls(state['messages'][-1]).items():
+        memory_jobs.enqueue_job(store, configurable.user_id, configurable.todo_category, update_type, state["messages"])
+        responses += tool_responses(tool_calls, f"Memory update ({update_type}) scheduled")["messages"]
+    return {"messages": responses}
+
+# Agrupa las llamadas a UpdateMemory de un mensaje por tipo de memoria (en el orden en que aparecen)
+def group_tool_calls(message) -> dict[str, list[dict]]:
+    """Varias llamadas del mismo tipo las atiende un solo nodo: dos extractores sobre el mismo namespace
+    en paralelo se pisarían los cambios."""
+    groups = {}
+    for tool_call in message.tool_calls:
+        update_type = tool_call['args'].get('update_type')
+        if update_type not in MEMORY_UPDATE_NODES:
+            raise ValueError("Tipo de actualización desconocido") # Error si el tipo no es válido
+        groups.setdefault(update_type, []).append(tool_call)
+    return groups
+
+# Función de enrutamiento (Conditional Edge): decide a qué nodos ir basándose en la salida de task_mAIstro
+def route_message(state: MessagesState, config: RunnableConfig) -> Literal[END, "update_todos", "update_instructions", "update_profile", "schedule_memory_update"]:
     """Decide si el flujo termina o si debe ir a actualizar algún tipo de memoria."""
     message = state['messages'][-1] # Último mensaje del modelo
     
     # Si no hubo llamadas a herramientas, el flujo termina
     if len(message.tool_calls) == 0:
         return END
+    elif configuration.Configuration.from_runnable_config(config).memory_update_mode == "background":
+        # Modo background: la actualización se encola y no retrasa la respuesta
+        return "schedule_memory_update"
     else:
-        # Analiza el tipo de actualización solicitado en la herramienta
-        tool_call = message.tool_calls[0]
-        if tool_call['args']['update_type'] == "user":
-            return "update_profile" # Va al nodo de perfil
-        elif tool_call['args']['update_type'] == "todo":
-            return "update_todos" # Va al nodo de tareas
-        elif tool_call['args']['update_type'] == "instructions":
-            return "update_instructions" # Va al nodo de instrucciones
-        else:
-            raise ValueError("Tipo de actualización desconocido") # Error si el tipo no es válido
+        # Un nodo por tipo de memoria pedido (perfil, tareas, instrucciones), todos en paralelo;
+        # sus respuestas se combinan en el estado antes de volver una sola vez a task_mAIstro
+        return [
+            Send(MEMORY_UPDATE_NODE_NAMES[update_type], {"messages": state['messages'], "tool_calls": tool_calls})
+            for update_type, tool_calls in group_tool_calls(message).items()
+        ]
+
+# Función de enrutamiento tras encolar una actualización (modo background)
+def route_after_schedule(state: MessagesState) -> Literal[END, "task_mAIstro"]:
+    """Si el modelo ya escribió la respuesta junto a la llamada a la herramienta, termina sin otra llamada."""
+    # Mensaje del modelo que pidió la actualización (le siguen las respuestas de la herramienta)
+    content = next(message for message in reversed(state['messages']) if message.type == "ai").content
+    if isinstance(content, str):
+        has_reply = bool(content.strip())
+    else:
+        # Bedrock Converse devuelve el contenido como bloques [{"type": "text", "text": ...}, ...]
+        has_reply = any(isinstance(block, dict) and block.get("text", "").strip() for block in content)
+    return END if has_reply else "task_mAIstro"
 
 # Creación del Grafo de Estado
 builder = StateGraph(MessagesState, config_schema=configuration.Configuration)
@@ -429,6 +609,7 @@ builder.add_node(task_mAIstro) # Nodo de lógica principal
 builder.add_node(update_todos) # Nodo de gestión de tareas
 builder.add_node(update_profile) # Nodo de gestión de perfil
 builder.add_node(update_instructions) # Nodo de gestión de instrucciones
+builder.add_node(schedule_memory_update) # Nodo que encola actualizaciones (modo background)
 
 # Define las conexiones (aristas) entre nodos
 builder.add_edge(START, "task_mAIstro") # Inicia siempre en task_mAIstro
@@ -438,6 +619,20 @@ builder.add_conditional_edges("task_mAIstro", route_message)
 builder.add_edge("update_todos", "task_mAIstro")
 builder.add_edge("update_profile", "task_mAIstro")
 builder.add_edge("update_instructions", "task_mAIstro")
+# En modo background se responde directamente si el modelo ya lo hizo
+builder.add_conditional_edges("schedule_memory_update", route_after_schedule)
+
+# Grafo que carga langgraph.json (langgraph-api lo busca en el __dict__ del módulo y compila él mismo
+# un StateGraph, así que importar este módulo no compila nada)
+graph = builder
+
+# Grafo compilado sin persistencia para usarlo fuera de la plataforma; se compila en el primer acceso
+_graph = None
+
 
-# Compilación del Grafo final listo para ejecutarse
-graph = builder.compile()
\ No newline at end of file
+def get_graph():
+    """Retorna el grafo compilado, compilándolo la primera vez."""
+    global _graph
+    if _graph is None:
+        _graph = builder.compile()
+    return _graph
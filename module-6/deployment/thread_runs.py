@@ -0,0 +1,182 @@
+"""
+Control de concurrencia por thread_id ("double texting") para el servidor FastAPI.
+
+Cuando llega una ejecución para un hilo que ya tiene otra en curso se aplica una política:
+- reject   : se rechaza la nueva ejecución (ThreadBusyError → HTTP 409)
+- enqueue  : la nueva espera a que termine la actual (orden de llegada)
+- interrupt: se cancela la actual (su progreso parcial queda en el checkpoint) y arranca la nueva
+- rollback : se cancela la actual, el hilo vuelve al checkpoint previo a ella y arranca la nueva
+
+Los bloqueos son por proceso: con varios workers, las peticiones de un mismo hilo deben
+enrutarse al mismo worker para que la política se aplique.
+"""
+import asyncio # Bloqueos y tareas asíncronas
+from typing import Any, AsyncIterator, Awaitable, Dict, Optional # Tipos para anotaciones
+
+POLICIES = ("reject", "enqueue", "interrupt", "rollback")
+
+_DONE = object() # Marca de fin del productor en ThreadRun.stream
+
+
+class ThreadBusyError(Exception):
+    """El hilo tiene una ejecución en curso y la política es 'reject'."""
+
+
+class RunInterruptedError(Exception):
+    """La ejecución fue cancelada por una petición más reciente sobre el mismo hilo."""
+
+
+class ClientDisconnectedError(Exception):
+    """La ejecución fue cancelada porque el cliente cerró la conexión."""
+
+
+class ThreadRun:
+    """Ejecución en exclusiva sobre un hilo; se obtiene con ThreadRunManager.acquire."""
+
+    def __init__(self, manager: "ThreadRunManager", thread_id: str, config: Dict[str, Any]):
+        self.manager = manager
+        self.thread_id = thread_id
+        self.config = config # Configuración con la que debe ejecutarse el grafo
+        self.start_checkpoint_id: Optional[str] = None # Checkpoint del hilo antes de esta ejecución
+        self.task: Optional[asyncio.Task] = None # Tarea que ejecuta el grafo (cancelable por otra petición)
+        self.interrupted = False
+        self.abandoned = False
+
+    def cancel(self):
+        """Cancela la ejecución en curso (la llama una petición más reciente)."""
+        self.interrupted = True
+        if self.task is not None:
+            self.task.cancel()
+
+    def abandon(self):
+        """Cancela la ejecución en curso porque nadie espera ya su resultado (cliente desconectado)."""
+        self.abandoned = True
+        if self.task is not None:
+            self.task.cancel()
+
+    async def execute(self, coro: Awaitable[Any]) -> Any:
+        """Ejecuta `coro` como tarea cancelable y retorna su resultado."""
+        if self.interrupted or self.abandoned:
+            coro.close()
+            raise RunInterruptedError(self.thread_id) if self.interrupted else ClientDisconnectedError(self.thread_id)
+        self.task = asyncio.ensure_future(coro)
+        try:
+            # Si se cancela la petición que espera, asyncio cancela también la tarea
+            return await self.task
+        except asyncio.CancelledError:
+            if self.interrupted:
+                raise RunInterruptedError(self.thread_id) from None
+            if self.abandoned:
+                raise ClientDisconnectedError(self.thread_id) from None
+            raise
+
+    async def stream(self, source: AsyncIterator[Any]) -> AsyncIterator[Any]:
+        """Itera `source` en una tarea cancelable y reemite sus elementos."""
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def produce():
+            try:
+                async for item in source:
+                    await queue.put(item)
+            finally:
+                await queue.put(_DONE)
+
+        producer = self.execute(produce())
+        consumer = asyncio.ensure_future(producer)
+        try:
+            while True:
+                item = await queue.get()
+                if item is _DONE:
+                    break
+                yield item
+            # Propaga errores (o la interrupción) del productor
+            await consumer
+        finally:
+            if not consumer.done():
+                consumer.cancel()
+            # Marca el resultado como leído aunque ya nadie lo espere (p.ej. el cliente se desconectó)
+            consumer.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+    def release(self):
+        """Libera el hilo para la siguiente ejecución.
+
+        Si el grafo aún se está cancelando (p.ej. el cliente se desconectó a mitad del stream),
+        el hilo se libera cuando termine, para que la siguiente ejecución parta de un checkpoint completo.
+        """
+        if self.task is not None and not self.task.done():
+            self.task.add_done_callback(lambda _: self.manager._release(self))
+        else:
+            self.manager._release(self)
+
+
+class ThreadRunManager:
+    """Serializa las ejecuciones de cada thread_id según la política elegida."""
+
+    def __init__(self, default_policy: str = "enqueue"):
+        if default_policy not in POLICIES:
+            raise ValueError(f"Política desconocida: {default_policy} (opciones: {', '.join(POLICIES)})")
+        self.default_policy = default_policy
+        self._locks: Dict[str, asyncio.Lock] = {} # Un bloqueo por hilo
+        self._users: Dict[str, int] = {} # Ejecuciones activas o en espera por hilo (para limpiar _locks)
+        self._active: Dict[str, ThreadRun] = {} # Ejecución en curso por hilo
+
+    def is_busy(self, thread_id: str) -> bool:
+        return thread_id in self._active
+
+    async def acquire(self, graph, config: Dict[str, Any], policy: Optional[str] = None) -> ThreadRun:
+        """Espera el turno del hilo según la política y retorna la ThreadRun a ejecutar."""
+        policy = policy or self.default_policy
+        thread_id = config["configurable"]["thread_id"]
+        current = self._active.get(thread_id)
+
+        if current is not None and policy == "reject":
+            raise ThreadBusyError(thread_id)
+        if current is not None and policy in ("interrupt", "rollback"):
+            current.cancel()
+
+        lock = self._locks.setdefault(thread_id, asyncio.Lock())
+        self._users[thread_id] = self._users.get(thread_id, 0) + 1
+        try:
+            await lock.acquire()
+        except BaseException:
+            self._forget(thread_id)
+            raise
+
+        run = ThreadRun(self, thread_id, config)
+        self._active[thread_id] = run
+        try:
+            if policy == "rollback" and current is not None:
+                await self._rollback(graph, run, current)
+            # Recuerda el punto de partida por si una petición posterior pide 'rollback'
+            saved = await graph.checkpointer.aget_tuple(run.config)
+            run.start_checkpoint_id = saved.config["configurable"]["checkpoint_id"] if saved else None
+        except BaseException:
+            run.release()
+            raise
+        return run
+
+    async def _rollback(self, graph, run: ThreadRun, interrupted: ThreadRun):
+        """Devuelve el hilo al checkpoint anterior a la ejecución interrumpida."""
+        if interrupted.start_checkpoint_id is None:
+            # El hilo no existía antes de la ejecución interrumpida: se borra por completo
+            await graph.checkpointer.adelete_thread(run.thread_id)
+            return
+        # Ejecutar desde un checkpoint concreto crea una rama nueva a partir de él,
+        # que pasa a ser el estado más reciente del hilo
+        run.config = {
+            **run.config,
+            "configurable": {**run.config["configurable"], "checkpoint_id": interrupted.start_checkpoint_id},
+        }
+
+    def _release(self, run: ThreadRun):
+        if self._active.get(run.thread_id) is run:
+            del self._active[run.thread_id]
+            self._locks[run.thread_id].release()
+            self._forget(run.thread_id)
+
+    def _forget(self, thread_id: str):
+        self._users[thread_id] -= 1
+        if self._users[thread_id] == 0:
+            # Nadie más usa el hilo: se descarta su bloqueo para no acumular memoria
+            del self._users[thread_id]
+            del self._locks[thread_id]
@@ -0,0 +1,156 @@
+"""
+Repositorio de tareas (ToDo) sobre BaseStore con índices secundarios por estado y fecha límite.
+
+Las tareas siguen guardándose en ("todo", todo_category, user_id), como antes. Además, por cada
+tarea se mantiene una entrada de índice pequeña en ("todo_index", todo_category, user_id, "status",
+<estado>) con su fecha límite. Así se pueden obtener las tareas abiertas ordenadas por fecha límite
+sin leer el historial completo (done/archived): se listan las entradas de índice de los estados
+abiertos, se ordenan por fecha y solo se leen (en un único store.batch) las que se van a usar.
+Si hay más tareas abiertas que el límite, task_mAIstro elige las más parecidas a la conversación
+con el índice vectorial de memory_context y las lee con get_many.
+
+Todas las escrituras de tareas deben pasar por TodoRepository.put/write/delete para que el índice siga
+al día. Los usuarios con tareas anteriores al índice se indexan la primera vez que se consultan
+(ensure_index). Si una entrada de índice queda desfasada (p. ej. un backend sin transacciones
+aplicó solo parte del lote), la lectura la descarta comparando con el valor real de la tarea.
+"""
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple # Tipos para anotaciones
+
+from langgraph.store.base import BaseStore, GetOp, Item, PutOp # Interfaz común de los stores
+
+TODO_NAMESPACE = "todo"
+INDEX_NAMESPACE = "todo_index"
+INDEX_VERSION = 1 # Cambiarlo obliga a reconstruir los índices existentes
+OPEN_STATUSES = ("not started", "in progress")
+CLOSED_STATUSES = ("done", "archived")
+SCAN_PAGE_SIZE = 1000 # Elementos leídos por consulta al recorrer un namespace completo
+
+
+def scan(store: BaseStore, namespace: Tuple[str, ...]) -> List[Item]:
+    """Todos los elementos de un namespace (store.search devuelve 10 por defecto), en páginas."""
+    items = []
+    while True:
+        page = store.search(namespace, limit=SCAN_PAGE_SIZE, offset=len(items))
+        items.extend(page)
+        if len(page) < SCAN_PAGE_SIZE:
+            return items
+
+
+async def ascan(store: BaseStore, namespace: Tuple[str, ...]) -> List[Item]:
+    """Versión asíncrona de scan (para el event loop del servidor)."""
+    items = []
+    while True:
+        page = await store.asearch(namespace, limit=SCAN_PAGE_SIZE, offset=len(items))
+        items.extend(page)
+        if len(page) < SCAN_PAGE_SIZE:
+            return items
+
+
+def put_many(store: BaseStore, namespace: Tuple[str, ...], values: Dict[str, dict], extra_ops: Sequence[PutOp] = ()):
+    """Guarda varios documentos (y `extra_ops`) en un único store.batch: un viaje al store en lugar de uno por documento."""
+    store.batch([PutOp(namespace, key, value) for key, value in values.items()] + list(extra_ops))
+
+
+def todo_status(value: dict) -> str:
+    return value.get("status") or "not started" # Valor por defecto del esquema ToDo
+
+
+def deadline_key(deadline: Optional[str]):
+    """Orden por fecha límite, sin fecha al final."""
+    return (deadline is None, deadline or "")
+
+
+class TodoRepository:
+    """Acceso a las tareas de un usuario y categoría, con índice por estado y fecha límite."""
+
+    def __init__(self, store: BaseStore, user_id: str, todo_category: str):
+        self.store = store
+        self.namespace = (TODO_NAMESPACE, todo_category, user_id)
+        self.index_namespace = (INDEX_NAMESPACE, todo_category, user_id)
+        self._index_checked = False # La versión del índice se comprueba una vez por repositorio
+
+    def _status_namespace(self, status: str) -> Tuple[str, ...]:
+        return (*self.index_namespace, "status", status)
+
+    def ensure_index(self):
+        """Construye el índice si el usuario tiene tareas de antes del índice (o de otra versión)."""
+        if self._index_checked:
+            return
+        meta = self.store.get(self.index_namespace, "meta")
+        if meta is None or meta.value.get("version") != INDEX_VERSION:
+            self.rebuild_index()
+        self._index_checked = True
+
+    def rebuild_index(self):
+        """Recorre todas las tareas y vuelve a escribir sus entradas de índice (en un store.batch)."""
+        ops = [PutOp(entry.namespace, entry.key, None)
+               for status in OPEN_STATUSES + CLOSED_STATUSES
+               for entry in scan(self.store, self._status_namespace(status))]
+        ops += [self._index_op(item.key, item.value) for item in scan(self.store, self.namespace)]
+        ops.append(PutOp(self.index_namespace, "meta", {"version": INDEX_VERSION}, index=False))
+        self.store.batch(ops)
+
+    def _index_op(self, key: str, value: dict) -> PutOp:
+        return PutOp(self._status_namespace(todo_status(value)), key, {"deadline": value.get("deadline")}, index=False)
+
+    def put(self, key: str, value: dict):
+        """Guarda una tarea y actualiza su entrada de índice (la mueve si cambió de estado)."""
+        self.write({key: value})
+
+    def write(self, puts: Dict[str, dict], deletes: Iterable[str] = (), extra_ops: Sequence[PutOp] = ()):
+        """Guarda y borra varias tareas (con sus entradas de índice) y `extra_ops` en un único store.batch.
+
+        No lee los valores anteriores: la clave se borra del índice de los demás estados en el mismo
+        lote, así que un solo viaje al store sea cual sea el número de tareas (más la comprobación
+        de la versión del índice, solo la primera vez en este repositorio).
+        """
+        self.ensure_index()
+        ops = []
+        for key in list(puts) + [key for key in deletes if key not in puts]:
+            value = puts.get(key)
+            current = None if value is None else todo_status(value)
+            ops.extend(PutOp(self._status_namespace(status), key, None)
+                       for status in OPEN_STATUSES + CLOSED_STATUSES if status != current)
+            ops.append(PutOp(self.namespace, key, value))
+            if value is not None:
+                ops.append(self._index_op(key, value))
+        self.store.batch(ops + list(extra_ops))
+
+    def delete(self, key: str):
+        """Borra una tarea y su entrada de índice."""
+        self.write({}, [key])
+
+    def index_entries(self, statuses: Iterable[str] = OPEN_STATUSES) -> List[Tuple[str, str, Optional[str]]]:
+        """(clave, estado, fecha límite) de las tareas con esos estados, ordenadas por fecha límite."""
+        self.ensure_index()
+        entries = [
+            (entry.key, status, entry.value.get("deadline"))
+            for status in statuses
+            for entry in scan(self.store, self._status_namespace(status))
+        ]
+        return sorted(entries, key=lambda entry: deadline_key(entry[2]))
+
+    def count(self, statuses: Iterable[str] = OPEN_STATUSES) -> int:
+        return len(self.index_entries(statuses))
+
+    def items(self, statuses: Iterable[str] = OPEN_STATUSES, limit: int = 0) -> List[Item]:
+        """Tareas con esos estados ordenadas por fecha límite, como mucho `limit` (0 = todas)."""
+        return self.fetch(self.index_entries(statuses), limit)
+
+    def fetch(self, entries: List[Tuple[str, str, Optional[str]]], limit: int = 0) -> List[Item]:
+        """Tareas de unas entradas de índice (las de index_entries), como mucho `limit` (0 = todas)."""
+        if limit > 0:
+            entries = entries[:limit]
+        results = self.store.batch([GetOp(self.namespace, key) for key, _, _ in entries])
+        # Descarta entradas desfasadas (tarea borrada o con otro estado)
+        return [item for item, (_, status, _) in zip(results, entries)
+                if item is not None and todo_status(item.value) == status]
+
+    def open_items(self, limit: int = 0) -> List[Item]:
+        """Tareas abiertas (not started / in progress) por fecha límite: las que importan al extractor."""
+        return self.items(OPEN_STATUSES, limit)
+
+    def get_many(self, keys: Iterable[str], statuses: Iterable[str] = OPEN_STATUSES) -> List[Item]:
+        """Tareas con esas claves (en el mismo orden) y alguno de esos estados, en un único store.batch."""
+        results = self.store.batch([GetOp(self.namespace, key) for key in keys])
+        return [item for item in results if item is not None and todo_status(item.value) in statuses]